@@ -0,0 +1,28 @@
+"""
+The migration agents, importable as `agents.SchemaConversionAgent` etc. Each is imported on first access
+(PEP 562), so a run only loads autogen and the tools of the agents it actually uses.
+"""
+import importlib
+
+_AGENTS = {
+    "EnvironmentSetupAgent": "agents.environment_setup_agent",
+    "SchemaConversionAgent": "agents.schema_conversion_agent",
+    "DataMigrationAgent": "agents.data_migration_agent",
+    "DataValidationAgent": "agents.data_validation_agent",
+    "AnomalyDetectionAgent": "agents.anamoly_detection_agent",
+    "PerformanceOptimizationAgent": "agents.performance_optimization_agent",
+}
+
+__all__ = list(_AGENTS)
+
+
+def __getattr__(name):
+    if name not in _AGENTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_AGENTS[name]), name)
+    globals()[name] = value # Later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
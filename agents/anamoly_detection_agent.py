@@ -1,9 +1,13 @@
 from autogen import AssistantAgent, UserProxyAgent, register_function
 from tools.monitoring_tools import MonitoringTools
+from tools.plan_executor import run_headless
+from tools.llm_cache import LLMCache, attach_cache
+import asyncio
 import json
+import os
 
 class AnomalyDetectionAgent:
-    def __init__(self, llm_config: dict, gcp_config: dict):
+    def __init__(self, llm_config: dict, gcp_config: dict, llm_cache: LLMCache = None):
         self.gcp_config = gcp_config
         self.assistant = AssistantAgent(
             name="AnomalyDetectionAssistant",
@@ -29,40 +33,105 @@ class AnomalyDetectionAgent:
             name="get_cloudsql_metrics",
             description="Retrieves Cloud SQL instance metrics (e.g., 'cpu_utilization', 'memory_usage', 'disk_utilization', 'network_egress')."
         )
+        register_function(
+            MonitoringTools.get_cloudsql_metrics_batch,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="get_cloudsql_metrics_batch",
+            description="Retrieves several Cloud SQL metrics in one concurrent fetch (default: all of 'cpu_utilization', "
+                        "'memory_usage', 'memory_utilization', 'disk_utilization', 'network_egress'); returns the time series per metric type."
+        )
         register_function(
             MonitoringTools.analyze_metrics_for_anomaly,
             caller=self.assistant,
             executor=self.user_proxy,
             name="analyze_metrics_for_anomaly",
-            description="Analyzes metric data for simple threshold-based anomalies. "
-                        "For memory, recommends staying below 90% utilization."
+            description="Analyzes metric data ({metric type: time series}) for anomalies against rolling, EWMA and "
+                        "hour-of-week baselines; utilization above the threshold (default 0.9) is always reported."
         )
+        register_function(
+            MonitoringTools.detect_metric_anomalies,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="detect_metric_anomalies",
+            description="Fetches history_days of Cloud SQL metrics and returns anomaly clusters of the last recent_hours, "
+                        "scored against that history (rolling, EWMA, hour-of-week and rate-of-change baselines)."
+        )
+
+        self.llm_cache = llm_cache # Answers repeated LLM requests; records or replays whole runs
+        if llm_cache:
+            attach_cache(llm_cache, self.assistant, self.user_proxy)
 
-    def detect_anomalies(self) -> dict:
-        """Initiates the anomaly detection process."""
+    def headless_plan(self) -> list:
+        """The detection as one tool invocation: anomaly clusters of the last 6 hours against a week of history."""
+        return [{"id": "detect", "tool": "detect_metric_anomalies", "args": {
+            "instance_name": self.gcp_config['cloudsql_instance_name'],
+            "metric_types": ["cpu_utilization", "memory_utilization", "disk_utilization", "network_egress"],
+            "history_days": 7,
+            "recent_hours": 6
+        }}]
+
+    def detect_anomalies(self, headless: bool = False) -> dict:
+        """
+        Initiates the anomaly detection process. headless runs headless_plan() directly; the assistant only
+        writes the summary (or recovers if the step fails).
+        """
         print("Starting Anomaly Detection...")
         
         instance_name = self.gcp_config['cloudsql_instance_name']
         project_id = self.gcp_config['project_id']
-        os.environ = project_id # Set env var for tool
+        os.environ['GCP_PROJECT_ID'] = project_id # Set env var for tool
 
         initial_prompt = f"""
-        1. Retrieve the last 6 hours of 'cpu_utilization' metrics for Cloud SQL instance '{instance_name}'.
+        1. Call `detect_metric_anomalies` for Cloud SQL instance '{instance_name}' with metric types 'cpu_utilization',
+           'memory_utilization', 'disk_utilization' and 'network_egress' to get the anomaly clusters of the last 6 hours.
         2. Analyze the CPU utilization data for any anomalies.
-        3. Retrieve the last 6 hours of 'memory_usage' metrics for Cloud SQL instance '{instance_name}'.
-        4. Analyze the memory usage data for any anomalies, noting that memory usage should ideally remain below 90%.
-        5. Retrieve the last 6 hours of 'disk_utilization' metrics for Cloud SQL instance '{instance_name}'.
-        6. Analyze the disk utilization data for any anomalies, noting that at least 20% free space should be maintained.
-        7. Retrieve the last 6 hours of 'network_egress' metrics for Cloud SQL instance '{instance_name}'.
-        8. Analyze the network egress data for any unusual spikes.
-        9. Summarize all detected anomalies and provide recommendations.
+        3. Analyze the memory utilization data for any anomalies, noting that memory usage should ideally remain below 90%.
+        4. Analyze the disk utilization data for any anomalies, noting that at least 20% free space should be maintained.
+        5. Analyze the network egress data for any unusual spikes.
+        6. Summarize all detected anomalies and provide recommendations.
         """
         
+        if headless:
+            result = run_headless(self.headless_plan(), self.assistant, self.user_proxy, instructions=initial_prompt, summarize=True)
+            print(f"Anomaly Detection Complete. Final message: {result['details']}")
+            return result
+
         chat_result = self.user_proxy.initiate_chat(
             self.assistant,
+            cache=self.llm_cache,
             message=initial_prompt
         )
         
         final_message = chat_result.chat_history[-1]['content']
         print(f"Anomaly Detection Complete. Final message: {final_message}")
-        return {"status": "completed", "details": final_message}
\ No newline at end of file
+        return {"status": "completed", "details": final_message}
+
+    def monitor(self, instances: list = None, interval_seconds: float = 60, history_days: float = 7, iterations: int = None,
+                stats_path: str = None) -> dict:
+        """
+        Runs continuous monitoring (see MonitoringDaemon): instances are polled and scored locally every
+        interval_seconds, and the assistant is only asked to explain newly detected anomaly clusters.
+        instances defaults to gcp_config['monitored_instances'], or the migrated instance.
+        """
+        instances = instances or self.gcp_config.get('monitored_instances') or [self.gcp_config['cloudsql_instance_name']]
+        os.environ['GCP_PROJECT_ID'] = self.gcp_config['project_id']
+        from tools.monitoring_daemon import MonitoringDaemon # Only the monitoring mode needs the daemon
+        daemon = MonitoringDaemon(self.gcp_config['project_id'], instances, interval_seconds=interval_seconds,
+                                  history_days=history_days, on_anomaly=self.explain_anomaly, stats_path=stats_path)
+        try:
+            result = asyncio.run(daemon.run(iterations=iterations))
+        except KeyboardInterrupt:
+            print("Monitoring stopped.")
+            result = {"status": "stopped", "stats": daemon.stats(), "anomalies": daemon.anomalies}
+        print(f"Monitoring stats: {json.dumps(result['stats'], default=str)}")
+        return result
+
+    def explain_anomaly(self, cluster: dict) -> str:
+        """Asks the assistant (a single completion, no tool calls) to explain one anomaly cluster."""
+        prompt = (f"An anomaly was detected on Cloud SQL instance '{cluster['instance']}':\n{json.dumps(cluster, indent=2)}\n"
+                  "Explain the likely cause in two or three sentences and recommend one action.")
+        reply = self.assistant.generate_reply(messages=[{"role": "user", "content": prompt}])
+        if isinstance(reply, dict):
+            reply = reply.get("content")
+        return (reply or "").replace("TERMINATE", "").strip()
@@ -1,12 +1,25 @@
 from autogen import AssistantAgent, UserProxyAgent, register_function
 from tools.mysql_tools import MySQLTools
+from tools.ddl_tools import DeferredIndexBuilder
+from tools.direct_migration import DirectMigration
+from tools.migration_manifest import MigrationManifest
+from tools.migration_pipeline import PipelinedMigration
+from tools.migration_planner import MigrationPlanner, choose_workers, earliest_table_positions
+from tools.object_store import open_store
+from tools.plan_executor import run_headless
+from tools.llm_cache import LLMCache, attach_cache
 import os
 
 class DataMigrationAgent:
-    def __init__(self, llm_config: dict, source_db_config: dict, target_db_config: dict, cloud_storage_bucket: str):
+    def __init__(self, llm_config: dict, source_db_config: dict, target_db_config: dict, cloud_storage_bucket: str,
+                 manifest_path: str = "migration_manifest.sqlite", deferred_indexes_path: str = "deferred_indexes.json",
+                 machine_type: str = None, llm_cache: LLMCache = None):
         self.source_db_config = source_db_config
         self.target_db_config = target_db_config
         self.cloud_storage_bucket = cloud_storage_bucket
+        self.manifest_path = manifest_path # Survives restarts so finished chunks are not dumped or loaded again
+        self.deferred_indexes_path = deferred_indexes_path # Written by SchemaConversionAgent in deferred indexes mode
+        self.machine_type = machine_type # Cloud SQL tier of the target, e.g. db-n1-standard-4, sizes the load workers
         self.assistant = AssistantAgent(
             name="DataMigrationAssistant",
             system_message="You are an expert in high-performance MySQL data migration using mydumper and myloader. "
@@ -50,47 +63,255 @@ class DataMigrationAgent:
             name="run_myloader",
             description="Executes myloader to import data into a target MySQL database from a local directory."
         )
-        # Add a tool for gsutil to move files to/from Cloud Storage
         register_function(
-            self._gsutil_command,
+            MySQLTools(
+                host=target_db_config['host'],
+                user=target_db_config['user'],
+                password=target_db_config['password'],
+                database=target_db_config['database'],
+                port=target_db_config['port']
+            ).bulk_load_file,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="bulk_load_file",
+            description="Loads an INSERT dump file (e.g. 'data/load_departments.dump') or a CSV chunk into the target database "
+                        "with LOAD DATA LOCAL INFILE batches, without needing myloader."
+        )
+        register_function(
+            self._run_pipelined_migration,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="run_pipelined_migration",
+            description="Migrates tables from the source to the target through a pipelined per-table "
+                        "dump -> Cloud Storage upload -> load flow. Each table (or key range of a large table) is dumped from its "
+                        "own snapshot, so tables are not consistent with one another until run_cdc_catch_up has applied the "
+                        "changes since each table's snapshot; run_direct_migration copies all tables from one snapshot. Optionally takes a list of table names or work unit ids. Unless worker "
+                        "counts are given, large tables are split into primary key ranges, scheduled largest first, and "
+                        "the workers are sized from the local CPU cores and the target's vCPUs."
+        )
+        register_function(
+            self._run_direct_migration,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="run_direct_migration",
+            description="Copies tables straight from the source into the target over the network, without dump files or "
+                        "Cloud Storage: parallel reader/writer pairs stream rows from one consistent snapshot into bulk loads. "
+                        "Optionally takes a list of table names or work unit ids and the number of reader/writer pairs."
+        )
+        register_function(
+            self._plan_migration,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="plan_migration",
+            description="Previews the chunk plan used by run_pipelined_migration: work units with their estimated sizes, "
+                        "the dump/load worker counts and the predicted makespan against its lower bound."
+        )
+        register_function(
+            self._get_migration_status,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="get_migration_status",
+            description="Returns per-table progress (chunks dumped, uploaded and loaded, rows, errors) from the migration manifest."
+        )
+        register_function(
+            self._run_cdc_catch_up,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="run_cdc_catch_up",
+            description="Streams row-based binlog changes made on the source since each table's snapshot into the target, "
+                        "in batched parallel transactions, until the replication lag drops below max_lag_seconds. "
+                        "Reports the binlog position, rows applied and lag."
+        )
+        register_function(
+            self._build_deferred_indexes,
             caller=self.assistant,
             executor=self.user_proxy,
-            name="gsutil_command",
-            description="Executes a gsutil command (e.g., 'cp -r local_dir gs://bucket_name', 'cp -r gs://bucket_name local_dir')."
+            name="build_deferred_indexes",
+            description="Builds the secondary indexes and foreign keys deferred during schema conversion, in parallel across "
+                        "tables (concurrency tables at a time), and reports the time taken by each index."
         )
+        # Moves files to/from Cloud Storage
+        register_function(
+            self._transfer_files,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="transfer_files",
+            description="Copies a local directory to a Cloud Storage prefix (e.g. '/tmp/mysql_dump' -> 'gs://bucket/mysql_dumps') "
+                        "or a prefix to a local directory, with parallel multipart transfers, zstd compression in transit "
+                        "and per-object checksums."
+        )
+
+        self.llm_cache = llm_cache # Answers repeated LLM requests; records or replays whole runs
+        if llm_cache:
+            attach_cache(llm_cache, self.assistant, self.user_proxy)
+
+    def _transfer_files(self, source: str, destination: str, workers: int = 16, compression_level: int = 3) -> dict:
+        """Uploads a local directory's files under a gs:// prefix, or downloads every object under a gs:// prefix."""
+        if source.startswith("gs://"):
+            store, prefix = open_store(source, workers=workers, compression_level=compression_level)
+            try:
+                return store.download_files([f"{prefix}/*" if prefix else "*"], destination)
+            finally:
+                store.close()
+        store, prefix = open_store(destination, workers=workers, compression_level=compression_level)
+        try:
+            paths = [os.path.join(source, name) for name in sorted(os.listdir(source))] if os.path.isdir(source) else [source]
+            return store.upload_files([path for path in paths if os.path.isfile(path)], prefix)
+        finally:
+            store.close()
+
+    def _plan_migration(self, tables: list = None, target_chunk_mb: int = 256) -> dict:
+        """Builds the size-aware chunk plan for the source database."""
+        source_tools = MySQLTools(**self.source_db_config)
+        try:
+            planner = MigrationPlanner(source_tools, self.source_db_config['database'], machine_type=self.machine_type,
+                                       target_chunk_bytes=target_chunk_mb * 1024 ** 2)
+            return planner.plan(tables)
+        finally:
+            source_tools.close()
+
+    def _run_pipelined_migration(self, tables: list = None, dump_workers: int = None, load_workers: int = None,
+                                 threads_per_table: int = 4, target_chunk_mb: int = 256, upload_workers: int = None) -> dict:
+        """
+        Runs the pipelined dump -> upload -> load migration for the configured source and target. Without explicit
+        worker counts the run follows a MigrationPlanner plan.
+        """
+        plan = None
+        if dump_workers is None and load_workers is None:
+            plan = self._plan_migration(tables, target_chunk_mb)
+            dump_workers, load_workers = plan["dump_workers"], plan["load_workers"]
+            print(f"Planned {len(plan['units'])} work units with {dump_workers} dump and {load_workers} load workers "
+                  f"(predicted efficiency {plan['efficiency']}).")
+        dump_workers, load_workers = dump_workers or 2, load_workers or 2
+        # A local directory can stand in for the bucket when testing offline
+        if os.path.isabs(self.cloud_storage_bucket):
+            bucket_path = self.cloud_storage_bucket
+        else:
+            bucket_path = f"gs://{self.cloud_storage_bucket}/mysql_dumps"
+        pipeline = PipelinedMigration(
+            self.source_db_config,
+            self.target_db_config,
+            bucket_path,
+            dump_workers=dump_workers,
+            upload_workers=upload_workers or choose_workers(self.machine_type)["upload_workers"],
+            load_workers=load_workers,
+            threads_per_table=threads_per_table,
+            manifest_path=self.manifest_path
+        )
+        return pipeline.run(tables, plan=plan)
+
+    def _run_direct_migration(self, tables: list = None, workers: int = None, batch_rows: int = 10000,
+                              target_chunk_mb: int = 256) -> dict:
+        """Runs the direct source -> target copy, split and ordered by a MigrationPlanner plan."""
+        plan = self._plan_migration(tables, target_chunk_mb)
+        if workers is None:
+            sizing = choose_workers(self.machine_type)
+            workers = min(sizing["dump_workers"], sizing["load_workers"])
+        migration = DirectMigration(
+            self.source_db_config,
+            self.target_db_config,
+            workers=workers,
+            batch_rows=batch_rows,
+            manifest_path=self.manifest_path
+        )
+        return migration.run(tables, plan=plan)
+
+    def _run_cdc_catch_up(self, max_lag_seconds: float = 5.0, timeout_seconds: float = 3600.0, workers: int = 4) -> dict:
+        """Applies source changes made since the snapshot until the target is within max_lag_seconds."""
+        manifest = MigrationManifest(self.manifest_path)
+        try:
+            positions = earliest_table_positions(manifest.snapshot_positions()) # Split tables have one position per chunk
+        finally:
+            manifest.close()
+        if not positions:
+            return {"status": "error", "message": "No snapshot binlog positions recorded; run the migration first with binary logging enabled on the source."}
+        from tools.binlog_cdc import BinlogCatchUp # Loads the replication client only when changes are caught up
+        catch_up = BinlogCatchUp(
+            self.source_db_config,
+            self.target_db_config,
+            positions,
+            workers=workers,
+            checkpoint_path=self.manifest_path + ".cdc.json"
+        )
+        return catch_up.run(max_lag_seconds=max_lag_seconds, timeout_seconds=timeout_seconds)
 
-    def _gsutil_command(self, command: str) -> str:
-        """Helper to run gsutil commands."""
-        full_command = f"gsutil {command}"
+    def _build_deferred_indexes(self, concurrency: int = 4) -> dict:
+        """Builds the indexes and foreign keys left out of the schema until the data was loaded."""
+        if not os.path.exists(self.deferred_indexes_path):
+            return {"status": "skipped", "message": "No deferred indexes; the schema was applied with all its indexes."}
+        target_tools = MySQLTools(**self.target_db_config)
         try:
-            result = subprocess.run(full_command, shell=True, check=True, capture_output=True, text=True)
-            return result.stdout
-        except subprocess.CalledProcessError as e:
-            print(f"Error executing gsutil command: {e.stderr}")
-            raise
+            return DeferredIndexBuilder(target_tools, plan_path=self.deferred_indexes_path).build(concurrency=concurrency)
+        finally:
+            target_tools.close()
 
-    def migrate_data(self) -> dict:
-        """Initiates the data migration process."""
-        print("Starting Data Migration...")
+    def _get_migration_status(self) -> dict:
+        """Returns the per-table progress recorded in the migration manifest."""
+        manifest = MigrationManifest(self.manifest_path)
+        try:
+            return manifest.summary()
+        finally:
+            manifest.close()
+
+    def headless_plan(self, mode: str = "pipelined") -> list:
+        """The migration as tool invocations: migrate (with the status report alongside), build the deferred indexes, catch up."""
+        return [
+            {"id": "status", "tool": "get_migration_status"},
+            {"id": "migrate", "tool": "run_direct_migration" if mode == "direct" else "run_pipelined_migration"},
+            {"id": "deferred_indexes", "tool": "build_deferred_indexes", "after": ["migrate"]},
+            {"id": "cdc_catch_up", "tool": "run_cdc_catch_up", "after": ["deferred_indexes"]}
+        ]
+
+    def migrate_data(self, mode: str = "pipelined", headless: bool = False) -> dict:
+        """
+        Initiates the data migration process. mode "direct" copies over the network from source to target
+        (for sources that can reach Cloud SQL), "pipelined" stages dump files through Cloud Storage.
+        headless runs headless_plan() directly and only involves the assistant if a step fails.
+        """
+        print(f"Starting Data Migration ({mode} mode)...")
         
         local_dump_dir = "/tmp/mysql_dump" # Temporary local directory on orchestrator VM
         cloud_storage_path = f"gs://{self.cloud_storage_bucket}/mysql_dumps"
 
+        if mode == "direct":
+            migration_tool = "run_direct_migration"
+            method = ("It streams every table from one consistent snapshot of the source straight into the target with "
+                      "parallel reader/writer pairs, without dump files or Cloud Storage.")
+        else:
+            migration_tool = "run_pipelined_migration"
+            method = (f"It dumps each table with `mydumper`, uploads its files to the Cloud Storage bucket "
+                      f"'{self.cloud_storage_bucket}' and loads them with `myloader` as soon as they land, so the stages overlap. "
+                      f"Each table (or key range of a large table) is dumped from its own snapshot, so the tables are NOT consistent "
+                      f"with one another until step 4 has applied the changes made since each table's snapshot: do not validate "
+                      f"or use the target before that step.")
         initial_prompt = f"""
-        1. Create a local directory '{local_dump_dir}' on this machine.
-        2. Execute `mydumper` to export data from the legacy MySQL database.
+        0. Call `get_migration_status` first. Tables reported as 'loaded' were finished by an earlier run and are skipped
+           automatically; a re-run only redoes the chunks that are missing.
+        1. Migrate all tables of the legacy MySQL database '{self.source_db_config['database']}' on host '{self.source_db_config['host']}'
+           into the Cloud SQL for MySQL database '{self.target_db_config['database']}' on host '{self.target_db_config['host']}'
+           using the `{migration_tool}` tool. {method}
+           Leave the worker counts unset so the tool plans the chunks and sizes the workers from the hardware.
+        2. If any table failed, report the failing stage and error. Re-run `{migration_tool}` for only the failed tables,
+           or failed work units (ids such as 'salaries__part003'), if the error looks transient.
+        3. Once every table is loaded, run `build_deferred_indexes` to create the secondary indexes and foreign keys that were
+           left out of the schema for a faster load (it reports 'skipped' when there are none). Retry it if some indexes failed.
+        4. Then run `run_cdc_catch_up` to apply the changes made on the source since the snapshot,
+           and report the remaining replication lag. Writes on the source only need to be frozen for the final catch-up at cutover.
+        5. If the pipelined migration cannot be used at all, fall back to the sequential flow: run `mydumper` into '{local_dump_dir}',
+           upload it to '{cloud_storage_path}' with `transfer_files`, download it to '/tmp/myloader_input' the same way and run `myloader` from there,
+           then clean up both local directories, and continue with steps 3 and 4.
            Source details: host='{self.source_db_config['host']}', user='{self.source_db_config['user']}', password='{self.source_db_config['password']}', database='{self.source_db_config['database']}'.
-           Output the dump files to the local directory '{local_dump_dir}'. Use a suitable number of threads (e.g., 4 or based on CPU cores).
-        3. Once `mydumper` completes, upload the entire contents of '{local_dump_dir}' to the Cloud Storage bucket '{self.cloud_storage_bucket}' at path '{cloud_storage_path}'. Use `gsutil cp -r`.
-        4. After successful upload, execute `myloader` to import the data from the Cloud Storage path '{cloud_storage_path}' into the Cloud SQL for MySQL instance.
            Target details: host='{self.target_db_config['host']}', user='{self.target_db_config['user']}', password='{self.target_db_config['password']}', database='{self.target_db_config['database']}'.
-           First, download the dump files from '{cloud_storage_path}' to a temporary local directory (e.g., '/tmp/myloader_input') on this machine using `gsutil cp -r`.
-           Then, run `myloader` from this temporary local directory. Use a suitable number of threads.
-        5. Clean up the local temporary dump directories ('{local_dump_dir}' and '/tmp/myloader_input').
         """
         
+        if headless:
+            result = run_headless(self.headless_plan(mode), self.assistant, self.user_proxy, instructions=initial_prompt)
+            print(f"Data Migration Complete. Final message: {result['details']}")
+            return result
+
         chat_result = self.user_proxy.initiate_chat(
             self.assistant,
+            cache=self.llm_cache,
             message=initial_prompt
         )
         
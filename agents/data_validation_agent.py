@@ -1,10 +1,12 @@
 from autogen import AssistantAgent, UserProxyAgent, register_function
 from tools.mysql_tools import MySQLTools
 from tools.data_comparison_tools import DataComparisonTools
+from tools.plan_executor import run_headless
+from tools.llm_cache import LLMCache, attach_cache
 import json
 
 class DataValidationAgent:
-    def __init__(self, llm_config: dict, source_db_config: dict, target_db_config: dict):
+    def __init__(self, llm_config: dict, source_db_config: dict, target_db_config: dict, llm_cache: LLMCache = None):
         self.source_db_config = source_db_config
         self.target_db_config = target_db_config
         self.assistant = AssistantAgent(
@@ -51,7 +53,9 @@ class DataValidationAgent:
             caller=self.assistant,
             executor=self.user_proxy,
             name="compare_row_counts",
-            description="Compares row counts for all tables between source and target databases. "
+            description="Compares row counts for all tables between source and target databases, counting tables concurrently. "
+                        "mode='tiered' compares information_schema estimates first and counts exactly only the critical_tables "
+                        "and tables whose estimates differ by more than tolerance. "
                         "Requires source_db_conn and target_db_conn objects, and database_name."
         )
         register_function(
@@ -62,14 +66,65 @@ class DataValidationAgent:
             description="Compares checksums for a specific table between source and target databases. "
                         "Requires source_db_conn, target_db_conn objects, database_name, and table_name."
         )
+        register_function(
+            DataComparisonTools.compare_table_checksums_chunked,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="compare_table_checksums_chunked",
+            description="Compares a large table in parallel primary-key range chunks and bisects mismatching chunks "
+                        "down to the offending rows. Requires source_db_conn, target_db_conn objects, database_name, and table_name."
+        )
+        register_function(
+            DataComparisonTools.compare_column_profiles,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="compare_column_profiles",
+            description="Compares per-column profiles (null count, min/max, sum/avg, string lengths, approximate distinct count) "
+                        "of tables between source and target, one aggregate scan per table and side, tables in parallel. "
+                        "Requires source_db_conn and target_db_conn objects, and database_name; optionally a list of tables."
+        )
+        register_function(
+            DataComparisonTools.compare_table_sample,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="compare_table_sample",
+            description="Compares a uniform random sample of a very large table's rows (random primary key seeks) column by column within "
+                        "time_budget_seconds and reports the estimated mismatch rate with a confidence interval and a GO/NO_GO/INCONCLUSIVE "
+                        "verdict against max_mismatch_rate. "
+                        "Requires source_db_conn, target_db_conn objects, database_name, and table_name."
+        )
         # To make the tools callable, we need to pass the connection objects or have the agent create them
         # For simplicity in AutoGen context, the agent will be instructed to pass connection parameters
         # and the tool will instantiate its own connections or use a shared context if available.
         # For this example, the tools are designed to take connection objects directly.
         # The agent will be prompted to call these with the instantiated MySQLTools objects.
 
-    def validate_data(self) -> dict:
-        """Initiates the data validation process."""
+        self.llm_cache = llm_cache # Answers repeated LLM requests; records or replays whole runs
+        if llm_cache:
+            attach_cache(llm_cache, self.assistant, self.user_proxy)
+
+    def headless_plan(self, critical_tables: list = None) -> list:
+        """
+        The validation as tool invocations: tiered row counts and chunked checksums of the critical tables
+        concurrently, then column profiles of the remaining tables.
+        """
+        critical_tables = critical_tables or ["employees", "salaries"]
+        connections = {"source_db_conn": self.source_mysql_tools, "target_db_conn": self.target_mysql_tools,
+                       "database_name": self.source_db_config['database']}
+        return [
+            {"id": "row_counts", "tool": "compare_row_counts",
+             "args": {**connections, "mode": "tiered", "critical_tables": critical_tables}},
+            *[{"id": f"checksum_{table}", "tool": "compare_table_checksums_chunked", "args": {**connections, "table_name": table}}
+              for table in critical_tables],
+            {"id": "column_profiles", "tool": "compare_column_profiles", "after": ["row_counts"],
+             "args": lambda results: {**connections, "tables": [t for t in results["row_counts"] if t not in critical_tables]}}
+        ]
+
+    def validate_data(self, headless: bool = False) -> dict:
+        """
+        Initiates the data validation process. headless runs headless_plan() directly and only involves the
+        assistant if a step fails; the report lists each comparison's result.
+        """
         print("Starting Data Validation...")
         
         # Pass the connection objects to the agent's context or instruct it to create them
@@ -79,14 +134,24 @@ class DataValidationAgent:
         
         initial_prompt = f"""
         1. Compare row counts for all tables in database '{self.source_db_config['database']}' between the source MySQL at '{self.source_db_config['host']}' and the target Cloud SQL at '{self.target_db_config['host']}'.
-           Use the `compare_row_counts` tool, passing the source and target database connection objects.
+           Use the `compare_row_counts` tool, passing the source and target database connection objects. For databases with many tables
+           use mode='tiered' with the critical tables (e.g., 'employees', 'salaries') in critical_tables.
         2. For a few critical tables (e.g., 'employees', 'salaries' from datacharmer/test_db), compare their checksums between source and target.
-           Use the `compare_table_checksums` tool.
-        3. Summarize the validation results, highlighting any discrepancies in row counts or checksums.
+           Use the `compare_table_checksums_chunked` tool for large tables such as 'salaries' so mismatches are narrowed down to rows,
+           and the `compare_table_checksums` tool for small tables. For tables too large to checksum within the cutover window,
+           use the `compare_table_sample` tool with a time_budget_seconds (e.g., 120) and report its verdict and confidence interval.
+        3. Run `compare_column_profiles` for the remaining tables to find which columns drifted without a full-row comparison.
+        4. Summarize the validation results, highlighting any discrepancies in row counts or checksums, and list the offending primary keys and mismatching columns if any were found.
         """
         
+        if headless:
+            result = run_headless(self.headless_plan(), self.assistant, self.user_proxy, instructions=initial_prompt)
+            print(f"Data Validation Complete. Final message: {result['details']}")
+            return result
+
         chat_result = self.user_proxy.initiate_chat(
             self.assistant,
+            cache=self.llm_cache,
             message=initial_prompt,
             # Pass connection objects as part of the context if the tools are designed to receive them
             # For this example, the tools are instantiated with configs, and the agent is expected to know how to use them.
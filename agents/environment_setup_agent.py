@@ -1,10 +1,18 @@
 from autogen import AssistantAgent, UserProxyAgent, register_function
 from tools.gcp_cli_tools import GcpCliTools
+from tools.plan_executor import run_headless
+from tools.llm_cache import LLMCache, attach_cache
 import json
 import os
+import shlex
+
+REQUIRED_APIS = ["compute.googleapis.com", "sqladmin.googleapis.com", "servicenetworking.googleapis.com", "storage.googleapis.com"]
+TERRAFORM_VARIABLES = ["project_id", "region", "cloudsql_instance_name", "cloudsql_database_name", "cloudsql_user", "cloudsql_password",
+                       "cloudsql_machine_type", "cloudsql_disk_size_gb", "cloudsql_ha_enabled", "cloudsql_private_ip_range_name",
+                       "cloudsql_vpc_network", "cloud_storage_bucket_name"]
 
 class EnvironmentSetupAgent:
-    def __init__(self, llm_config: dict, gcp_config: dict):
+    def __init__(self, llm_config: dict, gcp_config: dict, llm_cache: LLMCache = None):
         self.gcp_config = gcp_config
         self.assistant = AssistantAgent(
             name="EnvironmentSetupAssistant",
@@ -67,9 +75,40 @@ class EnvironmentSetupAgent:
             description="Adds an IAM policy binding to a project."
         )
 
+        self.llm_cache = llm_cache # Answers repeated LLM requests; records or replays whole runs
+        if llm_cache:
+            attach_cache(llm_cache, self.assistant, self.user_proxy)
+
+    def headless_plan(self, terraform_dir: str = "terraform") -> list:
+        """The setup as tool invocations: APIs, terraform init and the project number concurrently, then apply and IAM."""
+        project_id = self.gcp_config['project_id']
+        variables = " ".join(
+            "-var " + shlex.quote(f"{name}={str(self.gcp_config[name]).lower() if isinstance(self.gcp_config[name], bool) else self.gcp_config[name]}")
+            for name in TERRAFORM_VARIABLES
+        )
+        enable_steps = [f"enable_{api.split('.')[0]}" for api in REQUIRED_APIS]
+        return [
+            *[{"id": step_id, "tool": "enable_service_api", "args": {"service_name": api, "project_id": project_id}}
+              for step_id, api in zip(enable_steps, REQUIRED_APIS)],
+            {"id": "terraform_init", "tool": "run_terraform_command", "args": {"command": "init -input=false", "working_dir": terraform_dir}},
+            {"id": "project_number", "tool": "get_project_number", "args": {"project_id": project_id}},
+            {"id": "terraform_apply", "tool": "run_terraform_command", "after": enable_steps + ["terraform_init"],
+             "args": {"command": f"apply -auto-approve -input=false {variables}", "working_dir": terraform_dir}},
+            {"id": "grant_service_networking", "tool": "add_iam_policy_binding", "after": ["project_number", "enable_servicenetworking"],
+             "args": lambda results: {
+                 "project_id": project_id,
+                 "member": f"serviceAccount:service-{results['project_number']}@service-networking.iam.gserviceaccount.com",
+                 "role": "roles/servicenetworking.serviceAgent"
+             }},
+            {"id": "terraform_output", "tool": "run_terraform_command", "after": ["terraform_apply"],
+             "args": {"command": "output -json", "working_dir": terraform_dir}}
+        ]
 
-    def setup_environment(self) -> dict:
-        """Initiates the environment setup process."""
+    def setup_environment(self, headless: bool = False) -> dict:
+        """
+        Initiates the environment setup process. headless runs headless_plan() directly and only involves the
+        assistant if a step fails.
+        """
         print("Starting Environment Setup...")
         
         initial_prompt = f"""
@@ -105,8 +144,14 @@ class EnvironmentSetupAgent:
         Report the Cloud SQL instance connection name and private IP address upon successful provisioning.
         """
         
+        if headless:
+            result = run_headless(self.headless_plan(), self.assistant, self.user_proxy, instructions=initial_prompt)
+            print(f"Environment Setup Complete. Final message: {result['details']}")
+            return result
+
         chat_result = self.user_proxy.initiate_chat(
             self.assistant,
+            cache=self.llm_cache,
             message=initial_prompt,
             config_list=[self.gcp_config] # Pass config for agent to use
         )
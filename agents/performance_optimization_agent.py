@@ -2,10 +2,12 @@ from autogen import AssistantAgent, UserProxyAgent, register_function
 from tools.mysql_tools import MySQLTools
 from tools.gcp_cli_tools import GcpCliTools # For instance scaling
 from tools.monitoring_tools import MonitoringTools # For metrics
+from tools.plan_executor import run_headless
+from tools.llm_cache import LLMCache, attach_cache
 import json
 
 class PerformanceOptimizationAgent:
-    def __init__(self, llm_config: dict, target_db_config: dict, gcp_config: dict):
+    def __init__(self, llm_config: dict, target_db_config: dict, gcp_config: dict, llm_cache: LLMCache = None):
         self.target_db_config = target_db_config
         self.gcp_config = gcp_config
         self.assistant = AssistantAgent(
@@ -60,8 +62,25 @@ class PerformanceOptimizationAgent:
             description="Retrieves Cloud SQL instance metrics (e.g., 'cpu_utilization', 'memory_usage')."
         )
 
-    def optimize_performance(self) -> dict:
-        """Initiates the performance optimization process."""
+        self.llm_cache = llm_cache # Answers repeated LLM requests; records or replays whole runs
+        if llm_cache:
+            attach_cache(llm_cache, self.assistant, self.user_proxy)
+
+    def headless_plan(self) -> list:
+        """The data gathering as concurrent tool invocations: CPU and memory metrics and the EXPLAIN of a sample query."""
+        instance_name = self.gcp_config['cloudsql_instance_name']
+        return [
+            {"id": "cpu", "tool": "get_cloudsql_metrics", "args": {"instance_name": instance_name, "metric_type": "cpu_utilization", "duration_hours": 24}},
+            {"id": "memory", "tool": "get_cloudsql_metrics", "args": {"instance_name": instance_name, "metric_type": "memory_utilization", "duration_hours": 24}},
+            {"id": "explain_sample_query", "tool": "execute_sql_on_target",
+             "args": {"query": "EXPLAIN SELECT * FROM employees WHERE first_name LIKE 'A%'", "fetch_all": True}}
+        ]
+
+    def optimize_performance(self, headless: bool = False) -> dict:
+        """
+        Initiates the performance optimization process. headless gathers the data with headless_plan() and
+        asks the assistant once for the recommendations.
+        """
         print("Starting Performance Optimization...")
         
         instance_name = self.gcp_config['cloudsql_instance_name']
@@ -76,8 +95,14 @@ class PerformanceOptimizationAgent:
         5. Provide a summary of performance recommendations and cost optimization tips, including leveraging Committed Use Discounts for compute, and strategies for managing storage and network egress costs as CUDs do not apply to them.
         """
         
+        if headless:
+            result = run_headless(self.headless_plan(), self.assistant, self.user_proxy, instructions=initial_prompt, summarize=True)
+            print(f"Performance Optimization Complete. Final message: {result['details']}")
+            return result
+
         chat_result = self.user_proxy.initiate_chat(
             self.assistant,
+            cache=self.llm_cache,
             message=initial_prompt
         )
         
@@ -1,11 +1,17 @@
 from autogen import AssistantAgent, UserProxyAgent, register_function
 from tools.mysql_tools import MySQLTools
+from tools.ddl_tools import DeferredIndexBuilder
+from tools.schema_rules import SchemaRuleEngine
+from tools.plan_executor import PlanExecutor, registered_tools
+from tools.llm_cache import LLMCache, attach_cache
 import os
 
 class SchemaConversionAgent:
-    def __init__(self, llm_config: dict, source_db_config: dict, target_db_config: dict):
+    def __init__(self, llm_config: dict, source_db_config: dict, target_db_config: dict,
+                 deferred_indexes_path: str = "deferred_indexes.json", llm_cache: LLMCache = None):
         self.source_db_config = source_db_config
         self.target_db_config = target_db_config
+        self.deferred_indexes_path = deferred_indexes_path # Read back by DataMigrationAgent after the load
         self.assistant = AssistantAgent(
             name="SchemaConversionAssistant",
             system_message="You are an expert in MySQL schema analysis and conversion for Cloud SQL. "
@@ -28,19 +34,31 @@ class SchemaConversionAgent:
             )},
         )
 
+        self.source_tools = MySQLTools(
+            host=source_db_config['host'],
+            user=source_db_config['user'],
+            password=source_db_config['password'],
+            database=source_db_config['database'],
+            port=source_db_config['port']
+        )
+        self.schema_applier = DeferredIndexBuilder(
+            MySQLTools(
+                host=target_db_config['host'],
+                user=target_db_config['user'],
+                password=target_db_config['password'],
+                database=target_db_config['database'],
+                port=target_db_config['port']
+            ),
+            plan_path=deferred_indexes_path
+        )
+
         # Register tools
         register_function(
-            MySQLTools(
-                host=source_db_config['host'],
-                user=source_db_config['user'],
-                password=source_db_config['password'],
-                database=source_db_config['database'],
-                port=source_db_config['port']
-            ).get_schema_ddl,
+            self.source_tools.get_schema_ddl,
             caller=self.assistant,
             executor=self.user_proxy,
             name="get_source_schema_ddl",
-            description="Extracts DDL for all tables from the source database."
+            description="Extracts DDL for all tables, views, routines and triggers from the source database."
         )
         register_function(
             MySQLTools(
@@ -55,21 +73,106 @@ class SchemaConversionAgent:
             name="execute_sql_on_target",
             description="Executes a SQL query or DDL script on the target Cloud SQL instance."
         )
+        register_function(
+            self.schema_applier.apply_schema,
+            caller=self.assistant,
+            executor=self.user_proxy,
+            name="apply_ddl_script",
+            description="Applies a DDL script (several statements, DELIMITER blocks allowed) on the target and reports the "
+                        "statements that failed. With defer=True tables are created with only their primary keys, and their "
+                        "secondary/unique indexes and foreign keys are saved to be built after the data load."
+        )
 
-    def convert_schema(self) -> dict:
-        """Initiates the schema conversion process."""
+        self.llm_cache = llm_cache # Answers repeated LLM requests; records or replays whole runs
+        if llm_cache:
+            attach_cache(llm_cache, self.assistant, self.user_proxy)
+
+    def headless_plan(self, deferred_indexes: bool = False, conversion: dict = None) -> list:
+        """
+        The rule-based conversion as tool invocations: extract the source DDL, convert it, apply it.
+        With the result of analyze_schema() as conversion, only the apply step is left.
+        """
+        if conversion is not None:
+            return [{"id": "apply", "tool": "apply_ddl_script", "args": {"ddl_script": conversion["ddl"], "defer": deferred_indexes}}]
+        return [
+            {"id": "extract", "tool": "get_source_schema_ddl", "args": {"db_name": self.source_db_config['database']}},
+            {"id": "convert", "tool": SchemaRuleEngine().convert, "after": ["extract"],
+             "args": lambda results: {"ddl_script": results["extract"]}},
+            {"id": "apply", "tool": "apply_ddl_script", "after": ["convert"],
+             "args": lambda results: {"ddl_script": results["convert"]["ddl"], "defer": deferred_indexes}}
+        ]
+
+    def analyze_schema(self) -> dict:
+        """
+        Extracts the source schema and converts it by rules, without touching the target, so it can run while
+        the target is still being provisioned. Returns {"status": "completed", "conversion", "details"}.
+        """
+        print("Starting Schema Analysis...")
+        outcome = PlanExecutor(registered_tools(self.user_proxy)).run(self.headless_plan()[:2])
+        conversion = outcome["results"].get("convert")
+        if conversion is None:
+            failures = "; ".join(f"{step_id}: {step['error']}" for step_id, step in outcome["steps"].items() if step.get("error"))
+            return {"status": "failed", "details": f"Schema analysis failed: {failures}"}
+        details = (f"Rules converted {conversion['converted']} statements in {conversion['seconds']}s; "
+                   f"{len(conversion['escalated'])} escalated for review.")
+        print(f"Schema Analysis Complete. {details}")
+        return {"status": "completed", "conversion": conversion, "details": details}
+
+    def convert_schema(self, deferred_indexes: bool = False, use_rules: bool = True, headless: bool = False,
+                       conversion: dict = None) -> dict:
+        """
+        Initiates the schema conversion process. With deferred_indexes, tables are created with only their
+        primary keys and the secondary indexes and foreign keys are built after the data load.
+        With use_rules (implied by headless), headless_plan() runs directly: the mechanical rewrites are done
+        locally by SchemaRuleEngine and applied; only the statements it escalates, or that fail on the target,
+        go to the assistant. conversion, from an earlier analyze_schema(), skips the extraction.
+        """
         print("Starting Schema Conversion...")
-        
-        initial_prompt = f"""
+        if deferred_indexes and os.path.exists(self.deferred_indexes_path):
+            os.remove(self.deferred_indexes_path) # Left over from an earlier conversion
+        apply_tool = f"the `apply_ddl_script` tool with defer={deferred_indexes}"
+
+        outcome = None
+        if use_rules or headless:
+            outcome = PlanExecutor(registered_tools(self.user_proxy)).run(self.headless_plan(deferred_indexes, conversion))
+            if outcome["results"].get("apply") is None:
+                print("Rule-based conversion could not run; falling back to the assistant.")
+        if outcome and outcome["results"].get("apply") is not None:
+            conversion, applied = conversion or outcome["results"]["convert"], outcome["results"]["apply"]
+            print(f"Rule engine converted {conversion['converted']} statements in {conversion['seconds']}s "
+                  f"({len(conversion['escalated'])} escalated).")
+            review = conversion["escalated"] + [
+                {"statement": failure["statement"], "reason": f"Failed on the target: {failure['error']}"} for failure in applied["failed"]
+            ]
+            if not review:
+                details = (f"Applied {applied['statements_executed']} statements converted by rules "
+                           f"{conversion['rule_counts']}; no statement needed review.")
+                print(f"Schema Conversion Complete. {details}")
+                return {"status": "completed", "details": details}
+            statements = "\n\n".join(f"-- {item['reason']}\n{item['statement']};" for item in review)
+            initial_prompt = f"""
+        The schema of database '{self.source_db_config['database']}' was converted for Cloud SQL for MySQL 8.0 by deterministic rules and
+        applied to database '{self.target_db_config['database']}' on host '{self.target_db_config['host']}', except for these statements:
+
+        {statements}
+
+        1. For each statement, rewrite it into an equivalent that Cloud SQL for MySQL 8.0 accepts, addressing the reason given above it.
+           Use the `utf8mb4` character set, `utf8mb4_unicode_ci` collation and the InnoDB engine, and omit DEFINER clauses.
+        2. Apply the rewritten statements with {apply_tool}.
+        3. Confirm schema creation by listing tables in the target database.
+        """
+        else:
+            initial_prompt = f"""
         1. Connect to the legacy MySQL database at host '{self.source_db_config['host']}' with user '{self.source_db_config['user']}' and extract the DDL for all tables in database '{self.source_db_config['database']}'.
         2. Analyze the extracted DDL for any potential incompatibilities with Cloud SQL for MySQL 8.0 (e.g., specific storage engines like MyISAM, unsupported functions, character sets).
         3. Generate a compatible DDL script. Ensure character sets are `utf8mb4` and collation is `utf8mb4_unicode_ci` where appropriate.
-        4. Connect to the Cloud SQL for MySQL instance at host '{self.target_db_config['host']}' with user '{self.target_db_config['user']}' and apply the generated DDL script to create the schema in database '{self.target_db_config['database']}'.
+        4. Connect to the Cloud SQL for MySQL instance at host '{self.target_db_config['host']}' with user '{self.target_db_config['user']}' and apply the generated DDL script with {apply_tool} to create the schema in database '{self.target_db_config['database']}'.
         5. Confirm schema creation by listing tables in the target database.
         """
         
         chat_result = self.user_proxy.initiate_chat(
             self.assistant,
+            cache=self.llm_cache,
             message=initial_prompt
         )
         
@@ -1,12 +1,11 @@
+import argparse
 import os
 import json
 from dotenv import load_dotenv
-from agents.environment_setup_agent import EnvironmentSetupAgent
-from agents.schema_conversion_agent import SchemaConversionAgent
-from agents.data_migration_agent import DataMigrationAgent
-from agents.data_validation_agent import DataValidationAgent
-from agents.anomaly_detection_agent import AnomalyDetectionAgent
-from agents.performance_optimization_agent import PerformanceOptimizationAgent
+import agents # Each agent (with autogen and its tools' dependencies) is imported when its stage first uses it
+from tools.llm_cache import LLMCache
+from tools.migration_manifest import MigrationManifest
+from tools.stage_graph import StageGraph, describe_timeline
 
 def load_config():
     """Loads configuration from JSON files and environment variables."""
@@ -46,16 +45,88 @@ def load_config():
     return llm_config, gcp_config, source_db_config, target_db_config
 
 def main():
+    parser = argparse.ArgumentParser(description="End-to-end MySQL to Cloud SQL migration.")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run each agent's fixed plan of tool calls directly; the LLM is only consulted on failures and for summaries.")
+    parser.add_argument("--stages", default=None,
+                        help="Comma-separated stages to run (environment, schema_analysis, schema, data_migration, validation, "
+                             "anomaly_detection, performance); the others are assumed done.")
+    parser.add_argument("--from-stage", default=None, help="Run this stage and every stage after it.")
+    parser.add_argument("--llm-cache", default=None, help="SQLite file caching LLM responses across runs (e.g. llm_cache.sqlite).")
+    parser.add_argument("--llm-cache-mode", choices=["cache", "record", "replay"], default="cache",
+                        help="'record' also records every tool result; 'replay' re-runs a recording without network or LLM calls.")
+    parser.add_argument("--llm-cache-ttl-hours", type=float, default=168, help="Age after which cached responses are discarded.")
+    parser.add_argument("--monitor", action="store_true",
+                        help="Only run continuous anomaly monitoring of the migrated (or gcp_config 'monitored_instances') instances.")
+    parser.add_argument("--monitor-interval", type=float, default=60, help="Seconds between monitoring polls.")
+    parser.add_argument("--monitor-stats", default=None, help="File the monitoring stats are written to after every poll.")
+    parser.add_argument("--status", action="store_true", help="Only print the per-table progress recorded in the migration manifest.")
+    parser.add_argument("--manifest", default="migration_manifest.sqlite", help="Migration manifest read by --status.")
+    args = parser.parse_args()
+
+    if args.status:
+        print_status(args.manifest)
+        return
+
     llm_config, gcp_config, source_db_config, target_db_config = load_config()
+    llm_cache = None
+    if args.llm_cache or args.llm_cache_mode != "cache":
+        llm_cache = LLMCache(args.llm_cache or "llm_cache.sqlite", mode=args.llm_cache_mode, ttl_seconds=args.llm_cache_ttl_hours * 3600)
+    try:
+        run_stages(args, llm_config, gcp_config, source_db_config, target_db_config, llm_cache)
+    finally:
+        if llm_cache:
+            print(f"LLM cache stats: {llm_cache.stats()}")
+            llm_cache.close()
+
+def print_status(manifest_path: str):
+    """Prints the per-table progress of the data migration, without loading any agent."""
+    if not os.path.exists(manifest_path):
+        print(f"No migration manifest at {manifest_path}; the data migration has not started.")
+        return
+    manifest = MigrationManifest(manifest_path)
+    try:
+        summary = manifest.summary()
+    finally:
+        manifest.close()
+    for table, progress in summary.items():
+        print(f"{table:<40} {progress['status']:<12} {progress['loaded_chunks']}/{progress['chunks']} chunks loaded, "
+              f"{progress['rows'] or 0} rows" + (f", error: {progress['error']}" if progress['error'] else ""))
+    loaded = sum(1 for progress in summary.values() if progress['status'] == "loaded")
+    print(f"{loaded}/{len(summary)} tables loaded.")
+
+def run_stages(args, llm_config, gcp_config, source_db_config, target_db_config, llm_cache):
+    """Runs the selected migration stages (see build_stage_graph), or only the monitoring daemon with --monitor."""
+    if args.monitor:
+        agents.AnomalyDetectionAgent(llm_config=llm_config, gcp_config=gcp_config, llm_cache=llm_cache).monitor(
+            interval_seconds=args.monitor_interval, stats_path=args.monitor_stats)
+        return
 
     print("--- Starting End-to-End MySQL to Cloud SQL Migration ---")
+    graph = build_stage_graph(args, llm_config, gcp_config, source_db_config, target_db_config, llm_cache)
+    try:
+        results = graph.run(graph.select(args.stages.split(",") if args.stages else None, args.from_stage))
+    finally:
+        from tools.connection_pool import close_all_pools # Imported here: mysql.connector must not load at startup
+        close_all_pools()
+    print(f"Stage timeline:\n{describe_timeline(results)}")
+    if all(result.ok for result in results.values()):
+        print("--- End-to-End Migration Process Completed ---")
+    else:
+        failed = [result.name for result in results.values() if result.status == "failed"]
+        print(f"--- Migration stopped: {', '.join(failed)} failed; rerun with --from-stage {failed[0] if failed else ''} ---")
+
+def build_stage_graph(args, llm_config, gcp_config, source_db_config, target_db_config, llm_cache) -> StageGraph:
+    """
+    The migration stages and their dependencies. The source schema is analyzed while the environment is
+    provisioned, and anomaly detection and performance optimization run side by side after validation.
+    """
+    graph = StageGraph()
 
     # 1. Environment Setup
-    env_setup_agent = EnvironmentSetupAgent(llm_config=llm_config, gcp_config=gcp_config)
-    env_result = env_setup_agent.setup_environment()
-    if env_result['status']!= 'completed':
-        print("Environment setup failed. Aborting migration.")
-        return
+    def environment(inputs):
+        env_setup_agent = agents.EnvironmentSetupAgent(llm_config=llm_config, gcp_config=gcp_config, llm_cache=llm_cache)
+        return env_setup_agent.setup_environment(headless=args.headless)
 
     # After environment setup, ensure Cloud SQL Proxy is running on the orchestrator VM
     # This step would typically be part of the VM's startup script or a manual step for initial setup.
@@ -69,36 +140,51 @@ def main():
     # actual_cloudsql_ip = GcpCliTools.get_cloudsql_instance_ip(gcp_config['cloudsql_instance_name'])
     # target_db_config['host'] = actual_cloudsql_ip
 
-    # 2. Schema Conversion
-    schema_agent = SchemaConversionAgent(llm_config=llm_config, source_db_config=source_db_config, target_db_config=target_db_config)
-    schema_result = schema_agent.convert_schema()
-    if schema_result['status']!= 'completed':
-        print("Schema conversion failed. Aborting migration.")
-        return
+    # 2. Schema Conversion: the source side (extraction and rule conversion) needs no target
+    def schema_analysis(inputs):
+        schema_agent = agents.SchemaConversionAgent(llm_config=llm_config, source_db_config=source_db_config, target_db_config=target_db_config, llm_cache=llm_cache)
+        return schema_agent.analyze_schema()
+
+    def schema(inputs):
+        analysis = inputs.get("schema_analysis")
+        schema_agent = agents.SchemaConversionAgent(llm_config=llm_config, source_db_config=source_db_config, target_db_config=target_db_config, llm_cache=llm_cache)
+        return schema_agent.convert_schema(deferred_indexes=True, headless=args.headless, # Indexes are built after the data load
+                                           conversion=(analysis.value or {}).get("conversion") if analysis else None)
 
     # 3. Data Migration
-    data_migration_agent = DataMigrationAgent(llm_config=llm_config, source_db_config=source_db_config, target_db_config=target_db_config, cloud_storage_bucket=gcp_config['cloud_storage_bucket_name'])
-    data_migration_result = data_migration_agent.migrate_data()
-    if data_migration_result['status']!= 'completed':
-        print("Data migration failed. Aborting migration.")
-        return
+    def data_migration(inputs):
+        data_migration_agent = agents.DataMigrationAgent(llm_config=llm_config, source_db_config=source_db_config, target_db_config=target_db_config, cloud_storage_bucket=gcp_config['cloud_storage_bucket_name'], machine_type=gcp_config['cloudsql_machine_type'], llm_cache=llm_cache)
+        return data_migration_agent.migrate_data(headless=args.headless)
 
     # 4. Data Validation
-    data_validation_agent = DataValidationAgent(llm_config=llm_config, source_db_config=source_db_config, target_db_config=target_db_config)
-    validation_result = data_validation_agent.validate_data()
-    print(f"Data Validation Report: {validation_result['details']}")
+    def validation(inputs):
+        data_validation_agent = agents.DataValidationAgent(llm_config=llm_config, source_db_config=source_db_config, target_db_config=target_db_config, llm_cache=llm_cache)
+        validation_result = data_validation_agent.validate_data(headless=args.headless)
+        print(f"Data Validation Report: {validation_result['details']}")
+        return validation_result
 
     # 5. Anomaly Detection (Post-migration monitoring)
-    anomaly_detection_agent = AnomalyDetectionAgent(llm_config=llm_config, gcp_config=gcp_config)
-    anomaly_result = anomaly_detection_agent.detect_anomalies()
-    print(f"Anomaly Detection Report: {anomaly_result['details']}")
+    def anomaly_detection(inputs):
+        anomaly_detection_agent = agents.AnomalyDetectionAgent(llm_config=llm_config, gcp_config=gcp_config, llm_cache=llm_cache)
+        anomaly_result = anomaly_detection_agent.detect_anomalies(headless=args.headless)
+        print(f"Anomaly Detection Report: {anomaly_result['details']}")
+        return anomaly_result
 
     # 6. Performance Optimization (Post-migration tuning)
-    perf_opt_agent = PerformanceOptimizationAgent(llm_config=llm_config, target_db_config=target_db_config, gcp_config=gcp_config)
-    perf_opt_result = perf_opt_agent.optimize_performance()
-    print(f"Performance Optimization Recommendations: {perf_opt_result['details']}")
-
-    print("--- End-to-End Migration Process Completed ---")
+    def performance(inputs):
+        perf_opt_agent = agents.PerformanceOptimizationAgent(llm_config=llm_config, target_db_config=target_db_config, gcp_config=gcp_config, llm_cache=llm_cache)
+        perf_opt_result = perf_opt_agent.optimize_performance(headless=args.headless)
+        print(f"Performance Optimization Recommendations: {perf_opt_result['details']}")
+        return perf_opt_result
+
+    graph.add("environment", environment)
+    graph.add("schema_analysis", schema_analysis)
+    graph.add("schema", schema, after=["environment", "schema_analysis"])
+    graph.add("data_migration", data_migration, after=["schema"])
+    graph.add("validation", validation, after=["data_migration"])
+    graph.add("anomaly_detection", anomaly_detection, after=["validation"])
+    graph.add("performance", performance, after=["validation"])
+    return graph
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+Startup budget check for the CLI, based on `python -X importtime`.
+
+Imports main.py (without running it) in a fresh interpreter, a few times, and fails when the fastest run's
+import time exceeds the budget or when a heavy dependency was imported at startup: those must only load when
+the stage that needs them runs (see agents/__init__.py and tools/__init__.py).
+
+    python scripts/check_import_time.py [--budget-ms 300] [--runs 5] [--top 15]
+
+Exits with status 1 on failure, so it can guard CI or the cron jobs' environment.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages that must not be imported by `import main`
+HEAVY_MODULES = ("autogen", "openai", "numpy", "pandas", "mysql", "pymysqlreplication", "zstandard", "google")
+
+
+def measure(statement: str = "import main") -> dict:
+    """
+    Runs the statement under -X importtime in a fresh interpreter from the repository root.
+    Returns {"total_us", "modules": {name: (self_us, cumulative_us)}}.
+    """
+    pythonpath = os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))
+    env = {**os.environ, "PYTHONPATH": pythonpath, "PYTHONDONTWRITEBYTECODE": "1"}
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                               cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    modules, total = {}, 0
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+        if not name[1:].startswith(" "): # Top-level imports; nested ones are included in their cumulative time
+            total += int(cumulative_us)
+    if completed.returncode != 0:
+        raise RuntimeError(f"`{statement}` failed:\n{completed.stderr[-2000:]}")
+    return {"total_us": total, "modules": modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when importing main.py exceeds the startup budget.")
+    parser.add_argument("--budget-ms", type=float, default=300, help="Maximum import time of main.py (fastest run).")
+    parser.add_argument("--runs", type=int, default=5, help="Runs to take the fastest of; the first one also warms the caches.")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list.")
+    parser.add_argument("--statement", default="import main", help="What to time.")
+    args = parser.parse_args()
+
+    try:
+        runs = [measure(args.statement) for _ in range(max(args.runs, 1))]
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+    fastest = min(runs, key=lambda run: run["total_us"])
+
+    print(f"`{args.statement}`: {fastest['total_us'] / 1000:.1f} ms (fastest of {len(runs)}; budget {args.budget_ms:.0f} ms)")
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    slowest = sorted(fastest["modules"].items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}")
+
+    failures = []
+    heavy = sorted({name.split(".")[0] for name in fastest["modules"]} & set(HEAVY_MODULES))
+    if heavy:
+        failures.append(f"heavy modules imported at startup: {', '.join(heavy)}")
+    if fastest["total_us"] > args.budget_ms * 1000:
+        failures.append(f"import time {fastest['total_us'] / 1000:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+AnomalyEngine on synthetic one-minute series: baselines that only look back, recurring peaks, level shifts
+and cluster splitting.
+
+    python -m unittest tests.test_anomaly_engine
+"""
+import unittest
+
+import numpy as np
+
+from tools.anomaly_engine import AnomalyEngine
+from tools.metric_store import MetricStore
+
+MONDAY = 1704067200.0 # 2024-01-01 00:00 UTC, hour-of-week 0
+DAY = 86400.0
+
+
+def minutes(days: int) -> np.ndarray:
+    return MONDAY + np.arange(days * 1440) * 60.0
+
+
+def nightly_load(times: np.ndarray, seed: int = 0) -> np.ndarray:
+    """CPU around 0.3 with a batch job lifting it to 0.8 from 02:00 to 03:00 every night."""
+    noise = np.random.default_rng(seed).normal(0, 0.01, len(times))
+    return 0.3 + noise + np.where((times - MONDAY) // 3600 % 24 == 2, 0.5, 0.0)
+
+
+class RollingWindowTest(unittest.TestCase):
+
+    def test_rolling_baseline_excludes_the_current_point(self):
+        engine = AnomalyEngine(window=5, min_history=5)
+        values = np.array([1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0, 1000.0])
+
+        mean, std = engine._rolling(values)
+
+        self.assertTrue(np.isnan(mean[:5]).all())
+        self.assertAlmostEqual(mean[5], values[0:5].mean())
+        self.assertAlmostEqual(std[5], values[0:5].std(ddof=1))
+        self.assertAlmostEqual(mean[7], values[2:7].mean()) # The 1000 spike is not in its own baseline
+
+    def test_rolling_skips_missing_values(self):
+        engine = AnomalyEngine(window=4, min_history=2)
+        values = np.array([1.0, np.nan, 3.0, 5.0, np.nan])
+
+        mean, _ = engine._rolling(values)
+
+        self.assertAlmostEqual(mean[3], 2.0)
+        self.assertAlmostEqual(mean[4], 3.0)
+
+
+class SeasonalBaselineTest(unittest.TestCase):
+
+    def test_seasonal_baseline_uses_only_earlier_weeks(self):
+        engine = AnomalyEngine(min_seasonal_samples=1)
+        # Three points at Monday 09:00 in each of three weeks
+        times = np.concatenate([MONDAY + week * 7 * DAY + 9 * 3600 + np.array([0.0, 60.0, 120.0]) for week in range(3)])
+        values = np.array([1.0, 1.0, 1.0, 3.0, 3.0, 3.0, 100.0, 50.0, 2.0])
+
+        seasonal = engine._seasonal(times, values)
+
+        self.assertTrue(np.isnan(seasonal[:3]).all()) # No earlier week
+        np.testing.assert_allclose(seasonal[3:6], 100.0) # (3 - 1) / 0.02: a zero stddev is floored at 2% of the mean
+        # Week three is scored against weeks one and two only (mean 2, stddev 1), not against its own points
+        np.testing.assert_allclose(seasonal[6:], [98.0, 48.0, 0.0])
+
+    def test_single_week_has_no_seasonal_baseline(self):
+        times = minutes(2)
+
+        self.assertTrue(np.isnan(AnomalyEngine()._seasonal(times, nightly_load(times))).all())
+
+
+class DetectTest(unittest.TestCase):
+
+    def test_nightly_peak_does_not_alert_once_earlier_weeks_exist(self):
+        times = minutes(21)
+
+        clusters = AnomalyEngine().detect(times, nightly_load(times), metric="cpu", since=MONDAY + 14 * DAY)
+
+        self.assertEqual(clusters, [])
+
+    def test_level_shift_alerts_and_stays_flagged(self):
+        times = minutes(21)
+        values = nightly_load(times)
+        shift = 18 * 1440 + 600 # Friday of the third week, 10:00
+        values[shift:] += 0.3
+
+        clusters = AnomalyEngine().detect(times, values, metric="cpu", instance="db-1", since=MONDAY + 14 * DAY)
+
+        self.assertEqual(len(clusters), 1)
+        cluster = clusters[0]
+        self.assertEqual(cluster["start_epoch"], times[shift])
+        self.assertEqual(cluster["end_epoch"], times[-1]) # The seasonal baseline keeps flagging after the rolling window adapts
+        self.assertEqual(cluster["direction"], "up")
+        self.assertIn("seasonal", cluster["reasons"])
+        self.assertEqual((cluster["instance"], cluster["metric"]), ("db-1", "cpu"))
+
+    def test_clusters_split_on_gaps_longer_than_cluster_gap_seconds(self):
+        times = minutes(1)[:600]
+        values = np.full(600, 0.5)
+        values[[100, 400, 450, 453]] = 0.95 # Over the memory_utilization limit
+
+        clusters = AnomalyEngine().detect(times, values, metric="memory_utilization")
+
+        self.assertEqual([c["start_epoch"] for c in clusters], [times[100], times[400], times[450]])
+        self.assertEqual(clusters[2]["end_epoch"], times[453]) # 3 minutes apart: one cluster
+        self.assertTrue(all("limit" in c["reasons"] for c in clusters))
+        self.assertEqual(clusters[0]["peak_value"], 0.95)
+
+        self.assertEqual(len(AnomalyEngine(cluster_gap_seconds=3600).detect(times, values, metric="memory_utilization")), 2)
+        self.assertEqual(AnomalyEngine().detect(times, values, metric="memory_utilization", since=times[250])[0]["start_epoch"], times[400])
+
+    def test_detect_store_filters_series(self):
+        store = MetricStore()
+        times = minutes(1)[:600]
+        flat = np.full(600, 0.5)
+        breach = flat.copy()
+        breach[300] = 0.95
+        store.append("db-1", "memory_utilization", times, breach)
+        store.append("db-2", "memory_utilization", times, breach)
+        store.append("db-1", "cpu", times, flat)
+
+        clusters = AnomalyEngine().detect_store(store, instances=["db-1"])
+
+        self.assertEqual([(c["instance"], c["metric"]) for c in clusters], [("db-1", "memory_utilization")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+DirectMigration column selection against canned information_schema rows.
+
+    python -m unittest tests.test_direct_migration
+"""
+import unittest
+
+from tools.direct_migration import DirectMigration
+
+
+class FakeTools:
+
+    def __init__(self, rows: list):
+        self.rows = rows
+        self.queries = []
+
+    def execute_query(self, query: str, fetch_all: bool = False):
+        self.queries.append(query)
+        return self.rows
+
+
+class TableColumnsTest(unittest.TestCase):
+
+    def _migration(self, rows: list) -> DirectMigration:
+        migration = DirectMigration.__new__(DirectMigration) # No connections: only source_tools is used
+        migration.source_tools = FakeTools(rows)
+        return migration
+
+    def test_default_current_timestamp_columns_are_copied(self):
+        migration = self._migration([
+            {"table_name": "orders", "column_name": "id", "extra": "auto_increment"},
+            {"table_name": "orders", "column_name": "created_at", "extra": "DEFAULT_GENERATED"},
+            {"table_name": "orders", "column_name": "updated_at", "extra": "DEFAULT_GENERATED on update CURRENT_TIMESTAMP"},
+            {"table_name": "orders", "column_name": "total", "extra": ""},
+            {"table_name": "orders", "column_name": "total_cents", "extra": "VIRTUAL GENERATED"},
+            {"table_name": "orders", "column_name": "search_key", "extra": "STORED GENERATED"},
+            {"table_name": "tags", "column_name": "name", "extra": None},
+        ])
+
+        columns = migration._table_columns("shop")
+
+        self.assertEqual(columns, {"orders": ["id", "created_at", "updated_at", "total"], "tags": ["name"]})
+        self.assertIn("TABLE_SCHEMA = 'shop'", migration.source_tools.queries[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+MetricStore appends, merges, the max_points cap and the NPZ/Parquet round trip.
+
+    python -m unittest tests.test_metric_store
+"""
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from tools.metric_store import MetricStore
+
+HAS_PARQUET = any(importlib.util.find_spec(engine) for engine in ("pyarrow", "fastparquet"))
+
+
+class MetricStoreTest(unittest.TestCase):
+
+    def test_appends_in_order_and_grows_past_the_initial_capacity(self):
+        store = MetricStore()
+        for start in range(0, 3000, 100):
+            store.append("db-1", "cpu", np.arange(start, start + 100) * 60.0, np.arange(start, start + 100, dtype=float))
+
+        times, values = store.series("db-1", "cpu")
+
+        self.assertEqual(len(times), 3000)
+        np.testing.assert_array_equal(values, np.arange(3000, dtype=float))
+        self.assertEqual(store.newest("db-1", "cpu"), 2999 * 60.0)
+        self.assertEqual(store.stats()["points"], 3000)
+
+    def test_merges_out_of_order_points_and_the_newest_duplicate_wins(self):
+        store = MetricStore()
+        store.append("db-1", "cpu", [60, 120, 180], [1.0, 2.0, 3.0])
+        store.append("db-1", "cpu", [150, 30, 120], [1.5, 0.5, 20.0]) # Unsorted, older and overlapping
+        store.append("db-1", "cpu", [180, 180], [30.0, 31.0]) # Duplicates within one append: the last one wins
+
+        times, values = store.series("db-1", "cpu")
+
+        np.testing.assert_array_equal(times, [30, 60, 120, 150, 180])
+        np.testing.assert_array_equal(values, [0.5, 1.0, 20.0, 1.5, 31.0])
+
+    def test_keeps_the_newest_max_points(self):
+        store = MetricStore(max_points=100)
+        store.append("db-1", "cpu", np.arange(80), np.arange(80, dtype=float))
+        store.append("db-1", "cpu", np.arange(80, 150), np.arange(80, 150, dtype=float))
+        store.append("db-1", "cpu", [10, 149], [-1.0, -2.0]) # A merge into the full series is capped too
+
+        times, values = store.series("db-1", "cpu")
+
+        self.assertEqual(len(times), 100)
+        np.testing.assert_array_equal(times, np.arange(50, 150))
+        self.assertEqual(values[-1], -2.0)
+        self.assertNotIn(10.0, times)
+
+    def test_series_since_and_unknown_series(self):
+        store = MetricStore()
+        store.append("db-1", "cpu", [60, 120, 180], [1.0, 2.0, 3.0])
+
+        times, values = store.series("db-1", "cpu", since=100)
+
+        np.testing.assert_array_equal(times, [120, 180])
+        self.assertEqual(len(store.series("db-2", "cpu")[0]), 0)
+        self.assertIsNone(store.newest("db-2", "cpu"))
+
+    def test_ingest_cloud_monitoring_points(self):
+        store = MetricStore()
+        store.ingest("db-1", "cpu", [{"points": [
+            {"interval": {"endTime": "2024-01-01T00:01:00Z"}, "value": {"doubleValue": 0.5}},
+            {"interval": {"endTime": "2024-01-01T00:00:00.000Z"}, "value": {"int64Value": "2"}}
+        ]}, {"points": []}])
+
+        times, values = store.series("db-1", "cpu")
+
+        np.testing.assert_array_equal(times, [1704067200.0, 1704067260.0])
+        np.testing.assert_array_equal(values, [2.0, 0.5])
+
+    def test_npz_round_trip(self):
+        self._round_trip("metrics.npz")
+
+    @unittest.skipUnless(HAS_PARQUET, "Parquet needs pyarrow or fastparquet")
+    def test_parquet_round_trip(self):
+        self._round_trip("metrics.parquet")
+
+    def _round_trip(self, name: str):
+        store = MetricStore()
+        store.append("db-1", "cpu", [60, 120], [0.25, 0.5])
+        store.append("db-1", "memory_utilization", [60], [0.75])
+        store.append("db-2", "cpu", [30, 90, 150], [1.0, np.nan, 3.0])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, name)
+            store.save(path)
+            loaded = MetricStore.load(path)
+
+        self.assertEqual(loaded.keys(), store.keys())
+        for instance, metric in store.keys():
+            for saved, restored in zip(store.series(instance, metric), loaded.series(instance, metric)):
+                np.testing.assert_array_equal(saved, restored)
+
+
+if __name__ == "__main__":
+    unittest.main()
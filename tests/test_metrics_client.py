@@ -0,0 +1,147 @@
+"""
+MetricsClient against a local fake of the Cloud Monitoring timeSeries.list endpoint: pagination, the
+high-water mark with overlap dedup, and the merge of backfilled older ranges.
+
+    python -m unittest tests.test_metrics_client
+"""
+import json
+import threading
+import time
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tools.metric_store import MetricStore
+from tools.metrics_client import METRIC_TYPES, MetricsClient, _parse_time, _rfc3339
+
+
+class FakeMonitoring:
+    """Serves {metric type: {series label: [(epoch seconds, value)]}}, pageSize series per page, newest point first."""
+
+    def __init__(self):
+        self.series = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.endpoint = f"http://127.0.0.1:{self.server.server_address[1]}/v3"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def add(self, metric: str, label: str, points: list):
+        with self.lock:
+            self.series.setdefault(METRIC_TYPES[metric][0], {}).setdefault(label, []).extend(points)
+
+    def handle(self, handler):
+        url = urllib.parse.urlparse(handler.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        metric_type = query["filter"].split('"')[1]
+        start, end = _parse_time(query["interval.startTime"]), _parse_time(query["interval.endTime"])
+        offset, page_size = int(query.get("pageToken", 0)), int(query["pageSize"])
+        with self.lock:
+            self.requests.append({"path": url.path, "metric_type": metric_type, "start": start, "end": end,
+                                  "page_token": query.get("pageToken"), "authorization": handler.headers["Authorization"]})
+            labels = sorted(self.series.get(metric_type, {}))
+            page = []
+            for label in labels[offset:offset + page_size]:
+                points = sorted((p for p in self.series[metric_type][label] if start <= p[0] <= end), reverse=True)
+                page.append({
+                    "metric": {"type": metric_type, "labels": {"state": label}},
+                    "resource": {"type": "cloudsql_database", "labels": {"database_id": "proj:db-1"}},
+                    "points": [{"interval": {"endTime": _rfc3339(t)}, "value": {"doubleValue": v}} for t, v in points]
+                })
+        body = {"timeSeries": page}
+        if offset + page_size < len(labels):
+            body["nextPageToken"] = str(offset + page_size)
+        data = json.dumps(body).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MetricsClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeMonitoring()
+        self.now = float(int(time.time()) // 60 * 60)
+        self.store = MetricStore()
+        self.client = MetricsClient("proj", "db-1", endpoint=self.fake.endpoint, access_token="test-token", page_size=2,
+                                    overlap_seconds=180, store=self.store)
+
+    def tearDown(self):
+        self.client.close()
+        self.fake.close()
+
+    def minutes_ago(self, *minutes) -> list:
+        return [(self.now - 60 * m, float(m)) for m in minutes]
+
+    def test_follows_pagination(self):
+        for label in ("a", "b", "c"):
+            self.fake.add("cpu_utilization", label, self.minutes_ago(1, 2, 3))
+
+        result = self.client.fetch(["cpu_utilization"], duration_hours=1)
+
+        series = result["cpu_utilization"]
+        self.assertEqual(sorted(s["metric"]["labels"]["state"] for s in series), ["a", "b", "c"])
+        self.assertEqual([p["value"]["doubleValue"] for p in series[0]["points"]], [1.0, 2.0, 3.0]) # Newest first
+        self.assertEqual([r["page_token"] for r in self.fake.requests], [None, "2"])
+        self.assertTrue(all(r["path"] == "/v3/projects/proj/timeSeries" for r in self.fake.requests))
+        self.assertTrue(all(r["authorization"] == "Bearer test-token" for r in self.fake.requests))
+        self.assertEqual(self.client.stats()["pages"], 2)
+        self.assertEqual(self.client.stats()["points_fetched"], 9)
+
+    def test_repeated_polls_fetch_from_the_high_water_mark_without_duplicates(self):
+        self.fake.add("cpu_utilization", "a", self.minutes_ago(10, 5, 2))
+        self.client.fetch(["cpu_utilization"], duration_hours=1)
+        self.fake.add("cpu_utilization", "a", [(self.now - 60, 1.0), (self.now, 0.0)])
+        self.fake.requests.clear()
+
+        result = self.client.fetch(["cpu_utilization"], duration_hours=1)
+
+        [request] = self.fake.requests
+        self.assertEqual(request["start"], self.now - 120 - 180) # High-water mark minus the overlap
+        points = result["cpu_utilization"][0]["points"]
+        self.assertEqual([p["value"]["doubleValue"] for p in points], [0.0, 1.0, 2.0, 5.0, 10.0])
+        self.assertEqual(self.client.stats()["points_fetched"], 5) # The re-read point at -2 min is not counted twice
+        self.assertEqual(self.client.stats()["high_water_marks"]["cpu_utilization"], _rfc3339(self.now))
+        times, _ = self.store.series("db-1", "cpu_utilization")
+        self.assertEqual(len(times), 5)
+
+    def test_longer_window_backfills_the_older_range_and_merges_it(self):
+        self.fake.add("cpu_utilization", "a", self.minutes_ago(150, 90, 30, 1))
+        first = self.client.fetch(["cpu_utilization"], duration_hours=1)
+        self.assertEqual(len(first["cpu_utilization"][0]["points"]), 2)
+        self.fake.requests.clear()
+
+        result = self.client.fetch(["cpu_utilization"], duration_hours=3)
+
+        older = [r for r in self.fake.requests if r["end"] < self.now - 3000]
+        self.assertEqual(len(older), 1) # Only the range before the first window is requested again in full
+        self.assertAlmostEqual(older[0]["start"], self.now - 3 * 3600, delta=120)
+        points = result["cpu_utilization"][0]["points"]
+        self.assertEqual([p["value"]["doubleValue"] for p in points], [1.0, 30.0, 90.0, 150.0])
+        self.assertEqual(self.client.latest("cpu_utilization")[0], sorted(self.minutes_ago(150, 90, 30, 1)))
+        _, values = self.store.series("db-1", "cpu_utilization")
+        self.assertEqual(list(values), [150.0, 90.0, 30.0, 1.0])
+
+    def test_unknown_metric(self):
+        with self.assertRaises(ValueError):
+            self.client.fetch(["queries_per_second"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+MySQLTools bulk loading against a fake bulk connection (multi-row INSERT path), without a server.
+
+    python -m unittest tests.test_mysql_tools
+"""
+import os
+import tempfile
+import unittest
+
+from tools.mysql_tools import MySQLTools, dump_file_table
+
+
+class FakeCursor:
+
+    def __init__(self, statements: list):
+        self.statements = statements
+
+    def executemany(self, query: str, rows: list):
+        self.statements.append((query, list(rows)))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self.statements)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class BulkLoadDirectoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dump_dir = self._tmp.name
+        self.connections = []
+        self.tools = MySQLTools("localhost", "user", "password", database="shop")
+        self.tools.bulk_connection = self._bulk_connection
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _bulk_connection(self):
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn, "insert"
+
+    def _write(self, name: str, content: str):
+        with open(os.path.join(self.dump_dir, name), "w") as f:
+            f.write(content)
+
+    def test_csv_chunk_loads_into_the_table_named_by_the_file(self):
+        self._write("shop.orders.00000.csv", 'id,note\n1,first\n2,"with, comma"\n3,\\N\n')
+        self._write("shop.orders-schema.sql", "CREATE TABLE orders (id INT, note TEXT);\n")
+        self._write("metadata", "Started dump at: 2024-01-01 00:00:00\n")
+        loaded = []
+
+        result = self.tools.bulk_load_directory(self.dump_dir, threads=2, on_file_loaded=loaded.append)
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["files"], 1)
+        self.assertEqual(result["rows"], 3)
+        self.assertEqual(loaded, [os.path.join(self.dump_dir, "shop.orders.00000.csv")])
+        [(query, rows)] = self.connections[0].statements
+        self.assertEqual(query, "INSERT IGNORE INTO `shop`.`orders` (`id`, `note`) VALUES (%s, %s)")
+        self.assertEqual(rows, [("1", "first"), ("2", "with, comma"), ("3", None)])
+
+    def test_dump_file_table(self):
+        self.assertEqual(dump_file_table("/dumps/shop.orders.00003.csv"), "orders")
+        self.assertEqual(dump_file_table("shop.orders.csv.gz"), "orders")
+        self.assertEqual(dump_file_table("shop.orders.sql"), "orders")
+        self.assertIsNone(dump_file_table("orders.csv"))
+
+
+if __name__ == "__main__":
+    unittest.main()
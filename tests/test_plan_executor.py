@@ -0,0 +1,52 @@
+"""
+run_headless with fake autogen agents: the assistant is only consulted when a step fails.
+
+    python -m unittest tests.test_plan_executor
+"""
+import types
+import unittest
+
+from tools.plan_executor import run_headless
+
+
+class FakeUserProxy:
+
+    def __init__(self, function_map: dict, reply: str = "All steps were completed."):
+        self.function_map = function_map
+        self.reply = reply
+        self.chats = []
+
+    def initiate_chat(self, assistant, cache=None, message: str = ""):
+        self.chats.append(message)
+        return types.SimpleNamespace(chat_history=[{"content": message}, {"content": self.reply}])
+
+
+class RunHeadlessTest(unittest.TestCase):
+
+    def test_completed_plan_skips_the_assistant(self):
+        user_proxy = FakeUserProxy({"count": lambda: {"status": "success", "rows": 3}})
+
+        result = run_headless([{"id": "count", "tool": "count"}], assistant=None, user_proxy=user_proxy)
+
+        self.assertEqual(result["status"], "completed")
+        self.assertEqual(user_proxy.chats, [])
+        self.assertIn("count (count): succeeded", result["details"])
+
+    def test_failed_step_fails_the_stage_after_the_recovery_chat(self):
+        def migrate():
+            raise RuntimeError("myloader exited with 1")
+
+        user_proxy = FakeUserProxy({"migrate": migrate, "validate": lambda: {"status": "success"}})
+        plan = [{"id": "migrate", "tool": "migrate"}, {"id": "validate", "tool": "validate", "after": ["migrate"]}]
+
+        result = run_headless(plan, assistant=None, user_proxy=user_proxy, instructions="Migrate the data.")
+
+        self.assertEqual(result["status"], "failed")
+        self.assertEqual(result["details"], "All steps were completed.")
+        self.assertEqual(result["plan"]["steps"]["migrate"]["status"], "failed")
+        self.assertEqual(len(user_proxy.chats), 1)
+        self.assertIn("myloader exited with 1", user_proxy.chats[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
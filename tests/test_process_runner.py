@@ -0,0 +1,96 @@
+"""
+ProcessRunner against a fake mydumper: a small script that prints mydumper-style log lines, then sleeps
+or exits with a given status.
+
+    python -m unittest tests.test_process_runner
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from tools.process_runner import ProcessRunner
+
+FAKE_MYDUMPER = """\
+import sys, time
+mode = sys.argv[1]
+out = sys.argv[2]
+print("** Message: Thread 1 dumping data for `shop`.`orders`", flush=True)
+with open(out + "/shop.orders.00000.sql", "w") as f:
+    f.write("INSERT INTO orders VALUES (1);\\n" * 100)
+print("** Message: Thread 1 wrote shop.orders.00000.sql with 100 rows", flush=True)
+print("** Message: Progress 1 of 2 tables", file=sys.stderr, flush=True)
+print("** Message: Finished dump of `shop`.`orders`", flush=True)
+if mode == "hang":
+    time.sleep(60)
+print("** (mydumper:1): WARNING **: Table `shop`.`customers` has no primary key", file=sys.stderr, flush=True)
+print("** Message: Progress 2 of 2 tables", file=sys.stderr, flush=True)
+sys.exit(3 if mode == "fail" else 0)
+"""
+
+
+class ProcessRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.output_dir = self._tmp.name
+        self.script = os.path.join(self.output_dir, "fake_mydumper.py")
+        with open(self.script, "w") as f:
+            f.write(FAKE_MYDUMPER)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _runner(self, mode: str, **kwargs) -> ProcessRunner:
+        command = [sys.executable, self.script, mode, self.output_dir]
+        return ProcessRunner(command, name="mydumper", output_dir=self.output_dir, report_interval=60, **kwargs)
+
+    def test_progress_events_and_stats(self):
+        events = []
+        result = self._runner("ok", on_event=events.append).run_sync()
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["returncode"], 0)
+        types = [event["type"] for event in events]
+        for expected in ("table_started", "chunk", "table_done", "warning"):
+            self.assertIn(expected, types)
+        chunk = next(event for event in events if event["type"] == "chunk")
+        self.assertEqual(chunk["file"], os.path.join(self.output_dir, "shop.orders.00000.sql"))
+        self.assertEqual(chunk["rows"], 100)
+
+        stats = result["stats"]
+        self.assertEqual(stats["chunks"], 1)
+        self.assertEqual(stats["rows"], 100)
+        self.assertEqual(stats["warnings"], 1)
+        self.assertEqual(stats["tables_done"], 1)
+        self.assertEqual(stats["bytes"], os.path.getsize(chunk["file"]))
+        self.assertEqual(stats["progress"], 1.0)
+        self.assertIn("Progress 2 of 2 tables", result["log"])
+
+    def test_cancel_terminates_the_process(self):
+        runner = self._runner("hang", kill_after=2)
+        started = threading.Event()
+        runner.on_event = lambda event: event["type"] == "table_done" and started.set()
+        threading.Thread(target=lambda: started.wait(10) and runner.cancel(), daemon=True).start()
+
+        begin = time.monotonic()
+        result = runner.run_sync()
+
+        self.assertEqual(result["status"], "cancelled")
+        self.assertNotEqual(result["returncode"], 0)
+        self.assertLess(time.monotonic() - begin, 30)
+        self.assertEqual(result["stats"]["progress"], 0.5)
+
+    def test_failure_raises_called_process_error(self):
+        with self.assertRaises(subprocess.CalledProcessError) as raised:
+            self._runner("fail").run_sync()
+
+        self.assertEqual(raised.exception.returncode, 3)
+        self.assertIn("no primary key", raised.exception.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
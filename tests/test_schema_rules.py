@@ -0,0 +1,134 @@
+"""
+SchemaRuleEngine conversions and the split_statements DDL splitter, on data/employees.sql and on a MySQL 5.7
+sample with MyISAM tables, latin1, DEFINER clauses, removed SQL modes and DELIMITER blocks.
+
+    python -m unittest tests.test_schema_rules
+"""
+import os
+import unittest
+
+from tools.ddl_tools import split_statements
+from tools.schema_rules import SchemaRuleEngine, join_statements
+
+EMPLOYEES_SQL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "employees.sql")
+
+LEGACY_SCHEMA = """\
+-- Dumped from MySQL 5.7; the comment has a ; in it
+SET @OLD_SQL_MODE=@@SQL_MODE, sql_mode='NO_AUTO_CREATE_USER,STRICT_TRANS_TABLES,NO_ENGINE_SUBSTITUTION';
+
+CREATE TABLE `customers` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `name` varchar(100) CHARACTER SET latin1 COLLATE latin1_swedish_ci NOT NULL,
+  `note` varchar(50) DEFAULT 'ENGINE=MyISAM; CHARSET=latin1',
+  `code` varbinary(8) COLLATE latin1_bin,
+  `since` year(2) DEFAULT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=MyISAM DEFAULT CHARSET=latin1 PACK_KEYS=1 ROW_FORMAT=FIXED;
+
+CREATE TABLE `order_lines` (
+  `order_id` int NOT NULL,
+  `line` int NOT NULL AUTO_INCREMENT,
+  PRIMARY KEY (`order_id`, `line`)
+) ENGINE=MyISAM;
+
+CREATE TABLE `remote_orders` (`id` int) ENGINE=FEDERATED CONNECTION='mysql://remote/shop/orders';
+
+SELECT 3 --1 AS not_a_comment;
+# hash comment;
+DELIMITER ;;
+CREATE DEFINER=`root`@`localhost` TRIGGER `customers_bi` BEFORE INSERT ON `customers` FOR EACH ROW
+BEGIN
+  SET NEW.name = TRIM(NEW.name); -- inner statements stay in the trigger
+  SET NEW.note = 'a;b';
+END ;;
+CREATE DEFINER=`admin`@`%` PROCEDURE `reset_password`(IN p varchar(40))
+BEGIN
+  UPDATE users SET hash = PASSWORD(p);
+END ;;
+DELIMITER ;
+CREATE ALGORITHM=UNDEFINED DEFINER=`root`@`localhost` SQL SECURITY DEFINER VIEW `v_customers` AS SELECT `id`, `name` FROM `customers`;
+"""
+
+
+class SplitStatementsTest(unittest.TestCase):
+
+    def test_employees_script(self):
+        with open(EMPLOYEES_SQL) as f:
+            statements = split_statements(f.read())
+
+        self.assertEqual(statements[:3], ["DROP DATABASE IF EXISTS employees", "CREATE DATABASE IF NOT EXISTS employees", "USE employees"])
+        tables = [s.split()[2] for s in statements if s.startswith("CREATE TABLE")]
+        self.assertEqual(tables, ["employees", "departments", "dept_manager", "dept_emp", "titles", "salaries"])
+        self.assertEqual(sum(s.startswith("CREATE OR REPLACE VIEW") for s in statements), 2)
+        self.assertIn("/*!50503 set default_storage_engine = InnoDB */", statements) # Versioned comments are statements
+        self.assertEqual(sum(s.startswith("source ") for s in statements), 12)
+        self.assertFalse(any(s.startswith(("--", "#")) or "shows only the current department" in s for s in statements))
+
+    def test_delimiters_quotes_and_comments(self):
+        statements = split_statements(LEGACY_SCHEMA)
+
+        self.assertEqual(len(statements), 8)
+        self.assertTrue(statements[0].startswith("SET @OLD_SQL_MODE"))
+        self.assertIn("DEFAULT 'ENGINE=MyISAM; CHARSET=latin1'", statements[1])
+        self.assertEqual(statements[4], "SELECT 3 --1 AS not_a_comment") # -- needs whitespace to start a comment
+        trigger = statements[5]
+        self.assertTrue(trigger.startswith("CREATE DEFINER=`root`@`localhost` TRIGGER"))
+        self.assertTrue(trigger.endswith("END"))
+        self.assertIn("SET NEW.name = TRIM(NEW.name);", trigger)
+        self.assertIn("SET NEW.note = 'a;b';", trigger)
+        self.assertTrue(statements[6].startswith("CREATE DEFINER=`admin`@`%` PROCEDURE"))
+        self.assertTrue(statements[7].startswith("CREATE ALGORITHM=UNDEFINED"))
+
+    def test_delimiter_line_ends_an_unterminated_statement(self):
+        self.assertEqual(split_statements("SELECT 1\nDELIMITER $$\nSELECT 2$$\nDELIMITER ;\nSELECT 3;"),
+                         ["SELECT 1", "SELECT 2", "SELECT 3"])
+
+
+class SchemaRuleEngineTest(unittest.TestCase):
+
+    def test_employees_schema_needs_no_rewrite(self):
+        with open(EMPLOYEES_SQL) as f:
+            result = SchemaRuleEngine().convert(f.read())
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["escalated"], [])
+        self.assertEqual(set(result["rule_counts"].values()), {0})
+        self.assertIn("CREATE TABLE salaries (", result["ddl"])
+
+    def test_legacy_schema(self):
+        result = SchemaRuleEngine().convert(LEGACY_SCHEMA)
+        ddl = result["ddl"]
+
+        self.assertEqual(result["status"], "needs_review")
+        self.assertEqual(result["converted"], 5)
+        reasons = {e["statement"].split("`")[1]: e["reason"] for e in result["escalated"]}
+        self.assertEqual(set(reasons), {"order_lines", "remote_orders", "admin"})
+        self.assertIn("AUTO_INCREMENT column line", reasons["order_lines"])
+        self.assertIn("FEDERATED", reasons["remote_orders"])
+        self.assertIn("PASSWORD()", reasons["admin"])
+
+        self.assertIn("sql_mode='STRICT_TRANS_TABLES,NO_ENGINE_SUBSTITUTION'", ddl)
+        self.assertIn("`name` varchar(100) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL", ddl)
+        self.assertIn("`code` varbinary(8) COLLATE utf8mb4_bin", ddl)
+        self.assertIn("`since` YEAR DEFAULT NULL", ddl)
+        self.assertIn(") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;", ddl)
+        self.assertIn("DEFAULT 'ENGINE=MyISAM; CHARSET=latin1'", ddl) # Quoted text is never rewritten
+        self.assertNotIn("PACK_KEYS", ddl)
+        self.assertNotIn("ROW_FORMAT", ddl)
+        self.assertNotIn("DEFINER=`", ddl)
+        self.assertIn("CREATE TRIGGER `customers_bi`", ddl)
+        self.assertIn("SQL SECURITY DEFINER VIEW", ddl) # Only the DEFINER= clause goes
+        self.assertEqual(result["rule_counts"], {"innodb_engine": 1, "utf8mb4": 1, "removed_sql_modes": 1,
+                                                 "strip_definer": 2, "removed_features": 1})
+
+    def test_converted_script_splits_back_into_the_same_statements(self):
+        result = SchemaRuleEngine().convert(LEGACY_SCHEMA)
+        statements = split_statements(result["ddl"])
+
+        self.assertEqual(len(statements), result["converted"])
+        self.assertIn("DELIMITER ;;\n", result["ddl"])
+        self.assertEqual(split_statements(join_statements(statements)), statements)
+
+
+if __name__ == "__main__":
+    unittest.main()
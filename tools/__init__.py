@@ -0,0 +1,41 @@
+"""
+The tools used by the agents. The main classes can be imported from the package (`from tools import
+MySQLTools`); like the agents, each is imported on first access (PEP 562), so importing one tool does not
+load the dependencies of the others (mysql.connector, numpy/pandas, pymysqlreplication, zstandard).
+"""
+import importlib
+
+_EXPORTS = {
+    "AnomalyEngine": "tools.anomaly_engine",
+    "BinlogCatchUp": "tools.binlog_cdc",
+    "DataComparisonTools": "tools.data_comparison_tools",
+    "DeferredIndexBuilder": "tools.ddl_tools",
+    "DirectMigration": "tools.direct_migration",
+    "GcpCliTools": "tools.gcp_cli_tools",
+    "LLMCache": "tools.llm_cache",
+    "MetricStore": "tools.metric_store",
+    "MetricsClient": "tools.metrics_client",
+    "MigrationManifest": "tools.migration_manifest",
+    "MigrationPlanner": "tools.migration_planner",
+    "MonitoringDaemon": "tools.monitoring_daemon",
+    "MonitoringTools": "tools.monitoring_tools",
+    "MySQLTools": "tools.mysql_tools",
+    "PipelinedMigration": "tools.migration_pipeline",
+    "PlanExecutor": "tools.plan_executor",
+    "SchemaRuleEngine": "tools.schema_rules",
+    "StageGraph": "tools.stage_graph",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value # Later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
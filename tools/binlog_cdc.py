@@ -0,0 +1,213 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pymysqlreplication import BinLogStreamReader
+from pymysqlreplication.event import HeartbeatLogEvent, QueryEvent, XidEvent
+from pymysqlreplication.row_event import DeleteRowsEvent, UpdateRowsEvent, WriteRowsEvent
+from tools.mysql_tools import MySQLTools
+
+
+class BinlogCatchUp:
+    """
+    Change-data-capture catch-up from the source binlog into the target after a snapshot load.
+
+    Row-based events are streamed from the earliest snapshot position. Events of a table are applied only
+    after that table's own snapshot position, so per-table dumps taken at different moments all converge.
+    Changes are collapsed per primary key, partitioned by key across workers and applied in one batched
+    transaction per worker, which keeps the per-row order while applying in parallel. Batches are only cut at
+    source commits, so a flush never applies part of a source transaction, and they are applied with foreign
+    key checks off since the partitions may apply a child row before its parent.
+
+    Requires binlog_format=ROW and, on MySQL 8.0, binlog_row_metadata=FULL on the source so events
+    carry column names.
+    """
+
+    def __init__(self, source_db_config: dict, target_db_config: dict, snapshot_positions: dict, workers: int = 4,
+                 batch_size: int = 1000, flush_interval: float = 1.0, server_id: int = None, checkpoint_path: str = None):
+        self.source_db_config = source_db_config
+        self.target_db_config = target_db_config
+        # {table: {"log_file": ..., "log_pos": ...}} as returned by read_snapshot_position
+        self.snapshot_positions = snapshot_positions
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.server_id = server_id or 1000 + os.getpid() % 100000
+        self.checkpoint_path = checkpoint_path
+        self.target_tools = MySQLTools(**target_db_config)
+        self._primary_keys = {}
+        self._stats_lock = threading.Lock()
+        self.stats = {"events": 0, "rows_applied": 0, "batches": 0, "lag_seconds": None, "position": None}
+
+    def run(self, stop_event: threading.Event = None, max_lag_seconds: float = None, timeout_seconds: float = None,
+            report_interval: float = 10.0) -> dict:
+        """
+        Applies changes until stop_event is set (e.g. once writes are frozen for cutover), until the lag drops
+        to max_lag_seconds if given, or until timeout_seconds elapse. Returns the final position and stats.
+        """
+        start = self._start_position()
+        stream = BinLogStreamReader(
+            connection_settings={
+                "host": self.source_db_config['host'],
+                "port": self.source_db_config['port'],
+                "user": self.source_db_config['user'],
+                "passwd": self.source_db_config['password']
+            },
+            server_id=self.server_id,
+            only_events=[WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent, XidEvent, QueryEvent, HeartbeatLogEvent],
+            only_schemas=[self.source_db_config['database']],
+            only_tables=list(self.snapshot_positions),
+            log_file=start["log_file"],
+            log_pos=start["log_pos"],
+            resume_stream=True,
+            blocking=True,
+            slave_heartbeat=self.flush_interval # Heartbeats let the loop flush and check for stop while idle
+        )
+        print(f"Starting binlog catch-up from {start['log_file']}:{start['log_pos']}...")
+        started = last_flush = last_report = time.monotonic()
+        # Changes of the source transaction in progress move to pending at its commit
+        pending, uncommitted, last_event_time = {}, {}, None
+        # Checkpoints sit on transaction commits: resuming in the middle of a transaction would miss its table map.
+        # Replaying the rows after the last commit is harmless since changes are applied as idempotent upserts.
+        position = (start["log_file"], start["log_pos"])
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for event in stream:
+                    now = time.monotonic()
+                    if isinstance(event, XidEvent) or (isinstance(event, QueryEvent) and _is_commit(event)):
+                        # XID ends an InnoDB transaction; a COMMIT query ends one of a non-transactional table
+                        position, last_event_time = (stream.log_file, event.packet.log_pos), event.timestamp
+                        pending.update(uncommitted)
+                        uncommitted = {}
+                    elif isinstance(event, QueryEvent):
+                        pass # BEGIN and DDL
+                    elif not isinstance(event, HeartbeatLogEvent):
+                        if (stream.log_file, event.packet.log_pos) > self._table_position(event.table):
+                            self._collect(event, uncommitted)
+                        last_event_time = event.timestamp
+                        with self._stats_lock:
+                            self.stats["events"] += 1
+
+                    idle = isinstance(event, HeartbeatLogEvent)
+                    if len(pending) >= self.batch_size or (pending and (idle or now - last_flush >= self.flush_interval)):
+                        self._flush(pool, pending, position)
+                        pending, last_flush = {}, now
+
+                    if idle and not pending and not uncommitted:
+                        lag = 0.0 # The source had nothing new to send
+                    elif last_event_time:
+                        lag = max(0.0, time.time() - last_event_time)
+                    else:
+                        lag = None
+                    with self._stats_lock:
+                        self.stats["lag_seconds"] = lag
+                    if now - last_report >= report_interval:
+                        print(f"Binlog catch-up at {position[0]}:{position[1]}, lag {lag}s, {self.stats['rows_applied']} rows applied.")
+                        last_report = now
+
+                    if stop_event is not None and stop_event.is_set():
+                        break
+                    if max_lag_seconds is not None and lag is not None and lag <= max_lag_seconds and not pending and not uncommitted:
+                        break
+                    if timeout_seconds is not None and now - started >= timeout_seconds:
+                        break
+                if pending:
+                    self._flush(pool, pending, position)
+        finally:
+            stream.close()
+
+        return {"status": "success", "log_file": position[0], "log_pos": position[1], **self.get_stats()}
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def _start_position(self) -> dict:
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        return min(self.snapshot_positions.values(), key=lambda p: (p["log_file"], p["log_pos"]))
+
+    def _table_position(self, table: str) -> tuple:
+        position = self.snapshot_positions[table]
+        return position["log_file"], position["log_pos"]
+
+    def _primary_key(self, table: str) -> list:
+        if table not in self._primary_keys:
+            rows = self.target_tools.execute_query(
+                f"SELECT COLUMN_NAME AS name FROM information_schema.KEY_COLUMN_USAGE "
+                f"WHERE TABLE_SCHEMA = '{self.target_db_config['database']}' AND TABLE_NAME = '{table}' "
+                f"AND CONSTRAINT_NAME = 'PRIMARY' ORDER BY ORDINAL_POSITION",
+                fetch_all=True
+            )
+            if not rows:
+                raise ValueError(f"Table {table} has no primary key; binlog changes cannot be applied by key.")
+            self._primary_keys[table] = [row['name'] for row in rows]
+        return self._primary_keys[table]
+
+    def _collect(self, event, pending: dict):
+        """Collapses row changes into the latest state per (table, primary key)."""
+        pk = self._primary_key(event.table)
+        for row in event.rows:
+            if isinstance(event, WriteRowsEvent):
+                values = row["values"]
+                pending[(event.table, tuple(values[c] for c in pk))] = values
+            elif isinstance(event, UpdateRowsEvent):
+                before, after = row["before_values"], row["after_values"]
+                old_key = tuple(before[c] for c in pk)
+                new_key = tuple(after[c] for c in pk)
+                if old_key != new_key:
+                    pending[(event.table, old_key)] = None
+                pending[(event.table, new_key)] = after
+            else:
+                pending[(event.table, tuple(row["values"][c] for c in pk))] = None
+
+    def _flush(self, pool, pending: dict, position: tuple):
+        partitions = [[] for _ in range(self.workers)]
+        for key, values in pending.items():
+            partitions[hash(key) % self.workers].append((key, values))
+        applied = sum(f.result() for f in [pool.submit(self._apply, p) for p in partitions if p])
+        with self._stats_lock:
+            self.stats["rows_applied"] += applied
+            self.stats["batches"] += 1
+            self.stats["position"] = f"{position[0]}:{position[1]}"
+        if self.checkpoint_path:
+            with open(self.checkpoint_path + ".tmp", "w") as f:
+                json.dump({"log_file": position[0], "log_pos": position[1]}, f)
+            os.replace(self.checkpoint_path + ".tmp", self.checkpoint_path)
+
+    def _apply(self, changes: list) -> int:
+        """Applies one partition's upserts and deletes in a single transaction."""
+        database = self.target_db_config['database']
+        upserts, deletes = {}, {}
+        for (table, key), values in changes:
+            if values is None:
+                deletes.setdefault(table, []).append(key)
+            else:
+                upserts.setdefault((table, tuple(values)), []).append(tuple(values.values()))
+
+        statements = []
+        for table, keys in deletes.items():
+            pk = self._primary_key(table)
+            placeholders = ", ".join(["(" + ", ".join(["%s"] * len(pk)) + ")"] * len(keys))
+            statements.append((
+                f"DELETE FROM {database}.`{table}` WHERE ({', '.join(f'`{c}`' for c in pk)}) IN ({placeholders})",
+                [[v for key in keys for v in key]]
+            ))
+        for (table, columns), rows in upserts.items():
+            column_list = ", ".join(f"`{c}`" for c in columns)
+            updates = ", ".join(f"`{c}` = VALUES(`{c}`)" for c in columns)
+            statements.append((
+                f"INSERT INTO {database}.`{table}` ({column_list}) VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON DUPLICATE KEY UPDATE {updates}",
+                rows
+            ))
+        # Partitions commit independently, so a child row may land before its parent
+        self.target_tools.run_in_transaction(statements, foreign_key_checks=False)
+        return len(changes)
+
+
+def _is_commit(event) -> bool:
+    query = event.query.decode() if isinstance(event.query, bytes) else event.query
+    return query.strip().upper() == "COMMIT"
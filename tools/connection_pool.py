@@ -0,0 +1,205 @@
+import mysql.connector
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_POOL_SIZE = 16
+
+# Process-wide registry: every MySQLTools pointing at the same (host, port, user, database)
+# shares one pool, so agents creating several tool objects do not each pay a TLS handshake.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class MySQLConnectionPool:
+    """Bounded, thread-safe pool of MySQL connections for one (host, port, user, database)."""
+
+    def __init__(self, connect_args: dict, max_size: int = DEFAULT_POOL_SIZE, idle_timeout: float = 300.0,
+                 checkout_timeout: float = 30.0, health_check_after: float = 5.0):
+        self.connect_args = connect_args
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        # Connections returned more recently than this are handed out without a ping
+        self.health_check_after = health_check_after
+        self._idle = []  # (connection, returned_at), most recently returned last
+        self._size = 0  # open connections, idle or checked out
+        self._closed = False  # Set by close(): released connections are closed instead of kept
+        self._cond = threading.Condition()
+        self._counters = {
+            "created": 0,
+            "reused": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "failed_health_checks": 0,
+            "closed_idle": 0,
+            "discarded": 0
+        }
+
+    def acquire(self):
+        """Checks out a healthy connection, opening a new one if the pool is below max_size."""
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            conn, returned_at = None, None
+            with self._cond:
+                while True:
+                    self._evict_idle_locked()
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No MySQL connection available within {self.checkout_timeout}s "
+                                           f"(pool size {self.max_size})")
+                    self._counters["waits"] += 1
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    conn = mysql.connector.connect(**self.connect_args)
+                except Exception:
+                    self._forget()
+                    raise
+                with self._cond:
+                    self._counters["created"] += 1
+                    self._counters["checkouts"] += 1
+                return conn
+
+            if time.monotonic() - returned_at < self.health_check_after or self._is_healthy(conn):
+                with self._cond:
+                    self._counters["reused"] += 1
+                    self._counters["checkouts"] += 1
+                return conn
+
+            with self._cond:
+                self._counters["failed_health_checks"] += 1
+            self._close_quietly(conn)
+            self._forget()
+
+    def release(self, conn, discard: bool = False):
+        """Returns a connection to the pool, or closes it if it is broken, has pending results or the pool was closed."""
+        if discard or conn.unread_result:
+            self._close_quietly(conn)
+            with self._cond:
+                self._counters["discarded"] += 1
+            self._forget()
+            return
+        with self._cond:
+            if not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        self._close_quietly(conn)
+        self._forget()
+
+    @contextmanager
+    def connection(self):
+        """Context manager around acquire/release; connections that hit a connection-level error are discarded."""
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    @property
+    def closed(self) -> bool:
+        """True once close() was called; get_pool() then hands out a new pool for the same server."""
+        return self._closed
+
+    def stats(self) -> dict:
+        """Returns pool-level statistics."""
+        with self._cond:
+            return {
+                "host": self.connect_args.get("host"),
+                "port": self.connect_args.get("port"),
+                "user": self.connect_args.get("user"),
+                "database": self.connect_args.get("database"),
+                "max_size": self.max_size,
+                "open": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                **self._counters
+            }
+
+    def close(self):
+        """Closes all idle connections; checked-out connections are closed when released."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def _evict_idle_locked(self):
+        # Idle connections are ordered by return time, so expired ones are at the front
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            conn, _ = self._idle.pop(0)
+            self._size -= 1
+            self._counters["closed_idle"] += 1
+            self._close_quietly(conn)
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def get_pool(host, user, password, database=None, port=3306, max_size: int = DEFAULT_POOL_SIZE) -> MySQLConnectionPool:
+    """Returns the shared pool for (host, port, user, database), creating it on first use."""
+    key = (host, port, user, database)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = MySQLConnectionPool(
+                connect_args={
+                    "host": host,
+                    "user": user,
+                    "password": password,
+                    "database": database,
+                    "port": port,
+                    "autocommit": True, # Pooled connections must not carry an open snapshot between borrowers
+                    "ssl_mode": "VERIFY_IDENTITY" # Enforce SSL [4]
+                },
+                max_size=max_size
+            )
+        return pool
+
+
+def pool_stats() -> list:
+    """Returns statistics for every pool in this process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def close_all_pools():
+    """Closes the idle connections of every pool, e.g. at the end of a migration run."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -1,28 +1,81 @@
-import pandas as pd
+import math
+import os
+import random
+import time
+from statistics import NormalDist
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from tools.mysql_tools import MySQLTools
 
+INTEGER_TYPES = ("tinyint", "smallint", "mediumint", "int", "bigint")
+NUMERIC_TYPES = INTEGER_TYPES + ("decimal", "float", "double")
+STRING_TYPES = ("char", "varchar", "tinytext", "text", "mediumtext", "longtext", "enum", "set")
+BINARY_TYPES = ("binary", "varbinary", "tinyblob", "blob", "mediumblob", "longblob")
+ORDERED_TYPES = NUMERIC_TYPES + STRING_TYPES + ("binary", "varbinary", "date", "datetime", "timestamp", "time", "year")
+PCSA_PHI = 0.77351  # Flajolet-Martin bias correction
+
 class DataComparisonTools:
     """Tools for comparing data between source and target databases."""
 
     @staticmethod
-    def compare_row_counts(source_db_conn: MySQLTools, target_db_conn: MySQLTools, database_name: str) -> dict:
-        """Compares row counts for all tables between source and target."""
-        comparison_results = {}
-        source_tables = source_db_conn.execute_query(f"SHOW TABLES FROM {database_name}", fetch_all=True)
-
-        for table_dict in source_tables:
-            table_name = list(table_dict.values())
-            source_count = source_db_conn.execute_query(f"SELECT COUNT(*) FROM {database_name}.`{table_name}`")
-            target_count = target_db_conn.execute_query(f"SELECT COUNT(*) FROM {database_name}.`{table_name}`")
-            
-            status = "MATCH" if source_count == target_count else "MISMATCH"
-            comparison_results[table_name] = {
-                "source_rows": source_count,
-                "target_rows": target_count,
-                "status": status
+    def compare_row_counts(source_db_conn: MySQLTools, target_db_conn: MySQLTools, database_name: str, max_workers: int = 8,
+                           mode: str = "exact", tolerance: float = 0.1, critical_tables: list = None) -> dict:
+        """
+        Compares row counts for all tables between source and target, running the counts of both sides
+        concurrently on up to max_workers connections, largest tables first.
+        mode="tiered" first compares the information_schema TABLE_ROWS estimates and runs exact counts only
+        for critical_tables and tables whose estimates differ by more than tolerance (a fraction of the larger one).
+        """
+        if mode not in ("exact", "tiered"):
+            raise ValueError(f"Unsupported mode: {mode}. Choose from ['exact', 'tiered']")
+        source_estimates = DataComparisonTools._table_row_estimates(source_db_conn, database_name)
+        target_estimates = DataComparisonTools._table_row_estimates(target_db_conn, database_name)
+        critical_tables = set(critical_tables or [])
+
+        comparison_results, exact_tables = {}, []
+        for table_name, source_estimate in source_estimates.items():
+            if table_name not in target_estimates:
+                comparison_results[table_name] = {"source_rows": source_estimate, "target_rows": None, "status": "MISSING_IN_TARGET",
+                                                  "method": "estimate"}
+                continue
+            target_estimate = target_estimates[table_name]
+            if mode == "exact" or table_name in critical_tables or \
+                    abs(source_estimate - target_estimate) > tolerance * max(source_estimate, target_estimate):
+                exact_tables.append(table_name)
+            else:
+                comparison_results[table_name] = {"source_rows": source_estimate, "target_rows": target_estimate,
+                                                  "status": "ESTIMATE_MATCH", "method": "estimate"}
+
+        def count(db_conn, table_name):
+            return db_conn.execute_query(f"SELECT COUNT(*) AS row_count FROM {database_name}.`{table_name}`")['row_count']
+
+        exact_tables.sort(key=lambda t: source_estimates[t], reverse=True)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                table_name: (executor.submit(count, source_db_conn, table_name), executor.submit(count, target_db_conn, table_name))
+                for table_name in exact_tables
             }
+            for table_name, (source_future, target_future) in futures.items():
+                try:
+                    source_count, target_count = source_future.result(), target_future.result()
+                    comparison_results[table_name] = {
+                        "source_rows": source_count,
+                        "target_rows": target_count,
+                        "status": "MATCH" if source_count == target_count else "MISMATCH",
+                        "method": "exact"
+                    }
+                except Exception as e:
+                    comparison_results[table_name] = {"status": "ERROR", "message": str(e), "method": "exact"}
         return comparison_results
 
+    @staticmethod
+    def _table_row_estimates(db_conn: MySQLTools, database: str) -> dict:
+        """{table: estimated rows} for the base tables of a database, from information_schema.TABLES."""
+        rows = db_conn.execute_statements(db_conn.fresh_statistics_statements() + [
+            f"SELECT TABLE_NAME AS table_name, TABLE_ROWS AS table_rows FROM information_schema.TABLES "
+            f"WHERE TABLE_SCHEMA = '{database}' AND TABLE_TYPE = 'BASE TABLE'"
+        ])
+        return {row['table_name']: int(row['table_rows'] or 0) for row in rows}
+
     @staticmethod
     def compare_table_checksums(source_db_conn: MySQLTools, target_db_conn: MySQLTools, database_name: str, table_name: str) -> dict:
         """Compares checksums for a specific table."""
@@ -44,34 +97,536 @@ class DataComparisonTools:
             return {"table": table_name, "status": "ERROR", "message": str(e)}
 
     @staticmethod
-    def detect_data_anomalies(db_conn: MySQLTools, database_name: str, table_name: str, column_name: str, anomaly_threshold: float = 3.0) -> dict:
+    def compare_table_checksums_chunked(source_db_conn: MySQLTools, target_db_conn: MySQLTools, database_name: str, table_name: str,
+                                        chunk_size: int = 100000, max_workers: int = None, row_level_threshold: int = 1000,
+                                        max_reported_rows: int = 1000, checkout_retries: int = 5) -> dict:
+        """
+        Compares a table in primary-key range chunks instead of one CHECKSUM TABLE per side.
+        Every chunk is hashed with BIT_XOR(CRC32(...)) on source and target concurrently; mismatching
+        chunks are bisected until they are small enough to diff row by row, so the offending
+        primary keys are reported. Threads are capped at the connection pools' size, and a chunk that
+        times out waiting for a pooled connection waits again, up to checkout_retries times.
+        """
+        try:
+            column_types, pk_columns = DataComparisonTools._table_columns(source_db_conn, database_name, table_name)
+            if not pk_columns:
+                return {"table": table_name, "status": "NO_PRIMARY_KEY",
+                        "message": "Chunked comparison needs a primary key; use compare_table_checksums instead."}
+            if column_types[pk_columns[0]] not in INTEGER_TYPES:
+                return {"table": table_name, "status": "UNSUPPORTED",
+                        "message": f"Leading primary key column `{pk_columns[0]}` is {column_types[pk_columns[0]]}, chunking needs an integer key."}
+
+            lead = pk_columns[0]
+            bounds_query = f"SELECT MIN(`{lead}`) AS lo, MAX(`{lead}`) AS hi FROM {database_name}.`{table_name}`"
+            bounds = [b for b in (source_db_conn.execute_query(bounds_query), target_db_conn.execute_query(bounds_query))
+                      if b and b['lo'] is not None]
+            if not bounds:
+                return {"table": table_name, "status": "MATCH", "chunks_checked": 0, "mismatched_rows_found": 0, "mismatched_rows": []}
+            lo = min(int(b['lo']) for b in bounds)
+            hi = max(int(b['hi']) for b in bounds)
+
+            estimate = source_db_conn.execute_query(
+                f"SELECT TABLE_ROWS AS table_rows FROM information_schema.TABLES "
+                f"WHERE TABLE_SCHEMA = '{database_name}' AND TABLE_NAME = '{table_name}'"
+            )
+            estimated_rows = (estimate or {}).get('table_rows') or (hi - lo + 1)
+            chunk_count = max(1, -(-int(estimated_rows) // chunk_size))
+            step = max(1, -(-(hi - lo + 1) // chunk_count))
+            ranges = [(start, min(start + step - 1, hi)) for start in range(lo, hi + 1, step)]
+
+            row_crc = DataComparisonTools._row_crc_expression(column_types)
+            chunk_query = (f"SELECT COUNT(*) AS row_count, COALESCE(BIT_XOR({row_crc}), 0) AS crc "
+                           f"FROM {database_name}.`{table_name}` WHERE `{lead}` BETWEEN {{lo}} AND {{hi}}")
+            pk_select = ", ".join(f"`{c}`" for c in pk_columns)
+            rows_query = (f"SELECT {pk_select}, {row_crc} AS row_crc "
+                          f"FROM {database_name}.`{table_name}` WHERE `{lead}` BETWEEN {{lo}} AND {{hi}}")
+
+            def chunk_hash(db_conn, chunk):
+                return db_conn.execute_query(chunk_query.format(lo=chunk[0], hi=chunk[1]))
+
+            def chunk_rows(db_conn, chunk):
+                rows = db_conn.execute_query(rows_query.format(lo=chunk[0], hi=chunk[1]), fetch_all=True)
+                return {tuple(row[c] for c in pk_columns): row['row_crc'] for row in rows}
+
+            def pooled(work, db_conn, chunk):
+                # Other tools can hold the shared pool's connections; waiting again beats failing the whole table
+                for attempt in range(checkout_retries + 1):
+                    try:
+                        return work(db_conn, chunk)
+                    except TimeoutError:
+                        if attempt == checkout_retries:
+                            raise
+
+            # Each thread runs one query per side at a time, so more threads than pooled connections only queue
+            pool_size = min(source_db_conn.pool_stats()["max_size"], target_db_conn.pool_stats()["max_size"])
+            workers = max(1, min(max_workers or os.cpu_count() or 4, pool_size))
+
+            chunks_checked = 0
+            mismatched_rows = []
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # Every pending chunk maps to its (kind, source future, target future)
+                pending = {}
+
+                def submit(kind, chunk):
+                    work = chunk_hash if kind == "hash" else chunk_rows
+                    pending[chunk] = (kind, pool.submit(pooled, work, source_db_conn, chunk), pool.submit(pooled, work, target_db_conn, chunk))
+
+                for chunk in ranges:
+                    submit("hash", chunk)
+
+                while pending:
+                    wait([f for _, s, t in pending.values() for f in (s, t)], return_when=FIRST_COMPLETED)
+                    for chunk, (kind, source_future, target_future) in list(pending.items()):
+                        if not (source_future.done() and target_future.done()):
+                            continue
+                        del pending[chunk]
+                        source_result, target_result = source_future.result(), target_future.result()
+
+                        if kind == "rows":
+                            mismatched_rows.extend(DataComparisonTools._diff_rows(pk_columns, source_result, target_result))
+                            continue
+
+                        chunks_checked += 1
+                        if (source_result['row_count'], source_result['crc']) == (target_result['row_count'], target_result['crc']):
+                            continue
+                        chunk_rows_count = max(source_result['row_count'], target_result['row_count'])
+                        if chunk[0] == chunk[1] or chunk_rows_count <= row_level_threshold:
+                            submit("rows", chunk)
+                        else:
+                            middle = (chunk[0] + chunk[1]) // 2
+                            submit("hash", (chunk[0], middle))
+                            submit("hash", (middle + 1, chunk[1]))
+
+            mismatched_rows.sort(key=lambda r: tuple(r['primary_key'].values()))
+            return {
+                "table": table_name,
+                "status": "MISMATCH" if mismatched_rows else "MATCH",
+                "chunks_checked": chunks_checked,
+                "mismatched_rows_found": len(mismatched_rows),
+                "mismatched_rows": mismatched_rows[:max_reported_rows],
+                "truncated": len(mismatched_rows) > max_reported_rows
+            }
+        except Exception as e:
+            return {"table": table_name, "status": "ERROR", "message": str(e)}
+
+    @staticmethod
+    def compare_table_sample(source_db_conn: MySQLTools, target_db_conn: MySQLTools, database_name: str, table_name: str,
+                             sample_size: int = 10000, time_budget_seconds: float = None, strata: int = 100, batch_size: int = 500,
+                             confidence: float = 0.95, max_mismatch_rate: float = 0.001, max_workers: int = 8,
+                             max_reported_rows: int = 100, seed: int = None) -> dict:
+        """
+        Estimates a table's mismatch rate from a uniform random sample of rows instead of comparing every row.
+        Distinct random values of the leading primary key column are drawn, spread over strata of equal key width,
+        and each batch of them is looked up on both sides with one `lead IN (...)` index seek per side; every row
+        whose leading key was drawn is compared column by column, so each row, on composite keys too, has the same
+        chance of being sampled whatever the gaps in the key. Rows found on only one side count as mismatches.
+        The number of keys drawn comes from MIN/MAX of the key and the TABLE_ROWS estimate, so no query scans
+        the table. Sampling stops at sample_size rows or when time_budget_seconds runs out, whichever comes first;
+        keys are probed in random order, so a sample cut short is still uniform.
+        Returns the mismatch rate with a Wilson confidence interval and a verdict: GO when the upper bound is
+        within max_mismatch_rate, NO_GO when the lower bound exceeds it, otherwise INCONCLUSIVE. Rows sharing a
+        leading key are sampled together, so on composite keys the interval is somewhat optimistic.
+        """
+        try:
+            started = time.monotonic()
+            column_types, pk_columns = DataComparisonTools._table_columns(source_db_conn, database_name, table_name)
+            if not pk_columns:
+                return {"table": table_name, "status": "NO_PRIMARY_KEY", "message": "Sampling needs a primary key."}
+            lead = pk_columns[0]
+            if column_types[lead] not in INTEGER_TYPES:
+                return {"table": table_name, "status": "UNSUPPORTED",
+                        "message": f"Leading primary key column `{lead}` is {column_types[lead]}, sampling needs an integer key."}
+            bounds = source_db_conn.execute_query(
+                f"SELECT MIN(`{lead}`) AS lo, MAX(`{lead}`) AS hi FROM {database_name}.`{table_name}`"
+            )
+            if not bounds or bounds['lo'] is None:
+                return {"table": table_name, "status": "NO_DATA"}
+            lo, hi = int(bounds['lo']), int(bounds['hi'])
+            span = hi - lo + 1
+            estimate = source_db_conn.execute_query(
+                f"SELECT TABLE_ROWS AS table_rows FROM information_schema.TABLES "
+                f"WHERE TABLE_SCHEMA = '{database_name}' AND TABLE_NAME = '{table_name}'"
+            )
+            table_rows = int((estimate or {}).get('table_rows') or 0) or span
+
+            # Twice the keys the estimate says the sample needs, as TABLE_ROWS can be well off; unused keys are never probed
+            key_count = min(span, math.ceil(sample_size * span / table_rows) * 2 + batch_size)
+            rng = random.Random(seed)
+            strata = max(1, min(strata, key_count))
+            edges = [lo + span * i // strata for i in range(strata + 1)]
+            keys = []
+            for start, stop in zip(edges, edges[1:]):
+                share = key_count * (stop - start) / span
+                keys += rng.sample(range(start, stop), min(stop - start, int(share) + (rng.random() < share - int(share))))
+            rng.shuffle(keys)
+            batches = [keys[i:i + batch_size] for i in range(0, len(keys), batch_size)]
+
+            columns = ", ".join(f"`{c}`" for c in column_types)
+
+            def compare_batch(batch):
+                query = (f"SELECT {columns} FROM {database_name}.`{table_name}` "
+                         f"WHERE `{lead}` IN ({', '.join(str(key) for key in batch)})")
+                return tuple({tuple(row[c] for c in pk_columns): row for row in db_conn.execute_query(query, fetch_all=True)}
+                             for db_conn in (source_db_conn, target_db_conn))
+
+            sampled, mismatched_rows = 0, []
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                pending, next_batch = set(), 0
+                while pending or next_batch < len(batches):
+                    wanted = sampled < sample_size and (time_budget_seconds is None or time.monotonic() - started < time_budget_seconds)
+                    while wanted and next_batch < len(batches) and len(pending) < max_workers:
+                        pending.add(pool.submit(compare_batch, batches[next_batch]))
+                        next_batch += 1
+                    if not wanted:
+                        next_batch = len(batches)
+                    if not pending:
+                        break
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        source_rows, target_rows = future.result()
+                        sampled += len(source_rows.keys() | target_rows.keys())
+                        for key in target_rows.keys() - source_rows.keys():
+                            mismatched_rows.append({"primary_key": dict(zip(pk_columns, key)), "issue": "MISSING_IN_SOURCE"})
+                        for key, row in source_rows.items():
+                            target_row = target_rows.get(key)
+                            if target_row is None:
+                                mismatched_rows.append({"primary_key": dict(zip(pk_columns, key)), "issue": "MISSING_IN_TARGET"})
+                                continue
+                            different = [c for c in column_types if not DataComparisonTools._profile_values_equal(row[c], target_row[c])]
+                            if different:
+                                mismatched_rows.append({"primary_key": dict(zip(pk_columns, key)), "issue": "DIFFERENT",
+                                                        "columns": different})
+
+            n, mismatches = sampled, len(mismatched_rows)
+            low, high = DataComparisonTools._wilson_interval(mismatches, n, confidence)
+            if n and high <= max_mismatch_rate:
+                verdict = "GO"
+            elif n and low > max_mismatch_rate:
+                verdict = "NO_GO"
+            else:
+                verdict = "INCONCLUSIVE"
+            return {
+                "table": table_name,
+                "status": "MISMATCH" if mismatches else "MATCH",
+                "verdict": verdict,
+                "rows_sampled": n,
+                "estimated_table_rows": table_rows,
+                "mismatches_found": mismatches,
+                "mismatch_rate": mismatches / n if n else None,
+                "confidence": confidence,
+                "mismatch_rate_interval": [low, high],
+                "estimated_mismatched_rows": [round(low * table_rows), round(high * table_rows)],
+                "elapsed_seconds": round(time.monotonic() - started, 2),
+                "mismatched_rows": mismatched_rows[:max_reported_rows]
+            }
+        except Exception as e:
+            return {"table": table_name, "status": "ERROR", "message": str(e)}
+
+    @staticmethod
+    def _wilson_interval(successes: int, n: int, confidence: float) -> tuple:
+        """Wilson score interval of a binomial proportion; unlike the normal approximation it stays useful at 0 successes."""
+        if n == 0:
+            return 0.0, 1.0
+        z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+        p = successes / n
+        denominator = 1 + z * z / n
+        centre = (p + z * z / (2 * n)) / denominator
+        margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+        return max(0.0, centre - margin), min(1.0, centre + margin)
+
+    @staticmethod
+    def compare_column_profiles(source_db_conn: MySQLTools, target_db_conn: MySQLTools, database_name: str, tables: list = None,
+                                max_workers: int = 8, distinct_buckets: int = 16) -> dict:
+        """
+        Compares per-column profiles (nulls, min/max, sum/avg, string lengths, approximate distinct count) of
+        each table, built by one aggregate scan per side. Tables (all base tables by default) are profiled
+        on both sides concurrently. Reports, per mismatching column, the metrics that differ.
+        """
+        if tables is None:
+            tables = list(DataComparisonTools._table_row_estimates(source_db_conn, database_name))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                table_name: [executor.submit(DataComparisonTools.profile_table, db_conn, database_name, table_name, distinct_buckets)
+                             for db_conn in (source_db_conn, target_db_conn)]
+                for table_name in tables
+            }
+            results = {}
+            for table_name, (source_future, target_future) in futures.items():
+                source, target = source_future.result(), target_future.result()
+                if "ERROR" in (source["status"], target["status"]):
+                    results[table_name] = {"status": "ERROR", "message": source.get("message") or target.get("message")}
+                    continue
+                columns = {}
+                for column, source_profile in source["columns"].items():
+                    target_profile = target["columns"].get(column)
+                    if target_profile is None:
+                        columns[column] = {"status": "MISSING_IN_TARGET"}
+                        continue
+                    differences = {
+                        metric: {"source": value, "target": target_profile.get(metric)}
+                        for metric, value in source_profile.items()
+                        if not DataComparisonTools._profile_values_equal(value, target_profile.get(metric))
+                    }
+                    columns[column] = {"status": "MISMATCH", "differences": differences} if differences else {"status": "MATCH"}
+                mismatched = [c for c, r in columns.items() if r["status"] != "MATCH"]
+                results[table_name] = {
+                    "status": "MISMATCH" if mismatched or source["rows"] != target["rows"] else "MATCH",
+                    "rows": {"source": source["rows"], "target": target["rows"]},
+                    "mismatched_columns": mismatched,
+                    "columns": columns
+                }
+        return results
+
+    @staticmethod
+    def profile_table(db_conn: MySQLTools, database_name: str, table_name: str, distinct_buckets: int = 16) -> dict:
+        """
+        Profiles every column of a table in a single aggregate query: null count, min/max, sum/avg for numerics,
+        min/max/avg length for strings and binaries, and a PCSA approximate distinct count. The distinct count
+        is built from CRC32 sketches, so equal columns on two servers always report the same estimate; its
+        error is around 20% with 16 buckets and shrinks with more buckets, at the cost of one aggregate each.
+        """
+        try:
+            if distinct_buckets < 1 or distinct_buckets & (distinct_buckets - 1):
+                raise ValueError(f"distinct_buckets must be a power of two, got {distinct_buckets}")
+            column_types, _ = DataComparisonTools._table_columns(db_conn, database_name, table_name)
+            aggregates = ["COUNT(*) AS `rows`"]
+            for i, (column, data_type) in enumerate(column_types.items()):
+                c = f"`{column}`"
+                aggregates.append(f"SUM({c} IS NULL) AS `nulls_{i}`")
+                if data_type in ORDERED_TYPES:
+                    aggregates.append(f"MIN({c}) AS `min_{i}`, MAX({c}) AS `max_{i}`")
+                if data_type in NUMERIC_TYPES:
+                    aggregates.append(f"SUM({c}) AS `sum_{i}`, AVG({c}) AS `avg_{i}`")
+                elif data_type in STRING_TYPES or data_type in BINARY_TYPES:
+                    length = "CHAR_LENGTH" if data_type in STRING_TYPES else "LENGTH"
+                    aggregates.append(f"MIN({length}({c})) AS `min_length_{i}`, MAX({length}({c})) AS `max_length_{i}`, "
+                                      f"AVG({length}({c})) AS `avg_length_{i}`")
+                # Text is hashed in utf8mb4, like row checksums, so latin1 and converted utf8mb4 columns agree
+                hashed = f"CONVERT({c} USING utf8mb4)" if data_type in STRING_TYPES else c
+                aggregates.append(DataComparisonTools._pcsa_expression(f"CRC32({hashed})", distinct_buckets, f"distinct_{i}"))
+            # Hashes stay inline: a derived table computing them once would be materialized with every column of
+            # every row, turning the streaming aggregate into a copy of the table
+            stats = db_conn.execute_query(f"SELECT {', '.join(aggregates)} FROM {database_name}.`{table_name}`")
+
+            profiles = {}
+            for i, column in enumerate(column_types):
+                profile = {"nulls": int(stats[f"nulls_{i}"] or 0)}
+                for metric in ("min", "max", "sum", "avg", "min_length", "max_length", "avg_length"):
+                    if f"{metric}_{i}" in stats:
+                        profile[metric] = stats[f"{metric}_{i}"]
+                bitmaps = [int(stats[f"distinct_{i}_{j}"] or 0) for j in range(distinct_buckets)]
+                profile["approx_distinct"] = min(DataComparisonTools._pcsa_estimate(bitmaps), stats["rows"] - profile["nulls"])
+                profiles[column] = profile
+            return {"table": table_name, "status": "SUCCESS", "rows": stats["rows"], "columns": profiles}
+        except Exception as e:
+            return {"table": table_name, "status": "ERROR", "message": str(e)}
+
+    @staticmethod
+    def _pcsa_expression(hash_expression: str, buckets: int, alias: str) -> str:
+        """
+        One BIT_OR bitmap per bucket over a value's CRC32 (hash_expression): the low bits pick the bucket
+        and the remaining bits contribute their lowest set bit, i.e. 2^rho in Flajolet-Martin terms.
+        """
+        shift = buckets.bit_length() - 1
+        rest = f"({hash_expression} >> {shift})"
+        return ", ".join(
+            f"BIT_OR(IF({hash_expression} & {buckets - 1} = {j}, {rest} & -CAST({rest} AS SIGNED), 0)) AS `{alias}_{j}`"
+            for j in range(buckets)
+        )
+
+    @staticmethod
+    def _pcsa_estimate(bitmaps: list) -> int:
+        """Probabilistic counting with stochastic averaging, with linear counting while buckets are still empty."""
+        buckets = len(bitmaps)
+        empty = sum(1 for b in bitmaps if b == 0)
+        if empty == buckets:
+            return 0
+        if empty:
+            return round(buckets * math.log(buckets / empty))
+        # R = position of the lowest unset bit of each bitmap
+        mean_r = sum((~b & (b + 1)).bit_length() - 1 for b in bitmaps) / buckets
+        return round(buckets / PCSA_PHI * 2 ** mean_r)
+
+    @staticmethod
+    def _profile_values_equal(source, target) -> bool:
+        # Float sums and averages depend on summation order, which differs between servers
+        if isinstance(source, float) or isinstance(target, float):
+            return source is not None and target is not None and math.isclose(source, target, rel_tol=1e-9)
+        return source == target
+
+    @staticmethod
+    def _table_columns(db_conn: MySQLTools, database_name: str, table_name: str):
+        """Returns ({column name: data type} in table order, primary key columns)."""
+        columns = db_conn.execute_query(
+            f"SELECT COLUMN_NAME AS name, DATA_TYPE AS data_type FROM information_schema.COLUMNS "
+            f"WHERE TABLE_SCHEMA = '{database_name}' AND TABLE_NAME = '{table_name}' ORDER BY ORDINAL_POSITION",
+            fetch_all=True
+        )
+        pk_columns = db_conn.execute_query(
+            f"SELECT COLUMN_NAME AS name FROM information_schema.KEY_COLUMN_USAGE "
+            f"WHERE TABLE_SCHEMA = '{database_name}' AND TABLE_NAME = '{table_name}' AND CONSTRAINT_NAME = 'PRIMARY' "
+            f"ORDER BY ORDINAL_POSITION",
+            fetch_all=True
+        )
+        return {c['name']: c['data_type'].lower() for c in columns}, [c['name'] for c in pk_columns]
+
+    @staticmethod
+    def _row_crc_expression(column_types: dict) -> str:
+        """
+        CRC32 over all columns ({name: data type}); the ISNULL flags keep NULL distinct from empty strings, which
+        CONCAT_WS skips. Text is hashed in utf8mb4, so a column converted from latin1 hashes the same on both sides.
+        """
+        values = ", ".join(f"CONVERT(`{c}` USING utf8mb4)" if t in STRING_TYPES else f"`{c}`" for c, t in column_types.items())
+        null_flags = ", ".join(f"ISNULL(`{c}`)" for c in column_types)
+        return f"CRC32(CONCAT_WS('#', {values}, CONCAT({null_flags})))"
+
+    @staticmethod
+    def _diff_rows(pk_columns: list, source_rows: dict, target_rows: dict) -> list:
+        """Diffs two {primary key tuple: row crc} maps."""
+        differences = []
+        for key in source_rows.keys() | target_rows.keys():
+            if key not in target_rows:
+                issue = "MISSING_IN_TARGET"
+            elif key not in source_rows:
+                issue = "MISSING_IN_SOURCE"
+            elif source_rows[key] != target_rows[key]:
+                issue = "DIFFERENT"
+            else:
+                continue
+            differences.append({"primary_key": dict(zip(pk_columns, key)), "issue": issue})
+        return differences
+
+    @staticmethod
+    def detect_data_anomalies(db_conn: MySQLTools, database_name: str, table_name: str, column_name: str, anomaly_threshold: float = 3.0,
+                              batch_size: int = 100000, push_down: bool = True) -> dict:
         """
         Detects simple anomalies in numerical data (e.g., using Z-score).
+        With push_down (the default for numeric columns) mean/stddev are computed by the server and only
+        the rows outside the threshold band are fetched, identified by primary key. Otherwise the column
+        is streamed twice in batches (once for mean/stddev, once for scoring).
         This is a simplified example; real anomaly detection would use more sophisticated methods.
         """
         try:
-            data = db_conn.execute_query(f"SELECT {column_name} FROM {database_name}.`{table_name}` WHERE {column_name} IS NOT NULL", fetch_all=True)
-            if not data:
-                return {"table": table_name, "column": column_name, "status": "NO_DATA", "anomalies":}
+            if push_down:
+                column_types, _ = DataComparisonTools._table_columns(db_conn, database_name, table_name)
+                push_down = column_types.get(column_name) in NUMERIC_TYPES
+            if push_down:
+                profile = DataComparisonTools.profile_numeric_columns(db_conn, database_name, table_name, [column_name],
+                                                                      anomaly_threshold, batch_size)
+                if profile["status"] != "SUCCESS":
+                    return {"table": table_name, "column": column_name, "status": profile["status"], "message": profile.get("message")}
+                return {"table": table_name, "column": column_name, **profile["columns"][column_name]}
+
+            query = f"SELECT {column_name} FROM {database_name}.`{table_name}` WHERE {column_name} IS NOT NULL"
+
+            def numeric_batches():
+                import pandas as pd
+                offset = 0
+                for batch in db_conn.stream_query(query, batch_size=batch_size, row_format="numpy"):
+                    values = pd.to_numeric(pd.Series(batch[column_name], index=range(offset, offset + len(batch[column_name]))), errors='coerce').dropna()
+                    offset += len(batch[column_name])
+                    yield values
+
+            # First pass: merge per-batch count/mean/M2 (Chan et al.) into the column's mean and sample stddev
+            has_rows = False
+            count, mean, m2 = 0, 0.0, 0.0
+            for values in numeric_batches():
+                has_rows = True
+                if values.empty:
+                    continue
+                batch_count, batch_mean = len(values), float(values.mean())
+                batch_m2 = float(((values - batch_mean) ** 2).sum())
+                delta = batch_mean - mean
+                combined = count + batch_count
+                mean += delta * batch_count / combined
+                m2 += batch_m2 + delta ** 2 * count * batch_count / combined
+                count = combined
 
-            df = pd.DataFrame(data)
-            series = pd.to_numeric(df[column_name], errors='coerce').dropna()
+            if not has_rows:
+                return {"table": table_name, "column": column_name, "status": "NO_DATA", "anomalies": []}
+            if not count:
+                return {"table": table_name, "column": column_name, "status": "NO_NUMERIC_DATA", "anomalies": []}
 
-            if series.empty:
-                return {"table": table_name, "column": column_name, "status": "NO_NUMERIC_DATA", "anomalies":}
+            std_dev = (m2 / (count - 1)) ** 0.5 if count > 1 else float('nan')
 
-            mean = series.mean()
-            std_dev = series.std()
+            if not std_dev or std_dev != std_dev:
+                return {"table": table_name, "column": column_name, "status": "NO_VARIATION", "anomalies": []}
 
-            if std_dev == 0:
-                return {"table": table_name, "column": column_name, "status": "NO_VARIATION", "anomalies":}
+            # Second pass: vectorized z-scores per batch, keeping only rows beyond the threshold
+            anomalies = []
+            for values in numeric_batches():
+                z_scores = (values - mean) / std_dev
+                flagged = z_scores[z_scores.abs() > anomaly_threshold]
+                for index, z_score in flagged.items():
+                    anomalies.append({"value": values[index], "z_score": z_score, "row_index": index})
 
-            anomalies =
-            for index, value in series.items():
-                z_score = (value - mean) / std_dev
-                if abs(z_score) > anomaly_threshold:
-                    anomalies.append({"value": value, "z_score": z_score, "row_index": index})
-            
             return {"table": table_name, "column": column_name, "status": "SUCCESS", "anomalies_found": len(anomalies), "anomalies": anomalies}
         except Exception as e:
-            return {"table": table_name, "column": column_name, "status": "ERROR", "message": str(e)}
\ No newline at end of file
+            return {"table": table_name, "column": column_name, "status": "ERROR", "message": str(e)}
+
+
+    @staticmethod
+    def profile_numeric_columns(db_conn: MySQLTools, database_name: str, table_name: str, columns: list = None,
+                                anomaly_threshold: float = 3.0, batch_size: int = 100000) -> dict:
+        """
+        Z-score anomaly profile for several numeric columns of a table (all numeric columns by default).
+        Phase one computes count/mean/stddev for every column in one aggregate query on the server; phase two
+        fetches, in one more scan, only the rows outside any column's threshold band and scores them with NumPy.
+        Anomalies are reported with their primary key, so network transfer scales with the anomalies found.
+        """
+        import numpy as np # Imported here so the validation stage loads numpy and pandas only for profiling
+        import pandas as pd
+        try:
+            column_types, pk_columns = DataComparisonTools._table_columns(db_conn, database_name, table_name)
+            if columns is None:
+                columns = [c for c, t in column_types.items() if t in NUMERIC_TYPES and c not in pk_columns]
+            not_numeric = [c for c in columns if column_types.get(c) not in NUMERIC_TYPES]
+            if not_numeric:
+                return {"table": table_name, "status": "ERROR", "message": f"Columns are not numeric: {not_numeric}"}
+            if not columns:
+                return {"table": table_name, "status": "NO_NUMERIC_COLUMNS", "columns": {}}
+
+            aggregates = ", ".join(
+                f"COUNT(`{c}`) AS `n_{i}`, AVG(`{c}`) AS `mean_{i}`, STDDEV_SAMP(`{c}`) AS `std_{i}`"
+                for i, c in enumerate(columns)
+            )
+            stats = db_conn.execute_query(f"SELECT {aggregates} FROM {database_name}.`{table_name}`")
+
+            profiles, bands = {}, []
+            for i, c in enumerate(columns):
+                count, mean, std_dev = stats[f"n_{i}"], stats[f"mean_{i}"], stats[f"std_{i}"]
+                profile = {"count": count, "mean": float(mean) if mean is not None else None,
+                           "std_dev": float(std_dev) if std_dev is not None else None, "anomalies": []}
+                if not count:
+                    profile["status"] = "NO_DATA"
+                elif not std_dev:
+                    profile["status"] = "NO_VARIATION"
+                else:
+                    profile["status"] = "SUCCESS"
+                    low = profile["mean"] - anomaly_threshold * profile["std_dev"]
+                    high = profile["mean"] + anomaly_threshold * profile["std_dev"]
+                    bands.append(f"`{c}` < {low!r} OR `{c}` > {high!r}")
+                profiles[c] = profile
+
+            if bands:
+                selected = ", ".join(f"`{c}`" for c in pk_columns + [c for c in columns if c not in pk_columns])
+                query = f"SELECT {selected} FROM {database_name}.`{table_name}` WHERE {' OR '.join(bands)}"
+                for batch in db_conn.stream_query(query, batch_size=batch_size, row_format="numpy"):
+                    for c in columns:
+                        profile = profiles[c]
+                        if profile["status"] != "SUCCESS":
+                            continue
+                        values = pd.to_numeric(batch[c], errors='coerce')
+                        z_scores = (values - profile["mean"]) / profile["std_dev"]
+                        for position in np.flatnonzero(np.abs(z_scores) > anomaly_threshold):
+                            anomaly = {"value": float(values[position]), "z_score": float(z_scores[position])}
+                            if pk_columns:
+                                anomaly["primary_key"] = {k: batch[k][position] for k in pk_columns}
+                            profile["anomalies"].append(anomaly)
+
+            for profile in profiles.values():
+                if profile["status"] == "SUCCESS":
+                    profile["anomalies_found"] = len(profile["anomalies"])
+            return {"table": table_name, "status": "SUCCESS", "columns": profiles}
+        except Exception as e:
+            return {"table": table_name, "status": "ERROR", "message": str(e)}
\ No newline at end of file
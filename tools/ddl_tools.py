@@ -0,0 +1,240 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tools.mysql_tools import MySQLTools
+
+_CREATE_TABLE = re.compile(r"^\s*CREATE\s+(?:TEMPORARY\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?((?:`[^`]+`|\w+)(?:\.(?:`[^`]+`|\w+))?)\s*\(",
+                           re.IGNORECASE)
+_INDEX_DEFINITION = re.compile(r"^(?:UNIQUE|FULLTEXT|SPATIAL)?\s*(?:KEY|INDEX)\b|^UNIQUE\b", re.IGNORECASE)
+_FOREIGN_KEY_DEFINITION = re.compile(r"^(?:CONSTRAINT\s+(?:`[^`]+`|\w+)\s+)?FOREIGN\s+KEY\b", re.IGNORECASE)
+_QUOTED = r"(?P<quoted>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)"
+_STRUCTURE_TOKENS = re.compile(_QUOTED + r"|[(),]", re.DOTALL)
+_STATEMENT_TOKENS = {}  # Compiled per DELIMITER
+_DEFINITION_NAME = re.compile(r"^(?:CONSTRAINT\s+(`[^`]+`|\w+)|(?:UNIQUE|FULLTEXT|SPATIAL)?\s*(?:KEY|INDEX)\s+(`[^`]+`|\w+)\s*\()",
+                              re.IGNORECASE)
+
+
+def split_statements(script: str) -> list:
+    """
+    Splits a SQL script into statements on semicolons outside quotes and comments.
+    DELIMITER lines (as used around routine and trigger bodies) are honoured and dropped.
+    """
+    statements, current, delimiter, pos = [], [], ";", 0
+    while True:
+        token = _statement_tokens(delimiter).search(script, pos)
+        if token is None:
+            current.append(script[pos:])
+            break
+        current.append(script[pos:token.start()])
+        pos = token.end()
+        kind = token.lastgroup
+        if kind == "quoted":
+            current.append(token.group(0))
+        elif kind in ("end", "delimiter_command"):
+            # A DELIMITER line also ends a statement left unterminated before it
+            statement = "".join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            if kind == "delimiter_command":
+                delimiter = token.group("delimiter")
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def _statement_tokens(delimiter: str):
+    if delimiter not in _STATEMENT_TOKENS:
+        _STATEMENT_TOKENS[delimiter] = re.compile(
+            _QUOTED + r"|(?P<comment>--(?=\s|$)[^\n]*|#[^\n]*|/\*(?!!).*?\*/)"
+            r"|(?P<delimiter_command>^[ \t]*DELIMITER[ \t]+(?P<delimiter>\S+)[ \t]*$)"
+            rf"|(?P<end>{re.escape(delimiter)})",
+            re.DOTALL | re.MULTILINE | re.IGNORECASE
+        )
+    return _STATEMENT_TOKENS[delimiter]
+
+
+def split_definitions(body: str) -> list:
+    """Splits the body of a CREATE TABLE on top-level commas."""
+    definitions, depth, start = [], 0, 0
+    for token in _STRUCTURE_TOKENS.finditer(body):
+        char = token.group(0)
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            definitions.append(body[start:token.start()].strip())
+            start = token.end()
+    if body[start:].strip():
+        definitions.append(body[start:].strip())
+    return definitions
+
+
+def parse_create_table(statement: str):
+    """Returns (table name, body definitions, trailing table options), or None if this is not a CREATE TABLE."""
+    header = _CREATE_TABLE.match(statement)
+    if not header:
+        return None
+    depth = 1
+    for token in _STRUCTURE_TOKENS.finditer(statement, header.end()):
+        if token.group(0) == "(":
+            depth += 1
+        elif token.group(0) == ")":
+            depth -= 1
+            if depth == 0:
+                break
+    else:
+        return None
+    name = header.group(1).split(".")[-1].strip("`")
+    return name, split_definitions(statement[header.end():token.start()]), statement[token.end():].strip()
+
+
+def defer_secondary_indexes(statement: str):
+    """
+    Splits a CREATE TABLE into a statement that keeps only columns, the primary key and checks, plus the
+    secondary/unique indexes and foreign keys to add after the load. An index is kept if it is the only key
+    on an AUTO_INCREMENT column, since InnoDB requires one. Returns (create statement, indexes, foreign keys).
+    """
+    parsed = parse_create_table(statement)
+    if parsed is None:
+        return statement, [], []
+    name, definitions, options = parsed
+    auto_increment = next((d.split()[0].strip("`") for d in definitions if re.search(r"\bAUTO_INCREMENT\b", d, re.IGNORECASE)), None)
+    primary_key = next((d for d in definitions if re.match(r"^PRIMARY\s+KEY", d, re.IGNORECASE)), None)
+    auto_increment_keyed = primary_key is not None and first_key_column(primary_key) == auto_increment
+
+    kept, indexes, foreign_keys = [], [], []
+    for definition in definitions:
+        if _FOREIGN_KEY_DEFINITION.match(definition):
+            foreign_keys.append(definition)
+        elif _INDEX_DEFINITION.match(definition):
+            if auto_increment and not auto_increment_keyed and first_key_column(definition) == auto_increment:
+                kept.append(definition)
+                auto_increment_keyed = True
+            else:
+                indexes.append(definition)
+        else:
+            kept.append(definition)
+
+    create = f"CREATE TABLE `{name}` (\n  " + ",\n  ".join(kept) + "\n) " + options
+    return create.rstrip(), indexes, foreign_keys
+
+
+def first_key_column(definition: str) -> str:
+    """First column of a key definition such as "KEY `ix` (`a`(10), `b`)", without quotes."""
+    columns = definition[definition.index("(") + 1:]
+    return re.split(r"[\s,()]", columns.strip(), maxsplit=1)[0].strip("`")
+
+
+def definition_name(definition: str) -> str:
+    """Name of an index or constraint definition, or its column list when it is unnamed."""
+    match = _DEFINITION_NAME.match(definition)
+    if match:
+        return (match.group(1) or match.group(2)).strip("`")
+    return definition[definition.index("("):definition.index(")") + 1] if "(" in definition else definition
+
+
+class DeferredIndexBuilder:
+    """
+    Applies a schema with secondary indexes and foreign keys deferred, and builds them after the data load.
+
+    The plan maps each table to the index and foreign key definitions removed from its CREATE TABLE. After the
+    load, every table gets one ALTER TABLE with all its secondary indexes (a single table scan), running in
+    parallel across tables; foreign keys follow in a second parallel pass once every referenced index exists.
+    """
+
+    def __init__(self, db_tools: MySQLTools, plan_path: str = "deferred_indexes.json"):
+        self.db_tools = db_tools
+        self.plan_path = plan_path
+
+    def apply_schema(self, ddl_script: str, defer: bool = True) -> dict:
+        """
+        Executes a DDL script with secondary indexes and foreign keys removed, adding them to the plan file.
+        The script may be applied in several calls; each table's entry is replaced by its latest CREATE TABLE.
+        With defer=False the statements run unchanged, with foreign key checks off so table order does not matter.
+        Failing statements are reported and skipped rather than stopping the script.
+        """
+        plan = self.load_plan() if os.path.exists(self.plan_path) else {}
+        executed, failed = 0, []
+        for statement in split_statements(ddl_script):
+            if defer:
+                create, indexes, foreign_keys = defer_secondary_indexes(statement)
+                statements = [create]
+            else:
+                statements = ["SET SESSION foreign_key_checks = 0", statement]
+            try:
+                self.db_tools.execute_statements(statements)
+            except Exception as e:
+                failed.append({"statement": statement, "error": str(e)})
+                continue
+            executed += 1
+            parsed = parse_create_table(statement) if defer else None
+            if parsed:
+                plan.pop(parsed[0], None)
+                if indexes or foreign_keys:
+                    plan[parsed[0]] = {"indexes": indexes, "foreign_keys": foreign_keys}
+        if defer:
+            with open(self.plan_path, "w") as f:
+                json.dump(plan, f, indent=2)
+        return {
+            "status": "error" if failed else "success",
+            "statements_executed": executed,
+            "failed": failed,
+            "deferred_indexes": sum(len(t["indexes"]) for t in plan.values()),
+            "deferred_foreign_keys": sum(len(t["foreign_keys"]) for t in plan.values()),
+            "plan_path": self.plan_path
+        }
+
+    def load_plan(self) -> dict:
+        """{table: {"indexes": [...], "foreign_keys": [...]}} still to be built."""
+        with open(self.plan_path) as f:
+            return json.load(f)
+
+    def build(self, concurrency: int = 4) -> dict:
+        """
+        Builds the deferred indexes, then the foreign keys, with up to concurrency tables at a time.
+        Built definitions are removed from the plan file, so a rerun only retries the failed ones.
+        Results hold one entry per ALTER TABLE, with the names it built and its time, which they share.
+        """
+        plan = self.load_plan()
+        started = time.monotonic()
+        results = []
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for kind in ("indexes", "foreign_keys"):
+                jobs = [(table, kind, definitions[kind]) for table, definitions in plan.items() if definitions[kind]]
+                for (table, _, _), result in zip(jobs, pool.map(lambda job: self._alter(*job), jobs)):
+                    results.append(result)
+                    if result["status"] == "success":
+                        plan[table][kind] = []
+        with open(self.plan_path, "w") as f:
+            json.dump({table: d for table, d in plan.items() if d["indexes"] or d["foreign_keys"]}, f, indent=2)
+        failed = sum(len(r["names"]) for r in results if r["status"] != "success")
+        return {
+            "status": "failed" if failed else "success",
+            "seconds": round(time.monotonic() - started, 2),
+            "built": sum(len(r["names"]) for r in results) - failed,
+            "failed": failed,
+            "results": results
+        }
+
+    def _alter(self, table: str, kind: str, definitions: list) -> dict:
+        names = [definition_name(d) for d in definitions]
+        print(f"Building {kind.replace('_', ' ')} on {table}: {', '.join(names)}...")
+        started = time.monotonic()
+        statements = [f"ALTER TABLE `{table}` " + ", ".join(f"ADD {d}" for d in definitions)]
+        if kind == "foreign_keys":
+            # Rows were validated on the source; skipping the re-check lets InnoDB add the keys in place
+            statements.insert(0, "SET SESSION foreign_key_checks = 0")
+        try:
+            self.db_tools.execute_statements(statements)
+            status, message = "success", None
+        except Exception as e:
+            status, message = "error", str(e)
+        seconds = round(time.monotonic() - started, 2)
+        print(f"Finished {kind.replace('_', ' ')} on {table} in {seconds}s ({status}).")
+        return {"table": table, "kind": kind[:-1] if kind == "foreign_keys" else "index", "names": names,
+                "status": status, "seconds": seconds, "message": message}
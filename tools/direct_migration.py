@@ -0,0 +1,256 @@
+import queue
+import threading
+import time
+import mysql.connector
+from tools.migration_manifest import MigrationManifest
+from tools.mysql_tools import MySQLTools
+
+_END = object() # Marks the last batch of a work unit on a reader -> writer queue
+# EXTRA of generated columns; MySQL 8.0 also marks DEFAULT CURRENT_TIMESTAMP columns DEFAULT_GENERATED, which are copied
+_GENERATED_COLUMNS = ("VIRTUAL GENERATED", "STORED GENERATED")
+
+
+class DirectMigration:
+    """
+    Copies tables straight from the source into the target, without dump files, the bucket or local disk.
+
+    workers reader/writer pairs run in parallel. Readers stream their work units (whole tables, or the primary
+    key ranges of a MigrationPlanner plan) on unbuffered cursors and hand batches of batch_rows rows to their
+    writer through a queue of queue_batches batches, so a slow target throttles its reader instead of filling
+    memory. Writers bulk load each batch with LOAD DATA LOCAL INFILE (or multi-row INSERTs).
+
+    All readers see the same consistent snapshot: while a FLUSH TABLES WITH READ LOCK is held (this needs the
+    RELOAD privilege), each reader starts START TRANSACTION WITH CONSISTENT SNAPSHOT and the binlog position is
+    read, then the lock is released, as mydumper does. With consistent=False each reader snapshots independently.
+
+    A unit's target rows are deleted before it is written, so a failed run can be repeated. With a manifest_path,
+    copied units and the snapshot position are recorded as in the pipelined migration; a restarted run skips
+    the units already copied, and the CDC catch-up starts from the snapshot position.
+    """
+
+    def __init__(self, source_db_config: dict, target_db_config: dict, workers: int = 4, batch_rows: int = 10000,
+                 queue_batches: int = 4, consistent: bool = True, manifest_path: str = None, lock_wait_timeout: int = 60):
+        self.source_db_config = source_db_config
+        self.target_db_config = target_db_config
+        self.workers = workers
+        self.batch_rows = batch_rows
+        self.queue_batches = queue_batches
+        self.consistent = consistent
+        self.lock_wait_timeout = lock_wait_timeout
+        self.source_tools = MySQLTools(**source_db_config)
+        self.target_tools = MySQLTools(**target_db_config)
+        self.manifest = MigrationManifest(manifest_path) if manifest_path else None
+
+    def run(self, tables: list = None, plan: dict = None) -> dict:
+        """Copies the given tables (all base tables by default), or a plan's work units in the plan's order."""
+        started = time.monotonic()
+        database = self.source_db_config['database']
+        if plan:
+            # tables may name whole tables or single work units, e.g. a failed salaries__part003
+            units = [u for u in plan["units"] if not tables or u["table"] in tables or u["id"] in tables]
+        else:
+            units = [{"id": table, "table": table, "where": None} for table in (tables or self._list_tables())]
+        columns = self._table_columns(database)
+        results = {unit["id"]: {"table": unit["table"], "status": "pending", "rows": 0} for unit in units}
+        work = queue.Queue()
+        for unit in units:
+            chunks = self.manifest.chunks(unit["id"]) if self.manifest else []
+            if chunks and all(c["loaded_at"] for c in chunks):
+                results[unit["id"]].update(status="skipped", rows=sum(c["rows"] or 0 for c in chunks))
+            else:
+                work.put(unit)
+
+        readers, writers = [], []
+        try:
+            for _ in range(self.workers):
+                readers.append(self.source_tools.dedicated_connection())
+            snapshot = self._start_snapshot(readers)
+            print(f"Direct migration of {len(units)} units with {self.workers} reader/writer pairs "
+                  f"from snapshot {snapshot or '(binary log disabled)'}...")
+            for _ in range(self.workers):
+                writers.append(self.target_tools.bulk_connection())
+            errors, lock, stop = [], threading.Lock(), threading.Event()
+
+            def fail(stage, unit, exc):
+                with lock:
+                    results[unit["id"]]["status"] = f"{stage}_failed"
+                    errors.append({"table": unit["id"], "stage": stage, "message": str(exc)})
+                if self.manifest:
+                    self.manifest.record_error(unit["id"], f"{stage}: {exc}")
+                stop.set()
+
+            def put(batches, item):
+                # Bounded put that gives up once another worker failed, so a blocked reader cannot hang the run
+                while not stop.is_set():
+                    try:
+                        batches.put(item, timeout=0.5)
+                        return True
+                    except queue.Full:
+                        pass
+                return False
+
+            def read(conn, batches):
+                try:
+                    while not stop.is_set():
+                        try:
+                            unit = work.get_nowait()
+                        except queue.Empty:
+                            return
+                        try:
+                            self._read_unit(conn, database, unit, columns[unit["table"]], batches, put)
+                        except Exception as e:
+                            fail("read", unit, e)
+                finally:
+                    batches.put(None)
+
+            def write(connection, batches):
+                conn, method = connection
+                counted = {}
+                while True:
+                    item = batches.get()
+                    if item is None:
+                        return
+                    unit, rows = item
+                    if stop.is_set() or results[unit["id"]]["status"].endswith("_failed"):
+                        continue
+                    try:
+                        if rows is None:
+                            self._clear_unit(conn, unit)
+                            counted[unit["id"]] = 0
+                        elif rows is _END:
+                            if self.manifest:
+                                self.manifest.record_direct_copy(unit["id"], counted[unit["id"]], snapshot)
+                            with lock:
+                                results[unit["id"]].update(status="copied", rows=counted[unit["id"]])
+                            print(f"Unit {unit['id']} copied ({counted[unit['id']]} rows).")
+                        else:
+                            self.target_tools.load_rows(conn, method, unit["table"], columns[unit["table"]],
+                                                        [_load_values(row, method) for row in rows])
+                            counted[unit["id"]] += len(rows)
+                    except Exception as e:
+                        fail("write", unit, e)
+
+            threads = []
+            for reader, writer in zip(readers, writers):
+                batches = queue.Queue(maxsize=self.queue_batches)
+                threads.append(threading.Thread(target=read, args=(reader, batches), daemon=True))
+                threads.append(threading.Thread(target=write, args=(writer, batches), daemon=True))
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            for conn in readers + [conn for conn, _ in writers]:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+        elapsed = time.monotonic() - started
+        rows = sum(r["rows"] for r in results.values() if r["status"] == "copied")
+        return {
+            "status": "failed" if errors else "success",
+            "snapshot": snapshot,
+            "elapsed_seconds": round(elapsed, 2),
+            "rows": rows,
+            "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+            "tables": results,
+            "errors": errors
+        }
+
+    def _start_snapshot(self, readers: list):
+        """Starts the readers' snapshot transactions at one point in time; returns that binlog position (or None)."""
+        coordinator = self.source_tools.dedicated_connection()
+        cursor = coordinator.cursor(dictionary=True)
+        try:
+            if self.consistent:
+                cursor.execute(f"SET SESSION lock_wait_timeout = {int(self.lock_wait_timeout)}")
+                cursor.execute("FLUSH TABLES WITH READ LOCK")
+            try:
+                for reader in readers:
+                    reader_cursor = reader.cursor()
+                    reader_cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                    reader_cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+                    reader_cursor.close()
+                return self._binlog_position(cursor)
+            finally:
+                if self.consistent:
+                    cursor.execute("UNLOCK TABLES")
+        finally:
+            cursor.close()
+            coordinator.close()
+
+    @staticmethod
+    def _binlog_position(cursor):
+        try:
+            cursor.execute("SHOW MASTER STATUS")
+        except mysql.connector.Error:
+            cursor.execute("SHOW BINARY LOG STATUS") # MySQL 8.4 removed SHOW MASTER STATUS
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return {"log_file": row["File"], "log_pos": int(row["Position"]), "gtid_set": row.get("Executed_Gtid_Set") or None}
+
+    def _read_unit(self, conn, database: str, unit: dict, columns: list, batches: queue.Queue, put):
+        """Streams one unit from the reader's snapshot: a start marker, batches of rows, then _END."""
+        if not put(batches, (unit, None)):
+            return
+        column_list = ", ".join(f"`{c}`" for c in columns)
+        where = f" WHERE {unit['where']}" if unit.get("where") else ""
+        # raw: values arrive as the server's text encoding, which LOAD DATA takes back unchanged
+        cursor = conn.cursor(buffered=False, raw=True)
+        try:
+            cursor.execute(f"SELECT {column_list} FROM `{database}`.`{unit['table']}`{where}")
+            while True:
+                rows = cursor.fetchmany(self.batch_rows)
+                if not rows:
+                    break
+                if not put(batches, (unit, rows)):
+                    return
+            put(batches, (unit, _END))
+        finally:
+            # An abandoned unbuffered result must be read off the wire before the snapshot can be reused
+            if conn.unread_result:
+                conn.get_rows()
+            cursor.close()
+
+    def _clear_unit(self, conn, unit: dict):
+        """Deletes what an earlier attempt wrote for a unit."""
+        table = f"`{self.target_db_config['database']}`.`{unit['table']}`"
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"DELETE FROM {table} WHERE {unit['where']}" if unit.get("where") else f"TRUNCATE TABLE {table}")
+            conn.commit()
+        finally:
+            cursor.close()
+
+    def _list_tables(self) -> list:
+        """Base tables of the source database, largest first."""
+        rows = self.source_tools.execute_query(
+            f"SELECT TABLE_NAME AS table_name FROM information_schema.TABLES "
+            f"WHERE TABLE_SCHEMA = '{self.source_db_config['database']}' AND TABLE_TYPE = 'BASE TABLE' "
+            f"ORDER BY DATA_LENGTH DESC",
+            fetch_all=True
+        )
+        return [row['table_name'] for row in rows]
+
+    def _table_columns(self, database: str) -> dict:
+        """{table: stored columns in order}; generated columns are computed again by the target."""
+        rows = self.source_tools.execute_query(
+            f"SELECT TABLE_NAME AS table_name, COLUMN_NAME AS column_name, EXTRA AS extra FROM information_schema.COLUMNS "
+            f"WHERE TABLE_SCHEMA = '{database}' ORDER BY TABLE_NAME, ORDINAL_POSITION",
+            fetch_all=True
+        )
+        columns = {}
+        for row in rows:
+            if any(generated in (row['extra'] or "").upper() for generated in _GENERATED_COLUMNS):
+                continue
+            columns.setdefault(row['table_name'], []).append(row['column_name'])
+        return columns
+
+
+def _load_values(row: tuple, method: str) -> tuple:
+    """Raw column values for LOAD DATA (text) or executemany (bytes); NULL stays None."""
+    if method == "load_data":
+        return tuple(None if value is None else bytes(value).decode("utf-8", "surrogateescape") for value in row)
+    return tuple(None if value is None else bytes(value) for value in row)
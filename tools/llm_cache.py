@@ -0,0 +1,201 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+MODES = ("cache", "record", "replay")
+
+
+class ReplayMiss(RuntimeError):
+    """Raised in replay mode for an LLM request or tool call that was not recorded."""
+
+
+class LLMCache:
+    """
+    Disk-backed cache of LLM responses (and, when recording or replaying, of tool results) in SQLite.
+
+    It implements autogen's cache protocol (get/set/close, context manager), so it can be passed as an
+    agent's client_cache and to initiate_chat(cache=...). autogen keys each request by its full parameters:
+    model, system message, the conversation so far and the tool results in it, so a re-run reuses the
+    responses of every conversation that goes the same way. Keys are stored as SHA-256 digests.
+
+    Modes:
+      - "cache": entries expire after ttl_seconds, and the least recently used ones are evicted once the
+        responses exceed max_bytes.
+      - "record": like cache, and every tool call's result is also recorded in call order. Entries written
+        while recording never expire, so the run can be replayed.
+      - "replay": responses and tool results come only from the recording, without network or LLM
+        latency; anything not recorded raises ReplayMiss.
+    """
+
+    def __init__(self, path: str = "llm_cache.sqlite", mode: str = "cache", ttl_seconds: float = 7 * 86400,
+                 max_bytes: int = 512 * 1024 ** 2):
+        if mode not in MODES:
+            raise ValueError(f"Unsupported cache mode: {mode}. Choose from {list(MODES)}")
+        self.path = path
+        self.mode = mode
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._tool_calls = {} # key -> calls made so far in this run, so repeated calls replay in order
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0,
+                       "tool_calls_recorded": 0, "tool_calls_replayed": 0}
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value BLOB, bytes INTEGER, created_at REAL, accessed_at REAL, pinned INTEGER)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tool_results ("
+                " key TEXT, seq INTEGER, tool TEXT, value BLOB, created_at REAL, PRIMARY KEY (key, seq))"
+            )
+            if mode == "record":
+                self._conn.execute("DELETE FROM tool_results") # A recording holds one run's tool results
+
+    def get(self, key: str, default=None):
+        digest = _digest(key)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at, pinned FROM responses WHERE key = ?", (digest,)).fetchone()
+            if row and self.mode != "replay" and not row[2] and now - row[1] > self.ttl_seconds:
+                with self._conn:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (digest,))
+                self._stats["expired"] += 1
+                row = None
+            if row is None:
+                self._stats["misses"] += 1
+                if self.mode == "replay":
+                    raise ReplayMiss(f"LLM request {digest[:12]} was not recorded")
+                return default
+            self._stats["hits"] += 1
+            with self._conn:
+                # A response reused while recording is part of the recording too
+                self._conn.execute("UPDATE responses SET accessed_at = ?, pinned = MAX(pinned, ?) WHERE key = ?",
+                                   (now, int(self.mode == "record"), digest))
+        return pickle.loads(row[0])
+
+    def set(self, key: str, value):
+        if self.mode == "replay":
+            return
+        data = pickle.dumps(value)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, bytes, created_at, accessed_at, pinned) VALUES (?, ?, ?, ?, ?, ?)",
+                (_digest(key), data, len(data), now, now, int(self.mode == "record"))
+            )
+            self._stats["sets"] += 1
+            self._evict()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, stored = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM responses").fetchone()
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {**self._stats, "mode": self.mode, "entries": entries, "bytes": stored,
+                    "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else None}
+
+    def tool_call(self, tool: str, function, args: tuple, kwargs: dict):
+        """
+        Runs a tool (recording its result or error) or, in replay mode, returns the recorded result of the same
+        call, or raises its recorded error again.
+        """
+        key = _digest(json.dumps([tool, args, kwargs], sort_keys=True, default=_stable))
+        with self._lock:
+            seq = self._tool_calls[key] = self._tool_calls.get(key, -1) + 1
+            if self.mode == "replay":
+                row = self._conn.execute("SELECT value FROM tool_results WHERE key = ? AND seq = ?", (key, seq)).fetchone()
+                if row is None:
+                    raise ReplayMiss(f"Call {seq + 1} of tool {tool} with these arguments was not recorded")
+                self._stats["tool_calls_replayed"] += 1
+        if self.mode == "replay":
+            recorded = pickle.loads(row[0])
+            if "error" in recorded:
+                raise RuntimeError(f"{recorded['error']} (recorded)")
+            return recorded["result"]
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            self._record_tool_call(key, seq, tool, {"error": f"{type(e).__name__}: {e}"})
+            raise
+        self._record_tool_call(key, seq, tool, {"result": result})
+        return result
+
+    def _record_tool_call(self, key: str, seq: int, tool: str, outcome: dict):
+        if self.mode != "record":
+            return
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO tool_results (key, seq, tool, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                               (key, seq, tool, pickle.dumps(outcome), time.time()))
+            self._stats["tool_calls_recorded"] += 1
+
+    def _evict(self):
+        """Drops expired entries, then the least recently used unpinned ones beyond max_bytes (lock held)."""
+        expired = self._conn.execute("DELETE FROM responses WHERE pinned = 0 AND created_at < ?", (time.time() - self.ttl_seconds,)).rowcount
+        self._stats["expired"] += expired
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, bytes FROM responses WHERE pinned = 0 ORDER BY accessed_at").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._stats["evictions"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                return
+
+
+def attach_cache(cache: LLMCache, assistant, user_proxy):
+    """
+    Makes an agent pair answer from the cache: the assistant's LLM calls go through it (pass it to
+    initiate_chat as well, which otherwise replaces it for the chat), and when recording or replaying,
+    every tool registered with user_proxy is wrapped to record or replay its results.
+    """
+    assistant.client_cache = cache
+    user_proxy.client_cache = cache
+    if cache.mode == "cache":
+        return
+    function_map = user_proxy.function_map
+    for name, function in list(function_map.items()):
+        function_map[name] = _recording_tool(cache, name, inspect.unwrap(function))
+
+
+def _recording_tool(cache: LLMCache, name: str, function):
+    def replayable(*args, **kwargs):
+        return cache.tool_call(name, function, args, kwargs)
+
+    def call(*args, **kwargs):
+        result = replayable(*args, **kwargs)
+        return result if isinstance(result, str) else json.dumps(result, default=str) # As autogen's wrapper does
+
+    functools.update_wrapper(replayable, function)
+    functools.update_wrapper(call, replayable)
+    replayable.recorded = True # registered_tools() unwraps down to here, not to the original
+    return call
+
+
+def _digest(key) -> str:
+    return hashlib.sha256(key.encode() if isinstance(key, str) else pickle.dumps(key)).hexdigest()
+
+
+def _stable(value):
+    """JSON stand-in for tool arguments such as MySQLTools objects: their type and plain attributes."""
+    attributes = {k: v for k, v in vars(value).items() if isinstance(v, (str, int, float, bool, type(None)))} if hasattr(value, "__dict__") else {}
+    return [type(value).__name__, attributes]
@@ -0,0 +1,141 @@
+import threading
+import numpy as np
+import pandas as pd
+
+_INITIAL_CAPACITY = 1024
+
+# Process-wide store shared by the monitoring tools and metrics clients
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+class MetricStore:
+    """
+    Columnar in-memory store of metric time series: per (instance, metric), one float64 array of epoch
+    seconds and one of values, grown by doubling and capped at the newest max_points points (20160 one-minute
+    points is two weeks, enough for hour-of-week baselines).
+
+    Appending points newer than the series is a slice copy; older or overlapping points are merged, and the
+    newest value wins for a duplicate timestamp. save()/load() persist every series to NPZ, or to Parquet
+    when the path ends in .parquet (needs pyarrow or fastparquet).
+    """
+
+    def __init__(self, max_points: int = 20160):
+        self.max_points = max_points
+        self._lock = threading.Lock()
+        self._series = {} # (instance, metric) -> [times, values, length]
+
+    def append(self, instance: str, metric: str, times, values):
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if not len(times):
+            return
+        order = np.argsort(times, kind="stable")
+        times, values = times[order], values[order]
+        with self._lock:
+            entry = self._series.get((instance, metric))
+            if entry is None:
+                entry = self._series[(instance, metric)] = [np.empty(_INITIAL_CAPACITY), np.empty(_INITIAL_CAPACITY), 0]
+            old_times, old_values, length = entry
+            if length and times[0] <= old_times[length - 1]:
+                # Out of order or overlapping: merge, keeping the last value given for each timestamp
+                merged_times = np.concatenate([old_times[:length], times])
+                merged_values = np.concatenate([old_values[:length], values])
+                reversed_unique, index = np.unique(merged_times[::-1], return_index=True)
+                times, values = reversed_unique, merged_values[::-1][index]
+                length = 0
+            total = length + len(times)
+            if total > len(old_times):
+                capacity = max(len(old_times) * 2, total)
+                grown_times, grown_values = np.empty(capacity), np.empty(capacity)
+                grown_times[:length], grown_values[:length] = old_times[:length], old_values[:length]
+                old_times, old_values = grown_times, grown_values
+            old_times[length:total], old_values[length:total] = times, values
+            if total > self.max_points:
+                keep = slice(total - self.max_points, total)
+                old_times, old_values = old_times[keep].copy(), old_values[keep].copy()
+                total = self.max_points
+            self._series[(instance, metric)] = [old_times, old_values, total]
+
+    def ingest(self, instance: str, metric: str, time_series: list):
+        """Appends time series in the Cloud Monitoring API shape (as returned by MetricsClient.fetch)."""
+        for series in time_series:
+            points = series.get("points", [])
+            if not points:
+                continue
+            times = pd.to_datetime([p["interval"]["endTime"] for p in points], utc=True, format="ISO8601")
+            values = [p.get("value", {}).get("doubleValue", p.get("value", {}).get("int64Value")) for p in points]
+            self.append(instance, metric, times.asi8 / 1e9, np.array(values, dtype=np.float64))
+
+    def series(self, instance: str, metric: str, since: float = None) -> tuple:
+        """(times, values) arrays of a series, optionally from epoch second since; empty arrays when unknown."""
+        with self._lock:
+            entry = self._series.get((instance, metric))
+            if entry is None:
+                return np.empty(0), np.empty(0)
+            times, values, length = entry[0][:entry[2]], entry[1][:entry[2]], entry[2]
+            start = int(np.searchsorted(times, since)) if since is not None else 0
+            return times[start:length].copy(), values[start:length].copy()
+
+    def newest(self, instance: str, metric: str) -> float:
+        """Time (epoch seconds) of the newest point of a series, or None."""
+        with self._lock:
+            entry = self._series.get((instance, metric))
+            return float(entry[0][entry[2] - 1]) if entry and entry[2] else None
+
+    def keys(self) -> list:
+        """(instance, metric) pairs held by the store."""
+        with self._lock:
+            return sorted(self._series)
+
+    def stats(self) -> dict:
+        with self._lock:
+            points = sum(entry[2] for entry in self._series.values())
+            allocated = sum(entry[0].nbytes + entry[1].nbytes for entry in self._series.values())
+        return {"series": len(self._series), "points": points, "bytes": allocated}
+
+    def save(self, path: str):
+        """Writes every series to an NPZ file, or to Parquet (long format) for a .parquet path."""
+        keys = self.keys()
+        columns = [self.series(instance, metric) for instance, metric in keys]
+        if path.endswith(".parquet"):
+            frame = pd.DataFrame({
+                "instance": np.repeat([k[0] for k in keys], [len(t) for t, _ in columns]),
+                "metric": np.repeat([k[1] for k in keys], [len(t) for t, _ in columns]),
+                "time": np.concatenate([t for t, _ in columns]) if columns else np.empty(0),
+                "value": np.concatenate([v for _, v in columns]) if columns else np.empty(0)
+            })
+            frame.to_parquet(path, index=False)
+            return
+        np.savez_compressed(
+            path,
+            instances=np.array([k[0] for k in keys], dtype=str),
+            metrics=np.array([k[1] for k in keys], dtype=str),
+            offsets=np.cumsum([0] + [len(t) for t, _ in columns]),
+            times=np.concatenate([t for t, _ in columns]) if columns else np.empty(0),
+            values=np.concatenate([v for _, v in columns]) if columns else np.empty(0)
+        )
+
+    @classmethod
+    def load(cls, path: str, max_points: int = 20160) -> "MetricStore":
+        store = cls(max_points=max_points)
+        if path.endswith(".parquet"):
+            frame = pd.read_parquet(path)
+            for (instance, metric), group in frame.groupby(["instance", "metric"], sort=False):
+                store.append(instance, metric, group["time"].to_numpy(), group["value"].to_numpy())
+            return store
+        with np.load(path) as data:
+            offsets = data["offsets"]
+            for i, (instance, metric) in enumerate(zip(data["instances"], data["metrics"])):
+                window = slice(offsets[i], offsets[i + 1])
+                store.append(str(instance), str(metric), data["times"][window], data["values"][window])
+        return store
+
+
+def get_metric_store() -> MetricStore:
+    """Returns the process-wide store, creating it on first use."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = MetricStore()
+        return _shared_store
@@ -0,0 +1,234 @@
+import collections
+import json
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+MONITORING_ENDPOINT = "https://monitoring.googleapis.com/v3"
+
+# Short names used by the agents -> (Cloud Monitoring metric type, aligner for 60s buckets)
+METRIC_TYPES = {
+    "cpu_utilization": ("cloudsql.googleapis.com/database/cpu/utilization", "ALIGN_MEAN"),
+    "memory_usage": ("cloudsql.googleapis.com/database/memory/usage", "ALIGN_MEAN"),
+    "memory_utilization": ("cloudsql.googleapis.com/database/memory/utilization", "ALIGN_MEAN"),
+    "disk_utilization": ("cloudsql.googleapis.com/database/disk/utilization", "ALIGN_MEAN"),
+    "network_egress": ("cloudsql.googleapis.com/database/network/sent_bytes_count", "ALIGN_SUM")
+}
+
+# Process-wide registry so high-water marks and buffers survive between tool calls
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class MetricsClient:
+    """
+    Incremental Cloud SQL metrics reader on the Cloud Monitoring REST API (timeSeries.list).
+
+    All requested metrics are fetched concurrently, following nextPageToken until each result is complete.
+    The client remembers, per metric, the newest point it has seen (its high-water mark) and the oldest
+    time it has covered, so a repeated call only requests the points written since the last poll, plus any
+    older range not fetched yet. Points are kept per time series in ring buffers of buffer_points entries,
+    from which every call's window is served. Polling cost stays proportional to the new points.
+
+    endpoint can point at a local fake server; credentials come from Application Default Credentials,
+    falling back to `gcloud auth print-access-token`. When a MetricStore is given, every new point is also
+    appended to it under (instance_name, metric) for anomaly detection.
+    """
+
+    def __init__(self, project_id: str, instance_name: str, endpoint: str = MONITORING_ENDPOINT, alignment_seconds: int = 60,
+                 buffer_points: int = 10080, workers: int = 8, page_size: int = 1000, timeout: float = 30.0,
+                 overlap_seconds: float = 180.0, access_token: str = None, store=None, executor: ThreadPoolExecutor = None):
+        self.project_id = project_id
+        self.instance_name = instance_name
+        self.endpoint = endpoint.rstrip("/")
+        self.alignment_seconds = alignment_seconds
+        self.buffer_points = buffer_points # 10080 one-minute points is a week per series
+        self.page_size = page_size
+        self.timeout = timeout
+        self.overlap_seconds = overlap_seconds # Re-read behind the high-water mark for points ingested late
+        self._own_pool = executor is None # A shared executor lets many clients (one per instance) share threads
+        self._pool = executor or ThreadPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        self._series = {} # metric -> {series key: {"metric", "resource", "points": deque of (end time, value)}}
+        self._high_water = {} # metric -> newest point time fetched
+        self._covered_from = {} # metric -> oldest window start fetched
+        self.store = store
+        self._token = access_token # A fixed token (e.g. for a local fake endpoint) is never refreshed
+        self._token_expiry = float("inf") if access_token else 0.0
+        self._stats = {"polls": 0, "requests": 0, "pages": 0, "points_fetched": 0, "last_poll_seconds": None}
+
+    def fetch(self, metrics: list = None, duration_hours: float = 1) -> dict:
+        """
+        Returns {metric name: [time series]} for the last duration_hours, in the API's shape (newest point first),
+        fetching only what the buffers do not hold yet. metrics defaults to every known metric.
+        """
+        metrics = metrics or list(METRIC_TYPES)
+        start = self.poll(metrics, duration_hours)
+        with self._lock:
+            return {metric: self._window(metric, start) for metric in metrics}
+
+    def poll(self, metrics: list = None, duration_hours: float = 1) -> float:
+        """
+        Fetches what the buffers (and the store) lack of the last duration_hours without building a result,
+        for callers that read the points elsewhere. Returns the window start (epoch seconds).
+        """
+        metrics = metrics or list(METRIC_TYPES)
+        unknown = [m for m in metrics if m not in METRIC_TYPES]
+        if unknown:
+            raise ValueError(f"Unsupported metric type: {unknown}. Choose from {list(METRIC_TYPES.keys())}")
+        started = time.monotonic()
+        end = time.time()
+        start = end - duration_hours * 3600
+        requests = []
+        with self._lock:
+            for metric in metrics:
+                if metric not in self._high_water:
+                    requests.append((metric, start, end))
+                    continue
+                if start < self._covered_from[metric]:
+                    requests.append((metric, start, self._covered_from[metric]))
+                requests.append((metric, max(self._high_water[metric] - self.overlap_seconds, start), end))
+        for metric, points in zip([r[0] for r in requests], self._pool.map(lambda r: self._fetch_range(*r), requests)):
+            self._store(metric, points)
+        with self._lock:
+            for metric in metrics:
+                self._covered_from[metric] = min(self._covered_from.get(metric, start), start)
+            self._stats["polls"] += 1
+            self._stats["last_poll_seconds"] = round(time.monotonic() - started, 3)
+        return start
+
+    def latest(self, metric: str, points: int = 60) -> list:
+        """The newest buffered (epoch seconds, value) points of every series of a metric, oldest first."""
+        with self._lock:
+            return [list(series["points"])[-points:] for series in self._series.get(metric, {}).values()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = sum(len(s["points"]) for series in self._series.values() for s in series.values())
+            return {**self._stats, "buffered_points": buffered,
+                    "high_water_marks": {m: _rfc3339(t) for m, t in self._high_water.items()}}
+
+    def close(self):
+        if self._own_pool:
+            self._pool.shutdown()
+
+    def _fetch_range(self, metric: str, start: float, end: float) -> list:
+        """All time series of a metric in [start, end], following pagination."""
+        metric_type, aligner = METRIC_TYPES[metric]
+        params = {
+            "filter": f'metric.type = "{metric_type}" AND resource.labels.database_id = "{self.project_id}:{self.instance_name}"',
+            "interval.startTime": _rfc3339(start),
+            "interval.endTime": _rfc3339(end),
+            "aggregation.alignmentPeriod": f"{self.alignment_seconds}s",
+            "aggregation.perSeriesAligner": aligner,
+            "pageSize": self.page_size
+        }
+        series, page_token = [], None
+        while True:
+            if page_token:
+                params["pageToken"] = page_token
+            page = self._get(f"{self.endpoint}/projects/{self.project_id}/timeSeries?{urllib.parse.urlencode(params)}")
+            series.extend(page.get("timeSeries", []))
+            with self._lock:
+                self._stats["pages"] += 1
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                return series
+
+    def _get(self, url: str) -> dict:
+        request = urllib.request.Request(url, headers={"Authorization": f"Bearer {self._access_token()}"})
+        with self._lock:
+            self._stats["requests"] += 1
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            print(f"Error fetching Cloud Monitoring time series: {e.code} {e.read()[:500]}")
+            raise
+
+    def _access_token(self) -> str:
+        with self._lock:
+            if self._token and time.time() < self._token_expiry:
+                return self._token
+        try:
+            import google.auth
+            import google.auth.transport.requests
+            credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/monitoring.read"])
+            credentials.refresh(google.auth.transport.requests.Request())
+            token = credentials.token
+        except Exception:
+            token = subprocess.run(["gcloud", "auth", "print-access-token"], check=True, capture_output=True, text=True).stdout.strip()
+        with self._lock:
+            self._token, self._token_expiry = token, time.time() + 45 * 60 # Tokens live an hour
+        return token
+
+    def _store(self, metric: str, series_list: list):
+        with self._lock:
+            buffers = self._series.setdefault(metric, {})
+            newest = self._high_water.get(metric)
+            for series in series_list:
+                key = json.dumps([series.get("metric", {}).get("labels"), series.get("resource", {}).get("labels")], sort_keys=True)
+                entry = buffers.get(key)
+                if entry is None:
+                    entry = buffers[key] = {"metric": series.get("metric", {}), "resource": series.get("resource", {}),
+                                            "points": collections.deque(maxlen=self.buffer_points)}
+                known = {t for t, _ in entry["points"]}
+                fresh = []
+                for point in series.get("points", []):
+                    end_time = _parse_time(point["interval"]["endTime"])
+                    value = point.get("value", {})
+                    value = value.get("doubleValue", value.get("int64Value"))
+                    if value is None or end_time in known:
+                        continue
+                    fresh.append((end_time, float(value)))
+                    newest = max(newest or end_time, end_time)
+                self._stats["points_fetched"] += len(fresh)
+                fresh.sort()
+                if fresh and self.store is not None:
+                    self.store.append(self.instance_name, metric, [t for t, _ in fresh], [v for _, v in fresh])
+                if fresh and (not entry["points"] or fresh[0][0] > entry["points"][-1][0]):
+                    entry["points"].extend(fresh)
+                elif fresh:
+                    # Backfilled or late points land before buffered ones, so the series is merged again
+                    entry["points"] = collections.deque(sorted(list(entry["points"]) + fresh), maxlen=self.buffer_points)
+            if newest is not None:
+                self._high_water[metric] = newest
+
+    def _window(self, metric: str, start: float) -> list:
+        return [
+            {
+                "metric": series["metric"],
+                "resource": series["resource"],
+                "points": [{"interval": {"endTime": _rfc3339(t)}, "value": {"doubleValue": v}}
+                           for t, v in reversed(series["points"]) if t >= start]
+            }
+            for series in self._series.get(metric, {}).values()
+        ]
+
+
+def get_metrics_client(project_id: str, instance_name: str, **kwargs) -> MetricsClient:
+    """Returns the shared client for (project, instance), creating it on first use."""
+    key = (project_id, instance_name)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = MetricsClient(project_id, instance_name, **kwargs)
+        return client
+
+
+def _parse_time(value: str) -> float:
+    """RFC 3339 timestamp (as returned by Cloud Monitoring, nanoseconds allowed) to epoch seconds."""
+    value = value.rstrip("Z")
+    if "." in value:
+        value, fraction = value.split(".")
+        value += "." + fraction[:6]
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _rfc3339(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
@@ -0,0 +1,229 @@
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+class MigrationManifest:
+    """
+    Durable record of a migration's progress, one row per dump file (chunk) in a local SQLite database.
+
+    Each chunk tracks when it was dumped, uploaded and loaded, together with its row count, size and
+    SHA-256, so a restarted run can skip finished work and redo only the missing chunks.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tables ("
+                " table_name TEXT PRIMARY KEY, dumped_at REAL, error TEXT,"
+                " binlog_file TEXT, binlog_pos INTEGER, gtid_set TEXT)"
+            )
+            # Manifests written before snapshot positions were tracked
+            existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(tables)")}
+            for column, column_type in (("binlog_file", "TEXT"), ("binlog_pos", "INTEGER"), ("gtid_set", "TEXT")):
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE tables ADD COLUMN {column} {column_type}")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " table_name TEXT, chunk_file TEXT, rows INTEGER, bytes INTEGER, sha256 TEXT,"
+                " dumped_at REAL, uploaded_at REAL, loaded_at REAL,"
+                " PRIMARY KEY (table_name, chunk_file))"
+            )
+
+    def record_dump(self, table: str, files: list, snapshot: dict = None):
+        """
+        Records a (re-)dump of a table; any previous chunk state for the table is replaced.
+        snapshot is the dump's binlog position as returned by read_snapshot_position.
+        """
+        snapshot = snapshot or {}
+        chunks = [describe_chunk(path) for path in files]
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE table_name = ?", (table,))
+            self._conn.executemany(
+                "INSERT INTO chunks (table_name, chunk_file, rows, bytes, sha256, dumped_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(table, c["chunk_file"], c["rows"], c["bytes"], c["sha256"], now) for c in chunks]
+            )
+            self._conn.execute(
+                "INSERT INTO tables (table_name, dumped_at, error, binlog_file, binlog_pos, gtid_set) VALUES (?, ?, NULL, ?, ?, ?) "
+                "ON CONFLICT(table_name) DO UPDATE SET dumped_at = excluded.dumped_at, error = NULL, "
+                "binlog_file = excluded.binlog_file, binlog_pos = excluded.binlog_pos, gtid_set = excluded.gtid_set",
+                (table, now, snapshot.get("log_file"), snapshot.get("log_pos"), snapshot.get("gtid_set"))
+            )
+
+    def record_direct_copy(self, table: str, rows: int, snapshot: dict = None):
+        """
+        Records a table (or work unit) copied straight from the source to the target, as one loaded chunk
+        named "direct-copy", so restarts skip it and the catch-up starts from its snapshot position.
+        """
+        snapshot = snapshot or {}
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE table_name = ?", (table,))
+            self._conn.execute(
+                "INSERT INTO chunks (table_name, chunk_file, rows, bytes, sha256, dumped_at, uploaded_at, loaded_at) "
+                "VALUES (?, 'direct-copy', ?, NULL, NULL, ?, ?, ?)",
+                (table, rows, now, now, now)
+            )
+            self._conn.execute(
+                "INSERT INTO tables (table_name, dumped_at, error, binlog_file, binlog_pos, gtid_set) VALUES (?, ?, NULL, ?, ?, ?) "
+                "ON CONFLICT(table_name) DO UPDATE SET dumped_at = excluded.dumped_at, error = NULL, "
+                "binlog_file = excluded.binlog_file, binlog_pos = excluded.binlog_pos, gtid_set = excluded.gtid_set",
+                (table, now, snapshot.get("log_file"), snapshot.get("log_pos"), snapshot.get("gtid_set"))
+            )
+
+    def mark_uploaded(self, table: str, chunk_files: list):
+        self._mark(table, chunk_files, "uploaded_at")
+
+    def mark_loaded(self, table: str, chunk_files: list):
+        self._mark(table, chunk_files, "loaded_at")
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE tables SET error = NULL WHERE table_name = ?", (table,))
+
+    def record_error(self, table: str, message: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO tables (table_name, error) VALUES (?, ?) "
+                "ON CONFLICT(table_name) DO UPDATE SET error = excluded.error",
+                (table, message)
+            )
+
+    def chunks(self, table: str) -> list:
+        """Returns the recorded chunks of a table as dicts, in file order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM chunks WHERE table_name = ? ORDER BY chunk_file", (table,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def is_dumped(self, table: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT dumped_at FROM tables WHERE table_name = ?", (table,)).fetchone()
+        return bool(row and row["dumped_at"])
+
+    def snapshot_positions(self) -> dict:
+        """{table: {"log_file", "log_pos", "gtid_set"}} for every dumped table with known binlog coordinates."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT table_name, binlog_file, binlog_pos, gtid_set FROM tables WHERE binlog_file IS NOT NULL"
+            ).fetchall()
+        return {row["table_name"]: {"log_file": row["binlog_file"], "log_pos": row["binlog_pos"], "gtid_set": row["gtid_set"]}
+                for row in rows}
+
+    def summary(self) -> dict:
+        """Per-table progress, e.g. for the migration assistant to see which tables already finished."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.table_name, t.dumped_at, t.error, COUNT(c.chunk_file) AS chunks,"
+                " COUNT(c.uploaded_at) AS uploaded, COUNT(c.loaded_at) AS loaded,"
+                " SUM(c.rows) AS rows, SUM(c.bytes) AS bytes"
+                " FROM tables t LEFT JOIN chunks c ON c.table_name = t.table_name"
+                " GROUP BY t.table_name ORDER BY t.table_name"
+            ).fetchall()
+        summary = {}
+        for row in rows:
+            if row["dumped_at"] and row["chunks"] and row["loaded"] == row["chunks"]:
+                status = "loaded"
+            elif row["dumped_at"]:
+                status = "in_progress"
+            else:
+                status = "pending"
+            summary[row["table_name"]] = {
+                "status": status,
+                "chunks": row["chunks"],
+                "uploaded_chunks": row["uploaded"],
+                "loaded_chunks": row["loaded"],
+                "rows": row["rows"],
+                "bytes": row["bytes"],
+                "error": row["error"]
+            }
+        return summary
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _mark(self, table: str, chunk_files: list, column: str):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"UPDATE chunks SET {column} = ? WHERE table_name = ? AND chunk_file = ?",
+                [(now, table, name) for name in chunk_files]
+            )
+
+
+def describe_chunk(path: str) -> dict:
+    """Name, size, SHA-256 and INSERT row count of a dump file."""
+    return {
+        "chunk_file": os.path.basename(path),
+        "rows": count_dump_rows(path),
+        "bytes": os.path.getsize(path),
+        "sha256": file_sha256(path)
+    }
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_auxiliary_file(name: str) -> bool:
+    """mydumper's metadata file carries no rows but myloader needs it next to every set of chunks."""
+    return name.startswith("metadata")
+
+
+def count_dump_rows(path: str):
+    """
+    Counts the rows of a mydumper data file (plain or gzip). mydumper writes one row per line and escapes
+    newlines inside values, so rows are the lines starting a value tuple. Returns None for other files.
+    """
+    name = os.path.basename(path)
+    if is_auxiliary_file(name) or "-schema" in name:
+        return None
+    if name.endswith(".sql"):
+        opener = open
+    elif name.endswith(".sql.gz"):
+        opener = gzip.open
+    else:
+        return None
+    rows = 0
+    with opener(path, "rb") as f:
+        for line in f:
+            if line.startswith((b"(", b",(")):
+                rows += 1
+            elif line.startswith(b"INSERT") and b"VALUES(" in line.replace(b" ", b""):
+                rows += 1  # Older mydumper versions put the first tuple on the INSERT line
+    return rows
+
+
+def read_snapshot_position(metadata_path: str) -> dict:
+    """
+    Reads the source binlog coordinates and GTID set of a mydumper snapshot from its metadata file.
+    Understands both the older "SHOW MASTER STATUS:" layout and the newer "[master]" ini layout.
+    """
+    with open(metadata_path) as f:
+        text = f.read()
+    log_file = re.search(r"^\s*(?:Log|File)\s*[:=]\s*(\S+)", text, re.MULTILINE)
+    log_pos = re.search(r"^\s*(?:Pos|Position)\s*[:=]\s*(\d+)", text, re.MULTILINE)
+    gtid_set = re.search(r"^\s*(?:GTID|Executed_Gtid_Set)\s*[:=]\s*(.*)$", text, re.MULTILINE)
+    if not (log_file and log_pos):
+        raise ValueError(f"No binlog coordinates found in {metadata_path}; was binary logging enabled on the source?")
+    return {
+        "log_file": log_file.group(1).strip("'\""),
+        "log_pos": int(log_pos.group(1)),
+        "gtid_set": gtid_set.group(1).strip().strip("'\"") if gtid_set else None
+    }
@@ -0,0 +1,289 @@
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tools.migration_manifest import MigrationManifest, file_sha256, is_auxiliary_file, read_snapshot_position
+from tools.mysql_tools import MySQLTools
+from tools.object_store import open_store
+
+_DONE = object()  # Queue sentinel: the upstream stage has no more work
+
+
+class PipelinedMigration:
+    """
+    Per-table dump -> upload -> load migration with bounded queues between the stages.
+
+    Each table is dumped by its own mydumper run; as soon as a table's chunk files are written they are
+    uploaded and removed locally, and as soon as they land in the bucket they are downloaded and loaded
+    with myloader. Total time approaches the slowest stage rather than the sum of all stages, and local
+    disk only holds the tables currently in flight.
+
+    bucket_path is a gs:// URI, or a local directory standing in for the bucket in offline tests. Transfers go
+    through an ObjectStore: files are uploaded and downloaded concurrently in parts, and mydumper writes
+    uncompressed chunks that the store compresses with multi-threaded zstd at compression_level.
+    Each dump (one per table, or per work unit) is consistent on its own but taken from its own snapshot, so the
+    tables are not consistent with one another: unlike a single mydumper run or DirectMigration, the target only
+    becomes consistent once BinlogCatchUp has replayed the changes made since each dump's recorded position.
+
+    With a manifest_path, every chunk's dump/upload/load progress is recorded in a MigrationManifest and a
+    restarted run skips finished tables, reuses dumps that are still on disk or in the bucket, and loads only
+    the chunks that were not loaded yet: each chunk is marked loaded as soon as it is loaded (myloader then runs
+    once per chunk). Dumps use INSERT IGNORE, and the native loader INSERT IGNORE or LOAD DATA LOCAL, so a
+    partially loaded chunk can be replayed.
+
+    run() also takes a MigrationPlanner plan, whose work units (whole tables or primary key ranges of a large
+    table) are migrated in the plan's longest-first order; a unit's id then stands in for the table name in
+    the manifest, the work directories and the bucket.
+    """
+
+    def __init__(self, source_db_config: dict, target_db_config: dict, bucket_path: str, work_dir: str = "/tmp/mysql_pipeline",
+                 dump_workers: int = 2, upload_workers: int = 2, load_workers: int = 2, queue_size: int = 4, threads_per_table: int = 4,
+                 manifest_path: str = None, loader: str = "auto", transfer_workers: int = 16, compression_level: int = 3):
+        self.source_db_config = source_db_config
+        self.target_db_config = target_db_config
+        self.bucket_path = bucket_path.rstrip("/")
+        self.store, self.store_prefix = open_store(self.bucket_path, workers=transfer_workers, compression_level=compression_level)
+        self.work_dir = work_dir
+        self.dump_workers = dump_workers
+        self.upload_workers = upload_workers
+        self.load_workers = load_workers
+        self.queue_size = queue_size
+        self.threads_per_table = threads_per_table
+        self.source_tools = MySQLTools(**source_db_config)
+        self.target_tools = MySQLTools(**target_db_config)
+        self.manifest = MigrationManifest(manifest_path) if manifest_path else None
+        # "myloader", "native" (MySQLTools.bulk_load_directory) or "auto": myloader when it is installed
+        self.loader = loader if loader != "auto" else ("myloader" if shutil.which("myloader") else "native")
+        self.units = {} # Work unit id -> MigrationPlanner unit, for planned runs
+
+    def run(self, tables: list = None, plan: dict = None) -> dict:
+        """
+        Migrates the given tables (all base tables of the source database by default), or the work units of a
+        MigrationPlanner plan in the plan's order; returns per-table (per-unit) results.
+        """
+        started = time.monotonic()
+        if plan:
+            self.units = {unit["id"]: unit for unit in plan["units"]}
+            # tables may name whole tables or single work units, e.g. a failed salaries__part003
+            tables = [unit["id"] for unit in plan["units"] if not tables or unit["table"] in tables or unit["id"] in tables]
+        else:
+            tables = tables or self.list_tables()
+        print(f"Starting pipelined migration of {len(tables)} {'work units' if plan else 'tables'}...")
+
+        dump_queue = queue.Queue()
+        # Resumed tables skip the dump stage; this queue is unbounded so seeding it cannot block
+        upload_queue = queue.Queue()
+        load_queue = queue.Queue(maxsize=self.queue_size)
+        results = {table: {"status": "pending"} for table in tables}
+        for table in tables:
+            resume = self.resume_point(table)
+            if resume == "done":
+                results[table]["status"] = "skipped"
+            elif resume is None:
+                dump_queue.put(table)
+            else:
+                results[table]["status"] = "resumed"
+                upload_queue.put((table, resume))
+        errors = []
+        stop = threading.Event()
+        lock = threading.Lock()
+
+        def record(table, **fields):
+            with lock:
+                results[table].update(fields)
+
+        def fail(stage, table, exc):
+            if self.manifest:
+                self.manifest.record_error(table, f"{stage}: {exc}")
+            with lock:
+                results[table]["status"] = f"{stage}_failed"
+                errors.append({"table": table, "stage": stage, "message": str(exc)})
+            stop.set()
+
+        def dump_worker():
+            while not stop.is_set():
+                try:
+                    table = dump_queue.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    t0 = time.monotonic()
+                    files = self.dump_table(table, cancel_event=stop)
+                    if self.manifest:
+                        self.manifest.record_dump(table, files, self.snapshot_position(table))
+                    record(table, status="dumped", dump_seconds=round(time.monotonic() - t0, 2), files=len(files),
+                           bytes=sum(os.path.getsize(f) for f in files))
+                    upload_queue.put((table, files))
+                except Exception as e:
+                    fail("dump", table, e)
+
+        def upload_worker():
+            while True:
+                item = upload_queue.get()
+                if item is _DONE:
+                    return
+                table, files = item
+                if stop.is_set():
+                    continue
+                try:
+                    t0 = time.monotonic()
+                    self.upload_table(table, files)
+                    if self.manifest:
+                        self.manifest.mark_uploaded(table, [os.path.basename(f) for f in files])
+                    record(table, status="uploaded", upload_seconds=round(time.monotonic() - t0, 2))
+                    load_queue.put(table)
+                except Exception as e:
+                    fail("upload", table, e)
+
+        def load_worker():
+            while True:
+                table = load_queue.get()
+                if table is _DONE:
+                    return
+                if stop.is_set():
+                    continue
+                try:
+                    t0 = time.monotonic()
+                    self.load_table(table, cancel_event=stop)
+                    record(table, status="loaded", load_seconds=round(time.monotonic() - t0, 2))
+                    print(f"Table {table} migrated.")
+                except Exception as e:
+                    fail("load", table, e)
+
+        # Each stage is closed once every worker of the stage before it has exited
+        stages = [(dump_worker, self.dump_workers, upload_queue, self.upload_workers),
+                  (upload_worker, self.upload_workers, load_queue, self.load_workers),
+                  (load_worker, self.load_workers, None, 0)]
+        running = []
+        for worker, count, next_queue, next_count in stages:
+            threads = [threading.Thread(target=worker, name=f"{worker.__name__}-{i}", daemon=True) for i in range(count)]
+            for t in threads:
+                t.start()
+            running.append((threads, next_queue, next_count))
+        for threads, next_queue, next_count in running:
+            for t in threads:
+                t.join()
+            for _ in range(next_count):
+                next_queue.put(_DONE)
+
+        return {
+            "status": "failed" if errors else "success",
+            "elapsed_seconds": round(time.monotonic() - started, 2),
+            "tables": results,
+            "errors": errors
+        }
+
+    def resume_point(self, table: str):
+        """
+        Where a table restarts according to the manifest: "done" when every chunk is loaded, the list of
+        local files still to upload when the dump can be reused, or None when the table must be dumped.
+        """
+        if not self.manifest or not self.manifest.is_dumped(table):
+            return None
+        chunks = self.manifest.chunks(table)
+        if chunks and all(c["loaded_at"] for c in chunks):
+            return "done"
+        dump_dir = os.path.join(self.work_dir, "dump", table)
+        not_uploaded = [c for c in chunks if not c["uploaded_at"]]
+        paths = [os.path.join(dump_dir, c["chunk_file"]) for c in not_uploaded]
+        if all(os.path.exists(path) and file_sha256(path) == c["sha256"] for path, c in zip(paths, not_uploaded)):
+            return paths
+        return None
+
+    def snapshot_position(self, table: str):
+        """Binlog coordinates of a table's dump, or None when the source has binary logging disabled."""
+        try:
+            return read_snapshot_position(os.path.join(self.work_dir, "dump", table, "metadata"))
+        except (OSError, ValueError):
+            return None
+
+    def list_tables(self) -> list:
+        """Base tables of the source database, largest first so the long tail starts early."""
+        rows = self.source_tools.execute_query(
+            f"SELECT TABLE_NAME AS table_name FROM information_schema.TABLES "
+            f"WHERE TABLE_SCHEMA = '{self.source_db_config['database']}' AND TABLE_TYPE = 'BASE TABLE' "
+            f"ORDER BY DATA_LENGTH DESC",
+            fetch_all=True
+        )
+        return [row['table_name'] for row in rows]
+
+    def dump_table(self, table: str, cancel_event=None) -> list:
+        """
+        Dumps one table's data (or one work unit's key range) into its own directory and returns the written files;
+        cancel_event stops the dump.
+        """
+        output_dir = os.path.join(self.work_dir, "dump", table)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.makedirs(output_dir)
+        db = self.source_db_config['database']
+        unit = self.units.get(table, {"table": table, "where": None, "threads": self.threads_per_table})
+        result = self.source_tools.run_mydumper(
+            self.source_db_config['host'], self.source_db_config['user'], self.source_db_config['password'], db,
+            output_dir=output_dir, threads=unit["threads"], tables_list=f"{db}.{unit['table']}", no_schemas=True,
+            insert_ignore=True, where=unit["where"], compress=False, cancel_event=cancel_event
+        )
+        if result["status"] == "cancelled":
+            raise RuntimeError(f"Dump of {table} cancelled after a failure elsewhere in the pipeline")
+        return sorted(os.path.join(output_dir, name) for name in os.listdir(output_dir))
+
+    def _load_chunk(self, table: str, input_dir: str, chunk_file: str, auxiliary_files: list, cancel_event=None):
+        """Loads one chunk with myloader from a directory of its own (next to a copy of the metadata), then marks it loaded."""
+        chunk_dir = os.path.join(input_dir, f"{chunk_file}.load")
+        os.makedirs(chunk_dir)
+        for name in auxiliary_files:
+            shutil.copy(os.path.join(input_dir, name), chunk_dir)
+        os.rename(os.path.join(input_dir, chunk_file), os.path.join(chunk_dir, chunk_file))
+        self._run_myloader(table, chunk_dir, 1, cancel_event)
+        self.manifest.mark_loaded(table, [chunk_file])
+
+    def _run_myloader(self, table: str, input_dir: str, threads: int, cancel_event=None):
+        result = self.target_tools.run_myloader(
+            self.target_db_config['host'], self.target_db_config['user'], self.target_db_config['password'],
+            self.target_db_config['database'], input_dir=input_dir, threads=threads, cancel_event=cancel_event
+        )
+        if result["status"] == "cancelled":
+            raise RuntimeError(f"Load of {table} cancelled after a failure elsewhere in the pipeline")
+
+    def object_prefix(self, table: str) -> str:
+        """Key prefix of a table's (or work unit's) dump files in the object store."""
+        return f"{self.store_prefix}/{table}" if self.store_prefix else table
+
+    def upload_table(self, table: str, files: list):
+        """Uploads a table's dump files to the bucket, then frees the local copies."""
+        if files:
+            self.store.upload_files(files, self.object_prefix(table))
+        shutil.rmtree(os.path.join(self.work_dir, "dump", table), ignore_errors=True)
+
+    def load_table(self, table: str, cancel_event=None):
+        """
+        Downloads a table's not yet loaded dump files from the bucket and loads them with myloader or the native loader;
+        with a manifest, each chunk is marked loaded as soon as it is. cancel_event stops a running myloader.
+        """
+        input_dir = os.path.join(self.work_dir, "load", table)
+        shutil.rmtree(input_dir, ignore_errors=True)
+        os.makedirs(input_dir)
+        try:
+            if self.manifest:
+                chunks = [c for c in self.manifest.chunks(table) if not c["loaded_at"] or is_auxiliary_file(c["chunk_file"])]
+                self.store.download_files([f"{self.object_prefix(table)}/{c['chunk_file']}" for c in chunks], input_dir)
+                for c in chunks:
+                    if file_sha256(os.path.join(input_dir, c["chunk_file"])) != c["sha256"]:
+                        raise ValueError(f"Checksum mismatch for {table}/{c['chunk_file']} after download")
+            else:
+                self.store.download_files([f"{self.object_prefix(table)}/*"], input_dir)
+            if self.loader == "native":
+                on_file_loaded = (lambda path: self.manifest.mark_loaded(table, [os.path.basename(path)])) if self.manifest else None
+                self.target_tools.bulk_load_directory(input_dir, threads=self.threads_per_table, on_file_loaded=on_file_loaded)
+            elif self.manifest:
+                data_files = [c["chunk_file"] for c in chunks if not is_auxiliary_file(c["chunk_file"])]
+                auxiliary_files = [c["chunk_file"] for c in chunks if is_auxiliary_file(c["chunk_file"])]
+                with ThreadPoolExecutor(max_workers=self.threads_per_table) as pool:
+                    list(pool.map(lambda name: self._load_chunk(table, input_dir, name, auxiliary_files, cancel_event), data_files))
+            else:
+                self._run_myloader(table, input_dir, self.threads_per_table, cancel_event)
+            if self.manifest:
+                self.manifest.mark_loaded(table, [c["chunk_file"] for c in chunks if is_auxiliary_file(c["chunk_file"])])
+        finally:
+            shutil.rmtree(input_dir, ignore_errors=True)
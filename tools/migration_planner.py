@@ -0,0 +1,183 @@
+import heapq
+import json
+import math
+import os
+import re
+from tools.mysql_tools import MySQLTools
+
+CHUNK_SEPARATOR = "__part" # Work unit ids are "<table>__part<NNN>" for the ranges of a split table
+_INTEGER_TYPES = "('tinyint', 'smallint', 'mediumint', 'int', 'bigint')"
+# vCPUs of the Cloud SQL shared-core and predefined tiers; custom tiers carry the count in their name
+_SHARED_CORE_TIERS = {"db-f1-micro": 1, "db-g1-small": 1}
+
+
+class MigrationPlanner:
+    """
+    Size-aware plan for the dump/load pipeline.
+
+    Table sizes and row counts come from information_schema.TABLES. Tables larger than target_chunk_bytes
+    are split into ranges of the leading integer primary key column (even key ranges, so skewed keys give
+    uneven chunks), and the resulting work units are ordered longest-processing-time first, which keeps the
+    makespan within 4/3 of optimal and, with chunks much smaller than the total, close to total / workers.
+
+    Worker counts follow the hardware: dump workers (mydumper compresses on the orchestrator) from the local
+    CPU cores, load workers from the vCPUs of the target Cloud SQL tier (cloudsql_machine_type).
+    """
+
+    def __init__(self, db_tools: MySQLTools, database: str, machine_type: str = None, target_chunk_bytes: int = 256 * 1024 ** 2,
+                 cpu_count: int = None):
+        self.db_tools = db_tools
+        self.database = database
+        self.machine_type = machine_type
+        self.target_chunk_bytes = target_chunk_bytes
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+
+    def plan(self, tables: list = None) -> dict:
+        """
+        Returns {"units": [{"id", "table", "where", "estimated_bytes", "estimated_rows", "threads"}] longest first,
+        "dump_workers", "load_workers", "total_bytes", "predicted_makespan_bytes", "lower_bound_bytes", "efficiency"}.
+        """
+        workers = choose_workers(self.machine_type, self.cpu_count)
+        units = []
+        for table in self.table_sizes(tables):
+            units.extend(self.split_table(table, workers["dump_workers"]))
+        units.sort(key=lambda u: u["estimated_bytes"], reverse=True)
+
+        # The pipeline is paced by its narrower stage; simulate LPT assignment over that many workers
+        slots = min(workers["dump_workers"], workers["load_workers"])
+        makespan = lpt_makespan([u["estimated_bytes"] for u in units], slots)
+        total = sum(u["estimated_bytes"] for u in units)
+        lower_bound = max(total / slots, units[0]["estimated_bytes"] if units else 0)
+        return {
+            "database": self.database,
+            "units": units,
+            **workers,
+            "total_bytes": total,
+            "predicted_makespan_bytes": makespan,
+            "lower_bound_bytes": round(lower_bound),
+            "efficiency": round(lower_bound / makespan, 3) if makespan else 1.0
+        }
+
+    def table_sizes(self, tables: list = None) -> list:
+        """Base tables with their estimated rows, data length and leading integer primary key column (or None)."""
+        rows = self.db_tools.execute_statements(self.db_tools.fresh_statistics_statements() + [
+            f"SELECT t.TABLE_NAME AS table_name, t.TABLE_ROWS AS table_rows, t.DATA_LENGTH AS data_length, "
+            f"c.COLUMN_NAME AS key_column FROM information_schema.TABLES t "
+            f"LEFT JOIN information_schema.STATISTICS s ON s.TABLE_SCHEMA = t.TABLE_SCHEMA AND s.TABLE_NAME = t.TABLE_NAME "
+            f"AND s.INDEX_NAME = 'PRIMARY' AND s.SEQ_IN_INDEX = 1 "
+            f"LEFT JOIN information_schema.COLUMNS c ON c.TABLE_SCHEMA = s.TABLE_SCHEMA AND c.TABLE_NAME = s.TABLE_NAME "
+            f"AND c.COLUMN_NAME = s.COLUMN_NAME AND c.DATA_TYPE IN {_INTEGER_TYPES} "
+            f"WHERE t.TABLE_SCHEMA = '{self.database}' AND t.TABLE_TYPE = 'BASE TABLE'"
+        ])
+        wanted = {unit_table(table) for table in tables} if tables else None # Work unit ids select their table
+        return [
+            {"table": row['table_name'], "rows": int(row['table_rows'] or 0), "bytes": int(row['data_length'] or 0),
+             "key_column": row['key_column']}
+            for row in rows if wanted is None or row['table_name'] in wanted
+        ]
+
+    def split_table(self, table: dict, dump_workers: int) -> list:
+        """Work units for one table: a single unit, or one per primary key range when it is larger than a chunk."""
+        chunks = math.ceil(table["bytes"] / self.target_chunk_bytes) if table["bytes"] else 1
+        if chunks > 1 and table["key_column"]:
+            bounds = self.db_tools.execute_query(
+                f"SELECT MIN(`{table['key_column']}`) AS low, MAX(`{table['key_column']}`) AS high "
+                f"FROM `{self.database}`.`{table['table']}`"
+            )
+            if bounds and bounds['low'] is not None:
+                low, high = int(bounds['low']), int(bounds['high'])
+                chunks = min(chunks, high - low + 1)
+                if chunks > 1:
+                    return self._key_ranges(table, low, high, chunks)
+        # Small, or no integer key to split on: one unit, with mydumper threads for a large unsplittable table
+        return [{
+            "id": table["table"],
+            "table": table["table"],
+            "where": None,
+            "estimated_bytes": table["bytes"],
+            "estimated_rows": table["rows"],
+            "threads": min(4, dump_workers) if chunks > 1 else 1
+        }]
+
+    def _key_ranges(self, table: dict, low: int, high: int, chunks: int) -> list:
+        step = (high - low + 1) / chunks
+        edges = [low + round(step * i) for i in range(1, chunks)]
+        column = f"`{table['key_column']}`"
+        units = []
+        for i in range(chunks):
+            conditions = []
+            if i > 0:
+                conditions.append(f"{column} >= {edges[i - 1]}")
+            if i < chunks - 1:
+                conditions.append(f"{column} < {edges[i]}")
+            units.append({
+                "id": f"{table['table']}{CHUNK_SEPARATOR}{i:03d}",
+                "table": table["table"],
+                "where": " AND ".join(conditions),
+                "estimated_bytes": table["bytes"] // chunks,
+                "estimated_rows": table["rows"] // chunks,
+                "threads": 1
+            })
+        return units
+
+    @staticmethod
+    def save_plan(plan: dict, path: str):
+        with open(path, "w") as f:
+            json.dump(plan, f, indent=2)
+
+    @staticmethod
+    def load_plan(path: str) -> dict:
+        with open(path) as f:
+            return json.load(f)
+
+
+def machine_type_vcpus(machine_type: str):
+    """vCPUs of a Cloud SQL tier such as db-n1-standard-4, db-custom-8-30720 or db-f1-micro; None if unknown."""
+    if not machine_type:
+        return None
+    if machine_type in _SHARED_CORE_TIERS:
+        return _SHARED_CORE_TIERS[machine_type]
+    custom = re.match(r"^db-(?:\w+-)?custom-(\d+)-\d+$", machine_type)
+    if custom:
+        return int(custom.group(1))
+    predefined = re.match(r"^db-[\w-]+?-(\d+)$", machine_type)
+    return int(predefined.group(1)) if predefined else None
+
+
+def choose_workers(machine_type: str = None, cpu_count: int = None) -> dict:
+    """
+    Dump workers from the local cores (mydumper compression is CPU-bound on the orchestrator) and load workers
+    from the target's vCPUs, which bound how many concurrent InnoDB loads it can absorb. Unknown tiers fall
+    back to the local core count. Upload workers are few: each upload already sends its parts concurrently
+    (ObjectStore transfer workers), so a handful of tables in flight fill the network link.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    vcpus = machine_type_vcpus(machine_type) or cpu_count
+    return {"dump_workers": max(1, cpu_count), "upload_workers": max(2, min(4, cpu_count // 2)),
+            "load_workers": max(1, min(vcpus, 2 * cpu_count)), "target_vcpus": vcpus}
+
+
+def lpt_makespan(durations: list, workers: int) -> int:
+    """Makespan of assigning durations, in the given order, each to the worker that frees up first."""
+    finish = [0] * max(1, workers)
+    for duration in durations:
+        heapq.heapreplace(finish, finish[0] + duration)
+    return max(finish)
+
+
+def unit_table(unit_id: str) -> str:
+    """Table a work unit id belongs to."""
+    return unit_id.split(CHUNK_SEPARATOR)[0]
+
+
+def earliest_table_positions(positions: dict) -> dict:
+    """
+    Folds per-unit snapshot positions into the earliest position of each table. Replaying a table's changes
+    from its earliest chunk is safe because the catch-up applies idempotent upserts and deletes.
+    """
+    tables = {}
+    for unit_id, position in positions.items():
+        table = unit_table(unit_id)
+        if table not in tables or (position["log_file"], position["log_pos"]) < (tables[table]["log_file"], tables[table]["log_pos"]):
+            tables[table] = position
+    return tables
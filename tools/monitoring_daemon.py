@@ -0,0 +1,213 @@
+import asyncio
+import collections
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from tools.anomaly_engine import AnomalyEngine
+from tools.metric_store import get_metric_store
+from tools.metrics_client import MetricsClient
+
+DEFAULT_METRICS = ["cpu_utilization", "memory_utilization", "disk_utilization", "network_egress"]
+
+
+class MonitoringDaemon:
+    """
+    Continuous anomaly monitoring of many Cloud SQL instances on asyncio.
+
+    Every interval_seconds, all instances are polled concurrently (at most concurrency at a time): each poll
+    fetches only the points written since the previous one (MetricsClient keeps the high-water marks), appends
+    them to the MetricStore, and scores the instance locally with the AnomalyEngine against history_days of
+    history. Only anomaly clusters that were not reported before are queued for on_anomaly (e.g. an LLM
+    explanation), which runs on explain_workers background workers so a slow explanation never delays a poll.
+    The queue holds at most max_backlog clusters; further clusters are counted as dropped.
+
+    stats() returns poll latencies (last, p50, p95, max), per-instance latency, overruns (polls longer than
+    the interval), failures and the explanation backlog; they are also written to stats_path after every poll.
+    """
+
+    def __init__(self, project_id: str, instances: list, metrics: list = None, interval_seconds: float = 60.0,
+                 history_days: float = 7, concurrency: int = 16, fetch_workers: int = 32, store=None, engine: AnomalyEngine = None,
+                 on_anomaly=None, explain_workers: int = 1, max_backlog: int = 100, stats_path: str = None, latency_samples: int = 1000,
+                 client_options: dict = None):
+        self.project_id = project_id
+        self.instances = list(instances)
+        self.metrics = metrics or DEFAULT_METRICS
+        self.interval_seconds = interval_seconds
+        self.history_days = history_days
+        self.concurrency = concurrency
+        self.store = store or get_metric_store()
+        self.engine = engine or AnomalyEngine()
+        self.on_anomaly = on_anomaly
+        self.explain_workers = explain_workers
+        self.max_backlog = max_backlog
+        self.stats_path = stats_path
+        self.client_options = client_options or {} # Extra MetricsClient arguments, e.g. endpoint
+        self.anomalies = [] # Every newly reported cluster, with its "explanation" once on_anomaly has run
+        self._fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers) # Shared by the per-instance clients
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._reported = {} # (instance, metric) -> end of the newest reported cluster
+        self._queue = None
+        self._poll_latencies = collections.deque(maxlen=latency_samples)
+        self._instance_latencies = collections.deque(maxlen=latency_samples)
+        self._counters = {"polls": 0, "instance_polls": 0, "failures": 0, "overruns": 0, "new_anomalies": 0,
+                          "explained": 0, "explain_failures": 0, "dropped": 0}
+        self._last_poll = None
+
+    async def run(self, iterations: int = None, stop_event: threading.Event = None) -> dict:
+        """
+        Polls every interval_seconds until iterations polls have run or stop_event is set, then waits for
+        queued explanations. Returns {"status", "stats", "anomalies"}.
+        """
+        stop_event = stop_event or threading.Event()
+        self._queue = asyncio.Queue(maxsize=self.max_backlog)
+        workers = [asyncio.create_task(self._explain_worker()) for _ in range(self.explain_workers if self.on_anomaly else 0)]
+        print(f"Monitoring {len(self.instances)} instance(s) every {self.interval_seconds:.0f}s: {', '.join(self.metrics)}")
+        polls = 0
+        try:
+            while not stop_event.is_set() and (iterations is None or polls < iterations):
+                started = time.monotonic()
+                await self.poll_once()
+                polls += 1
+                if iterations is not None and polls >= iterations:
+                    break
+                deadline = started + self.interval_seconds
+                while not stop_event.is_set() and time.monotonic() < deadline:
+                    await asyncio.sleep(min(1.0, deadline - time.monotonic()))
+            if workers:
+                await self._queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self._fetch_pool.shutdown()
+        return {"status": "stopped", "stats": self.stats(), "anomalies": self.anomalies}
+
+    async def poll_once(self) -> list:
+        """Polls and scores every instance once; returns the newly reported anomaly clusters."""
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def poll(instance):
+            async with semaphore:
+                return await asyncio.to_thread(self._poll_instance, instance)
+
+        results = await asyncio.gather(*(poll(instance) for instance in self.instances))
+        new = [cluster for clusters in results for cluster in clusters]
+        for cluster in new:
+            self.anomalies.append(cluster)
+            print(f"New anomaly on {cluster['instance']} {cluster['metric']}: {cluster['start']} - {cluster['end']}, "
+                  f"peak {cluster['peak_value']:.4g} ({', '.join(cluster['reasons'])})")
+            if self.on_anomaly is None:
+                continue
+            try:
+                self._queue.put_nowait(cluster)
+            except asyncio.QueueFull:
+                with self._lock:
+                    self._counters["dropped"] += 1
+
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._poll_latencies.append(elapsed)
+            self._counters["polls"] += 1
+            self._counters["overruns"] += elapsed > self.interval_seconds
+            self._last_poll = time.time()
+        stats = self.stats()
+        print(f"Poll {stats['polls']}: {len(self.instances)} instance(s) in {elapsed:.2f}s, {len(new)} new anomaly cluster(s), "
+              f"backlog {stats['backlog']}")
+        if self.stats_path:
+            with open(self.stats_path, "w") as f:
+                json.dump(stats, f, indent=2)
+        return new
+
+    def stats(self) -> dict:
+        with self._lock:
+            polls = np.array(self._poll_latencies)
+            instances = np.array(self._instance_latencies)
+            return {
+                **self._counters,
+                "instances": len(self.instances),
+                "interval_seconds": self.interval_seconds,
+                "last_poll_seconds": round(float(polls[-1]), 3) if len(polls) else None,
+                "poll_p50_seconds": round(float(np.percentile(polls, 50)), 3) if len(polls) else None,
+                "poll_p95_seconds": round(float(np.percentile(polls, 95)), 3) if len(polls) else None,
+                "poll_max_seconds": round(float(polls.max()), 3) if len(polls) else None,
+                "instance_p95_seconds": round(float(np.percentile(instances, 95)), 3) if len(instances) else None,
+                "backlog": self._queue.qsize() if self._queue else 0,
+                "last_poll": self._last_poll,
+                "store": self.store.stats()
+            }
+
+    def history_hours(self) -> float:
+        """
+        Hours fetched on an instance's first poll: history_days before the scored window (one interval plus the
+        cluster gap), plus an hour, so the same hour one week before every scored point is complete and its
+        hour-of-week baseline exists.
+        """
+        return self.history_days * 24 + math.ceil((self.interval_seconds + self.engine.cluster_gap_seconds) / 3600) + 1
+
+    def _poll_instance(self, instance: str) -> list:
+        started = time.monotonic()
+        try:
+            client = self._client(instance)
+            before = self._newest(instance)
+            client.poll(self.metrics, self.history_hours())
+            # Points arrive minutes late, so "recent" is measured from the data rather than the clock
+            newest = before or self._newest(instance)
+            if newest is None:
+                return []
+            recent = newest - self.interval_seconds - self.engine.cluster_gap_seconds
+            clusters = self.engine.detect_store(self.store, since=recent, instances=[instance], metrics=self.metrics)
+            return self._new_clusters(clusters)
+        except Exception as e:
+            print(f"Error polling metrics of {instance}: {e}")
+            with self._lock:
+                self._counters["failures"] += 1
+            return []
+        finally:
+            with self._lock:
+                self._instance_latencies.append(time.monotonic() - started)
+                self._counters["instance_polls"] += 1
+
+    def _client(self, instance: str) -> MetricsClient:
+        with self._lock:
+            client = self._clients.get(instance)
+            if client is None:
+                client = self._clients[instance] = MetricsClient(self.project_id, instance, store=self.store,
+                                                                 executor=self._fetch_pool, **self.client_options)
+            return client
+
+    def _newest(self, instance: str) -> float:
+        times = [self.store.newest(instance, metric) for metric in self.metrics]
+        return max((t for t in times if t is not None), default=None)
+
+    def _new_clusters(self, clusters: list) -> list:
+        """Clusters not reported yet; a cluster that continues a reported one only extends it."""
+        new = []
+        with self._lock:
+            for cluster in clusters:
+                key = (cluster["instance"], cluster["metric"])
+                reported = self._reported.get(key)
+                if reported is None or cluster["start_epoch"] > reported + self.engine.cluster_gap_seconds:
+                    new.append(cluster)
+                self._reported[key] = max(reported or cluster["end_epoch"], cluster["end_epoch"])
+            self._counters["new_anomalies"] += len(new)
+        return new
+
+    async def _explain_worker(self):
+        while True:
+            cluster = await self._queue.get()
+            try:
+                cluster["explanation"] = await asyncio.to_thread(self.on_anomaly, cluster)
+                with self._lock:
+                    self._counters["explained"] += 1
+                print(f"Explanation for {cluster['instance']} {cluster['metric']} at {cluster['start']}: {cluster['explanation']}")
+            except Exception as e:
+                print(f"Error explaining anomaly on {cluster['instance']} {cluster['metric']}: {e}")
+                with self._lock:
+                    self._counters["explain_failures"] += 1
+            finally:
+                self._queue.task_done()
@@ -1,93 +1,70 @@
-import subprocess
-import json
+import os
+import time
+from tools.metrics_client import METRIC_TYPES, get_metrics_client
 
 class MonitoringTools:
     """Tools for monitoring GCP resources."""
 
     @staticmethod
-    def get_cloudsql_metrics(instance_name: str, metric_type: str, duration_hours: int = 1) -> dict:
+    def get_cloudsql_metrics(instance_name: str, metric_type: str, duration_hours: int = 1) -> list:
         """
         Retrieves Cloud SQL instance metrics (e.g., cpu/utilization, disk/utilization, memory/usage).
         Requires Cloud Monitoring API enabled and appropriate IAM permissions.
         """
-        end_time = "now"
-        start_time = f"now-{duration_hours}h"
-        
-        # Mapping common metric types to full Cloud Monitoring metric paths
-        metrics_map = {
-            "cpu_utilization": "cloudsql.googleapis.com/database/cpu/utilization",
-            "memory_usage": "cloudsql.googleapis.com/database/memory/usage",
-            "disk_utilization": "cloudsql.googleapis.com/database/disk/utilization",
-            "network_egress": "cloudsql.googleapis.com/database/network/sent_bytes_count"
-        }
-        
-        if metric_type not in metrics_map:
-            raise ValueError(f"Unsupported metric type: {metric_type}. Choose from {list(metrics_map.keys())}")
-        
-        metric_path = metrics_map[metric_type]
-        
-        command = (
-            f"gcloud monitoring time-series list "
-            f"--project={os.environ.get('GCP_PROJECT_ID')} " # Assume project ID is in env var
-            f"--metric={metric_path} "
-            f"--resource-type=cloudsql_database "
-            f"--filter='resource.label.database_id=\"{instance_name}\"' "
-            f"--end-time={end_time} "
-            f"--start-time={start_time} "
-            f"--interval=60s " # Sample every 60 seconds
-            f"--format=json"
-        )
-        
-        try:
-            result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
-            return json.loads(result.stdout)
-        except subprocess.CalledProcessError as e:
-            print(f"Error executing gcloud monitoring command: {e.stderr}")
-            raise
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON from gcloud monitoring: {e}")
-            print(f"Raw stdout: {result.stdout}")
-            raise
+        return MonitoringTools.get_cloudsql_metrics_batch(instance_name, [metric_type], duration_hours)[metric_type]
+
+    @staticmethod
+    def get_cloudsql_metrics_batch(instance_name: str, metric_types: list = None, duration_hours: int = 1) -> dict:
+        """
+        Retrieves several Cloud SQL metrics at once ({metric type: time series}), fetched concurrently.
+        Repeated calls only fetch the points written since the previous call (see MetricsClient).
+        """
+        # The metric store and anomaly engine are imported when first used: they load numpy and pandas
+        from tools.metric_store import get_metric_store
+        client = get_metrics_client(os.environ.get('GCP_PROJECT_ID'), instance_name, store=get_metric_store()) # Assume project ID is in env var
+        return client.fetch(metric_types or list(METRIC_TYPES), duration_hours)
 
     @staticmethod
     def analyze_metrics_for_anomaly(metrics_data: dict, threshold: float = 0.9) -> dict:
         """
-        Analyzes metric data for simple threshold-based anomalies.
-        For memory, recommends staying below 90%.[5, 6]
+        Analyzes metric data ({metric type: time series}, or a list of time series) for anomalies against each
+        series' own rolling, EWMA and hour-of-week baselines (see AnomalyEngine).
+        Utilization above threshold is always reported; for memory, recommends staying below 90%.[5, 6]
         """
-        anomalies =
         if not metrics_data:
-            return {"status": "no_data", "anomalies": anomalies}
+            return {"status": "no_data", "anomalies_found": 0, "anomalies": []}
+        from tools.anomaly_engine import AnomalyEngine
+        from tools.metric_store import MetricStore
+        if isinstance(metrics_data, list):
+            metrics_data = {_short_name(series.get('metric', {}).get('type', 'unknown_metric')): [series] for series in metrics_data}
+
+        store = MetricStore()
+        for metric, time_series in metrics_data.items():
+            store.ingest("analyzed", metric, time_series)
+        limits = {metric: threshold for _, metric in store.keys() if 'utilization' in metric}
+        anomalies = AnomalyEngine(limits=limits).detect_store(store)
+        for anomaly in anomalies:
+            anomaly.pop("instance")
+        return {"status": "success", "anomalies_found": len(anomalies), "anomalies": anomalies}
+
+    @staticmethod
+    def detect_metric_anomalies(instance_name: str, metric_types: list = None, history_days: int = 7, recent_hours: int = 6) -> dict:
+        """
+        Fetches history_days of metrics before the last recent_hours (incrementally, into the shared MetricStore)
+        and reports anomaly clusters of those recent hours, scored against the whole history. The history
+        reaches back past the same hours one week earlier, so their hour-of-week baseline exists and recurring
+        peaks such as nightly batches are not reported.
+        """
+        from tools.anomaly_engine import AnomalyEngine
+        from tools.metric_store import get_metric_store
+        MonitoringTools.get_cloudsql_metrics_batch(instance_name, metric_types, history_days * 24 + recent_hours + 1)
+        anomalies = AnomalyEngine().detect_store(get_metric_store(), since=time.time() - recent_hours * 3600,
+                                                 instances=[instance_name], metrics=metric_types)
+        return {"status": "success", "anomalies_found": len(anomalies), "anomalies": anomalies}
 
-        # Assuming metrics_data is a list of time series, each with points
-        for series in metrics_data:
-            metric_name = series.get('metric', {}).get('type', 'unknown_metric')
-            for point in series.get('points',):
-                value = point.get('value', {}).get('doubleValue') # Assuming double value
-                if value is None:
-                    continue
-                
-                # Convert utilization/usage to percentage if applicable (values are 0-1)
-                if 'utilization' in metric_name or 'usage' in metric_name:
-                    value_percent = value * 100
-                    if value_percent > threshold * 100:
-                        anomalies.append({
-                            "metric": metric_name,
-                            "time": point.get('interval', {}).get('endTime'),
-                            "value": value_percent,
-                            "threshold": threshold * 100,
-                            "message": f"High usage detected: {value_percent:.2f}% exceeds {threshold * 100:.0f}%"
-                        })
-                elif 'sent_bytes_count' in metric_name:
-                    # For network egress, a simple spike detection or comparison to historical average
-                    # For this example, just flag if it's unusually high (needs context)
-                    # A more advanced agent would compare against a rolling average or historical baseline
-                    if value > 100000000: # Example: if > 100MB in an interval
-                        anomalies.append({
-                            "metric": metric_name,
-                            "time": point.get('interval', {}).get('endTime'),
-                            "value_bytes": value,
-                            "message": f"High network egress detected: {value} bytes"
-                        })
 
-        return {"status": "success", "anomalies_found": len(anomalies), "anomalies": anomalies}
\ No newline at end of file
+def _short_name(metric_type: str) -> str:
+    for name, (full_type, _) in METRIC_TYPES.items():
+        if full_type == metric_type:
+            return name
+    return metric_type
@@ -1,80 +1,364 @@
 import mysql.connector
+import csv
+import gzip
+import re
 import subprocess
 import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tools.connection_pool import DEFAULT_POOL_SIZE, get_pool
+from tools.process_runner import ProcessRunner
+from tools.schema_extractor import SchemaExtractor
+
+# Tokens of an INSERT ... VALUES statement: quoted strings (with backslash or doubled-quote escapes),
+# punctuation, and bare words such as numbers, NULL or a _binary introducer
+_INSERT_TOKEN = re.compile(r"'(?:[^'\\]|\\.|'')*'|[(),;]|[^\s(),;']+")
+_INSERT_HEADER = re.compile(r"^\s*(?:INSERT|REPLACE)\s+(?:IGNORE\s+)?INTO\s+((?:`[^`]+`|\w+)(?:\.(?:`[^`]+`|\w+))?)\s*(\([^)]*\))?\s*VALUES\s*", re.IGNORECASE)
+_SQL_ESCAPES = {"0": "\x00", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a", "%": "\\%", "_": "\\_"}
+_SQL_ESCAPE_SEQUENCE = re.compile(r"\\(.)|''", re.DOTALL)
+_LOAD_DATA_SPECIAL = re.compile(r"[\\\t\n\r\x00]")
+_LOAD_DATA_ESCAPES = {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\x00": "\\0"}
 
 class MySQLTools:
     """Tools for interacting with MySQL databases."""
 
-    def __init__(self, host, user, password, database=None, port=3306):
+    def __init__(self, host, user, password, database=None, port=3306, pool_size: int = DEFAULT_POOL_SIZE):
         self.host = host
         self.user = user
         self.password = password
         self.database = database
         self.port = port
-        self.connection = None
-
-    def _get_connection(self):
-        if self.connection is None or not self.connection.is_connected():
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                port=self.port,
-                ssl_mode="VERIFY_IDENTITY" # Enforce SSL [4]
-            )
-        return self.connection
+        self.pool_size = pool_size
+        self._pool = None
+
+    def _get_pool(self):
+        # Resolved lazily so tool objects built with placeholder credentials never connect, and again after
+        # close_all_pools() so a cached pool does not outlive the run that closed it
+        if self._pool is None or self._pool.closed:
+            self._pool = get_pool(self.host, self.user, self.password, self.database, self.port, max_size=self.pool_size)
+        return self._pool
 
     def execute_query(self, query: str, fetch_all=False):
-        """Executes a SQL query and returns results."""
-        conn = self._get_connection()
-        cursor = conn.cursor(dictionary=True)
+        """Executes a SQL query on a pooled connection and returns results."""
+        with self._get_pool().connection() as conn:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            try:
+                cursor.execute(query)
+                if query.strip().upper().startswith(("INSERT", "UPDATE", "DELETE")):
+                    conn.commit()
+                    return {"status": "success", "rows_affected": cursor.rowcount}
+                else:
+                    return cursor.fetchall() if fetch_all else cursor.fetchone()
+            except mysql.connector.Error as err:
+                print(f"Error executing query: {err}")
+                raise
+            finally:
+                cursor.close()
+
+    def run_in_transaction(self, statements: list, foreign_key_checks: bool = True) -> int:
+        """
+        Runs (query, params_list) pairs in one transaction on a pooled connection; each query is executed
+        once per entry of its params_list via executemany. Returns the number of affected rows.
+        foreign_key_checks=False disables them for this transaction (the session is reset afterwards), for
+        changes applied in an order other than the source's.
+        """
+        with self._get_pool().connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if not foreign_key_checks:
+                    cursor.execute("SET SESSION foreign_key_checks = 0")
+                conn.start_transaction()
+                affected = 0
+                for query, params_list in statements:
+                    cursor.executemany(query, params_list)
+                    affected += max(cursor.rowcount, 0)
+                conn.commit()
+                return affected
+            except mysql.connector.Error as err:
+                conn.rollback()
+                print(f"Error executing transaction: {err}")
+                raise
+            finally:
+                cursor.close()
+                if not foreign_key_checks:
+                    conn.reset_session()
+
+    def execute_statements(self, statements: list):
+        """
+        Executes statements in order on one pooled connection, so session settings (SET SESSION ...) apply
+        to the statements that follow. Returns the rows of the last statement (as dicts), or None if it
+        returned no result set. The session is reset before the connection returns to the pool.
+        """
+        with self._get_pool().connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                rows = None
+                for query in statements:
+                    cursor.execute(query)
+                    rows = cursor.fetchall() if cursor.with_rows else None
+                return rows
+            except mysql.connector.Error as err:
+                print(f"Error executing statements: {err}")
+                raise
+            finally:
+                cursor.close()
+                conn.reset_session()
+
+    def fresh_statistics_statements(self) -> list:
+        """
+        Session statements for execute_statements that make information_schema.TABLES report current row
+        counts and sizes: MySQL 8.0.3+ caches them for a day by default, which would hide a fresh load.
+        Empty on older servers, which always report current statistics and reject the setting.
+        """
+        version = self.execute_query("SELECT VERSION() AS version")['version']
+        if tuple(int(part) for part in re.findall(r"\d+", version)[:3]) < (8, 0, 3):
+            return []
+        return ["SET SESSION information_schema_stats_expiry = 0"]
+
+    def stream_query(self, query: str, batch_size: int = 10000, row_format: str = "dict"):
+        """
+        Runs a query on an unbuffered cursor and yields the result in batches of up to batch_size rows,
+        so arbitrarily large results are processed in constant memory.
+        row_format is "dict" or "tuple" (each batch is a list of rows), or "numpy" (each batch is a
+        dict mapping column name to a NumPy array).
+        """
+        if row_format not in ("dict", "tuple", "numpy"):
+            raise ValueError(f"Unsupported row_format: {row_format}. Choose from ['dict', 'tuple', 'numpy']")
+        pool = self._get_pool()
+        conn = pool.acquire()
+        finished = False
         try:
+            cursor = conn.cursor(dictionary=row_format == "dict", buffered=False)
             cursor.execute(query)
-            if query.strip().upper().startswith(("INSERT", "UPDATE", "DELETE")):
-                conn.commit()
-                return {"status": "success", "rows_affected": cursor.rowcount}
-            else:
-                return cursor.fetchall() if fetch_all else cursor.fetchone()
+            columns = [description[0] for description in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if row_format == "numpy":
+                    import numpy as np # Imported here so callers that never ask for arrays do not load numpy
+                    yield {name: np.array([row[i] for row in rows]) for i, name in enumerate(columns)}
+                else:
+                    yield rows
+            cursor.close()
+            finished = True
+        except mysql.connector.Error as err:
+            print(f"Error streaming query: {err}")
+            raise
+        finally:
+            # A consumer that stops early leaves unread rows on the wire; draining them could take
+            # as long as the full scan, so the connection is dropped instead of returned.
+            pool.release(conn, discard=not finished)
+
+    def pool_stats(self) -> dict:
+        """Returns statistics of the connection pool shared by this host/user/database."""
+        return self._get_pool().stats()
+
+    def bulk_load_file(self, path: str, table: str = None, columns: list = None, file_format: str = None,
+                       initial_batch_rows: int = 50000, min_batch_rows: int = 5000, max_batch_rows: int = 1000000) -> dict:
+        """
+        Loads an INSERT dump file (e.g. data/load_departments.dump, plain or gzip) or a CSV chunk into this
+        database without myloader. Rows are streamed into LOAD DATA LOCAL INFILE batches on a session with
+        unique and foreign key checks off and one transaction per batch. The batch size doubles while rows/sec
+        keeps up and halves when it drops. Falls back to multi-row INSERTs when the server disables local_infile.
+        CSV files need table; their first line is the column list and \\N marks NULL.
+        """
+        file_format = file_format or ("csv" if ".csv" in os.path.basename(path) else "sql")
+        rows = iter_csv_rows(path, table) if file_format == "csv" else iter_dump_rows(path)
+        conn, method = self.bulk_connection()
+        cursor = conn.cursor()
+        stats = {"rows": 0, "batches": 0, "load_seconds": 0.0}
+        started = time.monotonic()
+        batch = None
+        try:
+            batch_rows, best_rate = initial_batch_rows, None
+            batch, batch_key = _BulkBatch(method), None
+            for row_table, row_columns, row in rows:
+                key = (table or row_table, tuple(columns or row_columns or ()))
+                if batch.count and (key != batch_key or batch.count >= batch_rows):
+                    full = batch.count >= batch_rows
+                    rate = self._load_batch(conn, cursor, batch_key, batch, stats)
+                    if full:
+                        # Adapt on full batches only; a short batch at a table switch says little about throughput
+                        if best_rate is None or rate >= best_rate * 0.9:
+                            batch_rows = min(batch_rows * 2, max_batch_rows)
+                        elif rate < best_rate * 0.6:
+                            batch_rows = max(batch_rows // 2, min_batch_rows)
+                        best_rate = max(best_rate or 0.0, rate)
+                    batch = _BulkBatch(method)
+                batch_key = key
+                batch.add(row)
+            if batch.count:
+                self._load_batch(conn, cursor, batch_key, batch, stats)
         except mysql.connector.Error as err:
-            print(f"Error executing query: {err}")
+            conn.rollback()
+            print(f"Bulk load of {path} failed: {err}")
+            raise
+        finally:
+            if batch is not None and batch.file is not None and not batch.file.closed:
+                batch.file.close()
+                os.unlink(batch.file.name)
+            cursor.close()
+            conn.close()
+
+        elapsed = time.monotonic() - started
+        return {
+            "status": "success",
+            "file": path,
+            "method": method,
+            "rows": stats["rows"],
+            "batches": stats["batches"],
+            "final_batch_rows": batch_rows,
+            "seconds": round(elapsed, 2),
+            "rows_per_second": round(stats["rows"] / elapsed, 1) if elapsed else None
+        }
+
+    def dedicated_connection(self, **overrides):
+        """
+        Opens a connection outside the pool, with the pool's settings plus overrides, for sessions that keep
+        state the pool must not hand to another borrower (a snapshot transaction, bulk load settings).
+        """
+        return mysql.connector.connect(**dict(self._get_pool().connect_args, **overrides))
+
+    def bulk_connection(self) -> tuple:
+        """
+        Opens a dedicated (unpooled) connection for bulk loads, with LOCAL INFILE allowed, autocommit off and
+        unique and foreign key checks off. Returns (connection, method): "load_data", or "insert" when the
+        server disables local_infile.
+        """
+        conn = self.dedicated_connection(allow_local_infile=True, autocommit=False)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SET SESSION unique_checks = 0")
+            cursor.execute("SET SESSION foreign_key_checks = 0")
+            cursor.execute("SELECT @@GLOBAL.local_infile")
+            method = "load_data" if cursor.fetchone()[0] else "insert"
+        except mysql.connector.Error:
+            conn.close()
+            raise
+        finally:
+            cursor.close()
+        return conn, method
+
+    def load_rows(self, conn, method: str, table: str, columns: list, rows: list) -> float:
+        """Loads and commits rows (tuples in column order) on a bulk_connection; returns rows/sec."""
+        batch = _BulkBatch(method)
+        cursor = conn.cursor()
+        try:
+            for row in rows:
+                batch.add(row)
+            return self._load_batch(conn, cursor, (table, tuple(columns)), batch, {"rows": 0, "batches": 0, "load_seconds": 0.0})
+        except mysql.connector.Error:
+            conn.rollback()
             raise
         finally:
+            if batch.file is not None and not batch.file.closed:
+                batch.file.close()
+                os.unlink(batch.file.name)
             cursor.close()
 
-    def get_schema_ddl(self, db_name: str) -> str:
-        """Extracts DDL for all tables and routines in a database."""
-        ddl_script =
-        tables = self.execute_query(f"SHOW TABLES FROM {db_name}", fetch_all=True)
-        for table in tables:
-            table_name = list(table.values())
-            create_table_sql = self.execute_query(f"SHOW CREATE TABLE {db_name}.`{table_name}`", fetch_all=False)
-            ddl_script.append(create_table_sql + ";\n")
-
-        # Add views, procedures, functions if needed
-        # For simplicity, focusing on tables for now.
-        return "\n".join(ddl_script)
-
-    def run_mydumper(self, source_host: str, source_user: str, source_password: str, source_db: str, output_dir: str, threads: int = 4):
-        """Runs mydumper to export data."""
+    def bulk_load_directory(self, input_dir: str, threads: int = 4, on_file_loaded=None) -> dict:
+        """
+        Loads every data file of a dump directory (mydumper layout, INSERT dumps or CSV) with bulk_load_file in parallel.
+        CSV chunks are loaded into the table named by their file name (<database>.<table>.<chunk>.csv).
+        on_file_loaded is called with each file's path as soon as that file is fully loaded.
+        """
+        files = sorted(
+            os.path.join(input_dir, name) for name in os.listdir(input_dir)
+            if name.endswith((".sql", ".sql.gz", ".dump", ".csv", ".csv.gz")) and not name.startswith("metadata") and "-schema" not in name
+        )
+        print(f"Bulk loading {len(files)} files from {input_dir} with {threads} threads...")
+        def load(path):
+            csv_table = dump_file_table(path) if ".csv" in os.path.basename(path) else None
+            result = self.bulk_load_file(path, table=csv_table)
+            if on_file_loaded:
+                on_file_loaded(path)
+            return result
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(load, files))
+        return {"status": "success", "files": len(results), "rows": sum(r["rows"] for r in results), "results": results}
+
+    def _load_batch(self, conn, cursor, key: tuple, batch, stats: dict) -> float:
+        """Loads and commits one batch; returns its rows/sec."""
+        table, columns = key
+        column_list = f" ({', '.join(f'`{c}`' for c in columns)})" if columns else ""
+        started = time.monotonic()
+        if batch.method == "load_data":
+            batch.file.close()
+            try:
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE '{batch.file.name}' INTO TABLE `{self.database}`.`{table}` CHARACTER SET utf8mb4 "
+                    f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n'{column_list}"
+                )
+            finally:
+                os.unlink(batch.file.name)
+        else:
+            placeholders = ", ".join(["%s"] * len(batch.rows[0]))
+            # IGNORE, like LOAD DATA LOCAL, so replaying a partially loaded file skips the rows already there
+            cursor.executemany(f"INSERT IGNORE INTO `{self.database}`.`{table}`{column_list} VALUES ({placeholders})", batch.rows)
+        conn.commit()
+        seconds = max(time.monotonic() - started, 1e-6)
+        stats["rows"] += batch.count
+        stats["batches"] += 1
+        stats["load_seconds"] += seconds
+        return batch.count / seconds
+
+    def get_schema_ddl(self, db_name: str, show_create: str = "auto") -> str:
+        """
+        Extracts DDL for all tables, views, routines and triggers in a database from information_schema.
+        show_create: "auto" (SHOW CREATE only for routines and tables the model cannot rebuild), "all" or "none".
+        """
+        extractor = SchemaExtractor(self, db_name)
+        return extractor.ddl(show_create=show_create)
+
+    def run_mydumper(self, source_host: str, source_user: str, source_password: str, source_db: str, output_dir: str, threads: int = 4,
+                     tables_list: str = None, no_schemas: bool = False, insert_ignore: bool = False, where: str = None,
+                     compress: bool = True, expected_bytes: int = None, on_event=None, cancel_event=None):
+        """
+        Runs mydumper to export data; tables_list (e.g. 'db.t1,db.t2') restricts the dump to those tables and
+        where (e.g. 'emp_no >= 10000 AND emp_no < 20000') to one chunk of their rows.
+        Output is streamed and parsed as it is written (see ProcessRunner): expected_bytes (e.g. the tables'
+        DATA_LENGTH) gives an ETA, on_event receives each progress event and cancel_event stops the dump.
+        """
         # Ensure mydumper is installed and accessible in the environment
         # For production, consider running mydumper in a Docker container for isolation
         print(f"Running mydumper for {source_db} to {output_dir} with {threads} threads...")
-        command =
-            "--compress",
+        command = [
+            "mydumper",
+            f"--host={source_host}",
+            f"--user={source_user}",
+            f"--password={source_password}",
+            f"--database={source_db}",
+            f"--outputdir={output_dir}",
+            f"--threads={threads}",
+            "--verbose=3",
             "--trx-consistency-only" # Less locking for InnoDB [1]
+        ]
+        if compress:
+            command.append("--compress") # Off when the files are compressed in transit instead (ObjectStore)
+        if tables_list:
+            command.append(f"--tables-list={tables_list}")
+        if no_schemas:
+            command.append("--no-schemas") # Tables already created by the schema conversion step
+        if insert_ignore:
+            command.append("--insert-ignore") # Makes re-loading a partially loaded chunk idempotent
+        if where:
+            command.append(f"--where={where}")
+        runner = ProcessRunner(command, name="mydumper", output_dir=output_dir, expected_bytes=expected_bytes,
+                               on_event=on_event, cancel_event=cancel_event)
         try:
-            result = subprocess.run(command, check=True, capture_output=True, text=True)
-            print("Mydumper stdout:\n", result.stdout)
-            print("Mydumper stderr:\n", result.stderr)
-            print("Mydumper completed successfully.")
-            return {"status": "success", "output": result.stdout}
+            result = runner.run_sync()
+            print(f"Mydumper {'was cancelled' if result['status'] == 'cancelled' else 'completed successfully'}.")
+            return {"status": result["status"], "output": result["log"], "stats": result["stats"]}
         except subprocess.CalledProcessError as e:
             print(f"Mydumper failed: {e.stderr}")
             raise
 
-    def run_myloader(self, target_host: str, target_user: str, target_password: str, target_db: str, input_dir: str, threads: int = 4):
-        """Runs myloader to import data."""
+    def run_myloader(self, target_host: str, target_user: str, target_password: str, target_db: str, input_dir: str, threads: int = 4,
+                     on_event=None, cancel_event=None):
+        """Runs myloader to import data, streaming its progress like run_mydumper."""
         print(f"Running myloader for {target_db} from {input_dir} with {threads} threads...")
         command = [
             "myloader",
@@ -87,18 +371,103 @@ class MySQLTools:
             "--verbose=3", # Verbose output [1]
             "--enable-binlog" # Ensure binlog is enabled for replication if needed
         ]
+        runner = ProcessRunner(command, name="myloader", on_event=on_event, cancel_event=cancel_event)
         try:
-            result = subprocess.run(command, check=True, capture_output=True, text=True)
-            print("Myloader stdout:\n", result.stdout)
-            print("Myloader stderr:\n", result.stderr)
-            print("Myloader completed successfully.")
-            return {"status": "success", "output": result.stdout}
+            result = runner.run_sync()
+            print(f"Myloader {'was cancelled' if result['status'] == 'cancelled' else 'completed successfully'}.")
+            return {"status": result["status"], "output": result["log"], "stats": result["stats"]}
         except subprocess.CalledProcessError as e:
             print(f"Myloader failed: {e.stderr}")
             raise
 
     def close(self):
-        """Closes the database connection."""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            self.connection = None
\ No newline at end of file
+        """Detaches from the shared connection pool; pooled connections stay open for other users."""
+        self._pool = None
+
+
+class _BulkBatch:
+    """Rows of one bulk load batch, streamed to a LOAD DATA temp file or kept for executemany."""
+
+    def __init__(self, method: str):
+        self.method = method
+        self.count = 0
+        self.rows = []
+        self.file = tempfile.NamedTemporaryFile("w", encoding="utf-8", errors="surrogateescape", newline="",
+                                                suffix=".tsv", delete=False) if method == "load_data" else None
+
+    def add(self, row: tuple):
+        self.count += 1
+        if self.file is not None:
+            self.file.write("\t".join(_load_data_field(value) for value in row) + "\n")
+        else:
+            self.rows.append(row)
+
+
+def iter_dump_rows(path: str):
+    """
+    Yields (table, columns, row) for every row of the INSERT statements in a SQL dump file, plain or gzip.
+    Rows are parsed line by line, which holds for mysqldump and mydumper output since both escape
+    newlines inside values. columns is None when the statement has no column list.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    table, columns, row = None, None, None
+    with opener(path, "rt", encoding="utf-8", errors="surrogateescape") as f:
+        for line in f:
+            header = _INSERT_HEADER.match(line)
+            if header:
+                table = header.group(1).split(".")[-1].strip("`")
+                columns = [c.strip().strip("`") for c in header.group(2)[1:-1].split(",")] if header.group(2) else None
+                line = line[header.end():]
+            elif table is None:
+                continue # SET statements and comments between INSERTs
+            for token in _INSERT_TOKEN.findall(line):
+                if token == "(":
+                    row = []
+                elif token == ")":
+                    if row is not None:
+                        yield table, columns, tuple(row)
+                    row = None
+                elif token == ";":
+                    table = None
+                elif token != "," and row is not None and token.lower() != "_binary":
+                    row.append(_sql_value(token))
+
+
+def dump_file_table(path: str):
+    """Table of a mydumper data file named <database>.<table>[.<chunk>].<extension>; None for other names."""
+    parts = os.path.basename(path).split(".")
+    return parts[1] if len(parts) > 2 else None
+
+
+def iter_csv_rows(path: str, table: str):
+    """Yields (table, columns, row) for a CSV chunk whose first line holds the column names."""
+    if not table:
+        raise ValueError("A target table is required to load a CSV file.")
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", errors="surrogateescape", newline="") as f:
+        reader = csv.reader(f)
+        columns = next(reader, None)
+        for row in reader:
+            yield table, columns, tuple(None if value == "\\N" else value for value in row)
+
+
+def _sql_value(token: str):
+    """Converts an INSERT literal to the Python value it denotes; numbers stay strings for the server to convert."""
+    if token[0] == "'":
+        body = token[1:-1]
+        if "\\" in body or "''" in body:
+            body = _SQL_ESCAPE_SEQUENCE.sub(lambda m: "'" if m.group(0) == "''" else _SQL_ESCAPES.get(m.group(1), m.group(1)), body)
+        return body
+    if token.upper() == "NULL":
+        return None
+    if token[:2].lower() == "0x":
+        return bytes.fromhex(token[2:]).decode("utf-8", "surrogateescape")
+    return token
+
+
+def _load_data_field(value) -> str:
+    """Formats a value for LOAD DATA with tab-separated fields and backslash escapes."""
+    if value is None:
+        return "\\N"
+    value = str(value)
+    return _LOAD_DATA_SPECIAL.sub(lambda m: _LOAD_DATA_ESCAPES[m.group(0)], value) if _LOAD_DATA_SPECIAL.search(value) else value
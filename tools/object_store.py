@@ -0,0 +1,313 @@
+import abc
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_COMPRESSED_SUFFIXES = (".gz", ".zst", ".bz2", ".xz", ".lz4", ".zip")
+_PART_MARKER = ".__part" # Temporary part objects of a composite upload
+_COMPOSE_LIMIT = 32 # Sources per compose request in Cloud Storage
+
+
+class ObjectStore(abc.ABC):
+    """
+    Parallel file transfers to and from an object store.
+
+    Files are cut into part_size parts that are read, compressed and uploaded concurrently, then composed
+    into one object. With compression, each part becomes its own zstd frame; concatenated frames form a
+    valid zstd stream, so composing needs no re-encoding. Files that are already compressed (.gz, .zst...)
+    are stored as they are when compress is "auto".
+
+    Every object carries a checksum of its original content in its metadata: the SHA-256 of the concatenated
+    SHA-256 digests of its part_size blocks, which parts can compute independently. Downloads verify it.
+
+    Subclasses implement the storage primitives (abstract methods): _put, _compose, _read_range, _stat, list_keys and delete.
+    """
+
+    def __init__(self, workers: int = 16, part_size: int = 32 * 1024 ** 2, compress: str = "auto", compression_level: int = 3):
+        self.workers = workers
+        self.part_size = part_size
+        self.compress = compress # "auto", "always" or "never"
+        self.compression_level = compression_level
+        # Files and parts get separate pools so a file task never waits on a part queued behind it
+        self._file_pool = ThreadPoolExecutor(max_workers=workers)
+        self._part_pool = ThreadPoolExecutor(max_workers=workers)
+
+    def upload_files(self, paths: list, prefix: str) -> dict:
+        """Uploads local files under prefix/<file name>, concurrently."""
+        started = time.monotonic()
+        prefix = prefix.rstrip("/")
+        results = list(self._file_pool.map(
+            lambda path: self.upload_file(path, f"{prefix}/{os.path.basename(path)}" if prefix else os.path.basename(path)), paths
+        ))
+        return self._summary(results, started)
+
+    def download_files(self, keys: list, destination_dir: str) -> dict:
+        """Downloads objects (or every object under a key ending in '/*', or '*' for all) into a local directory, concurrently."""
+        started = time.monotonic()
+        expanded = []
+        for key in keys:
+            expanded.extend(self.list_keys(key[:-1]) if key == "*" or key.endswith("/*") else [key])
+        os.makedirs(destination_dir, exist_ok=True)
+        results = list(self._file_pool.map(
+            lambda key: self.download_file(key, os.path.join(destination_dir, os.path.basename(key))), expanded
+        ))
+        return self._summary(results, started)
+
+    def upload_file(self, path: str, key: str) -> dict:
+        """Uploads one file; returns its key, original and stored sizes and checksum."""
+        size = os.path.getsize(path)
+        codec = "zstd" if self.compress == "always" or (self.compress == "auto" and not path.endswith(_COMPRESSED_SUFFIXES)) else None
+        offsets = list(range(0, size, self.part_size)) or [0]
+
+        def encode(offset):
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read(self.part_size)
+            digest = hashlib.sha256(data).digest()
+            if codec:
+                # Each thread needs its own compressor
+                data = _zstandard().ZstdCompressor(level=self.compression_level).compress(data)
+            return data, digest
+
+        if len(offsets) == 1:
+            data, digest = encode(0)
+            metadata = self._metadata(codec, [digest], size)
+            self._put(key, data, metadata)
+            return {"key": key, "bytes": size, "stored_bytes": len(data), "sha256": metadata["sha256"]}
+
+        def upload_part(index):
+            data, digest = encode(offsets[index])
+            part_key = f"{key}{_PART_MARKER}{index:05d}"
+            self._put(part_key, data, None)
+            return part_key, digest, len(data)
+
+        parts = list(self._part_pool.map(upload_part, range(len(offsets))))
+        metadata = self._metadata(codec, [digest for _, digest, _ in parts], size)
+        self._compose(key, [part_key for part_key, _, _ in parts], metadata)
+        return {"key": key, "bytes": size, "stored_bytes": sum(n for _, _, n in parts), "sha256": metadata["sha256"]}
+
+    def download_file(self, key: str, path: str) -> dict:
+        """Downloads one object with parallel ranged reads, decompresses it and verifies its checksum."""
+        stored_size, metadata = self._stat(key)
+        metadata = metadata or {}
+        ranges = [(start, min(start + self.part_size, stored_size)) for start in range(0, stored_size, self.part_size)]
+        # Ranged reads land in a temporary file next to the destination, which is then decoded in one pass
+        fd, staging = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".download-")
+        try:
+            def fetch(byte_range):
+                os.pwrite(fd, self._read_range(key, *byte_range), byte_range[0])
+            list(self._part_pool.map(fetch, ranges))
+            os.close(fd)
+            fd = None
+            part_size = int(metadata.get("part_size", self.part_size))
+            digests, size = [], 0
+            with open(staging, "rb") as source, open(path, "wb") as target:
+                reader = _zstandard().ZstdDecompressor().stream_reader(source, read_across_frames=True) \
+                    if metadata.get("codec") == "zstd" else source
+                while True:
+                    block = _read_exactly(reader, part_size)
+                    if not block:
+                        break
+                    digests.append(hashlib.sha256(block).digest())
+                    target.write(block)
+                    size += len(block)
+        finally:
+            if fd is not None:
+                os.close(fd)
+            os.unlink(staging)
+        checksum = hashlib.sha256(b"".join(digests or [hashlib.sha256(b"").digest()])).hexdigest()
+        if metadata.get("sha256") and checksum != metadata["sha256"]:
+            os.unlink(path)
+            raise ValueError(f"Checksum mismatch for {key}: expected {metadata['sha256']}, got {checksum}")
+        return {"key": key, "bytes": size, "stored_bytes": stored_size, "sha256": checksum}
+
+    def close(self):
+        self._file_pool.shutdown()
+        self._part_pool.shutdown()
+
+    def _metadata(self, codec, digests: list, size: int) -> dict:
+        metadata = {"sha256": hashlib.sha256(b"".join(digests)).hexdigest(), "part_size": str(self.part_size), "size": str(size)}
+        if codec:
+            metadata["codec"] = codec
+        return metadata
+
+    @staticmethod
+    def _summary(results: list, started: float) -> dict:
+        seconds = time.monotonic() - started
+        transferred = sum(r["stored_bytes"] for r in results)
+        return {
+            "status": "success",
+            "files": len(results),
+            "bytes": sum(r["bytes"] for r in results),
+            "stored_bytes": transferred,
+            "seconds": round(seconds, 2),
+            "throughput_mb_per_sec": round(transferred / 1e6 / seconds, 1) if seconds else None,
+            "objects": results
+        }
+
+    @abc.abstractmethod
+    def _put(self, key: str, data: bytes, metadata: dict):
+        """Stores data as one object with the given metadata."""
+
+    @abc.abstractmethod
+    def _compose(self, key: str, part_keys: list, metadata: dict):
+        """Joins part objects, in order, into one object and deletes the parts."""
+
+    @abc.abstractmethod
+    def _read_range(self, key: str, start: int, end: int) -> bytes:
+        """Bytes [start, end) of a stored object."""
+
+    @abc.abstractmethod
+    def _stat(self, key: str) -> tuple:
+        """(stored size, metadata dict) of an object."""
+
+    @abc.abstractmethod
+    def list_keys(self, prefix: str) -> list:
+        """Keys of the objects under prefix, without temporary parts."""
+
+    @abc.abstractmethod
+    def delete(self, keys: list):
+        """Deletes objects."""
+
+
+class GCSObjectStore(ObjectStore):
+    """Cloud Storage backend; parts are uploaded as temporary objects and joined with compose requests."""
+
+    def __init__(self, bucket_name: str, **kwargs):
+        # Imported here so the local backend works without the Cloud Storage client installed
+        from google.cloud import storage
+        super().__init__(**kwargs)
+        self.client = storage.Client()
+        self.bucket = self.client.bucket(bucket_name)
+
+    def _put(self, key, data, metadata):
+        blob = self.bucket.blob(key)
+        if metadata:
+            blob.metadata = metadata
+        blob.upload_from_string(data, content_type="application/octet-stream")
+
+    def _compose(self, key, part_keys, metadata):
+        # A compose request takes at most 32 sources; larger objects are composed in rounds
+        sources, temporary, round_number = list(part_keys), list(part_keys), 0
+        while len(sources) > _COMPOSE_LIMIT:
+            grouped = []
+            for i in range(0, len(sources), _COMPOSE_LIMIT):
+                group_key = f"{key}{_PART_MARKER}r{round_number}-{i // _COMPOSE_LIMIT:05d}"
+                self.bucket.blob(group_key).compose([self.bucket.blob(k) for k in sources[i:i + _COMPOSE_LIMIT]])
+                grouped.append(group_key)
+            temporary.extend(grouped)
+            sources, round_number = grouped, round_number + 1
+        blob = self.bucket.blob(key)
+        blob.content_type = "application/octet-stream"
+        blob.metadata = metadata
+        blob.compose([self.bucket.blob(k) for k in sources])
+        self.delete(temporary)
+
+    def _read_range(self, key, start, end):
+        return self.bucket.blob(key).download_as_bytes(start=start, end=end - 1) if end > start else b""
+
+    def _stat(self, key):
+        blob = self.bucket.get_blob(key)
+        if blob is None:
+            raise FileNotFoundError(f"gs://{self.bucket.name}/{key} does not exist")
+        return blob.size, blob.metadata
+
+    def list_keys(self, prefix):
+        return sorted(blob.name for blob in self.client.list_blobs(self.bucket, prefix=prefix) if _PART_MARKER not in blob.name)
+
+    def delete(self, keys):
+        list(self._part_pool.map(lambda k: self.bucket.blob(k).delete(), keys))
+
+
+class LocalObjectStore(ObjectStore):
+    """Local directory backend for offline runs; metadata is kept in a JSON file next to each object."""
+
+    def __init__(self, root: str, **kwargs):
+        super().__init__(**kwargs)
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def _put(self, key, data, metadata):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        if metadata:
+            self._write_metadata(key, metadata)
+
+    def _compose(self, key, part_keys, metadata):
+        path = self._path(key)
+        with open(path + ".tmp", "wb") as target:
+            for part_key in part_keys:
+                with open(self._path(part_key), "rb") as source:
+                    shutil.copyfileobj(source, target, 1024 ** 2)
+        os.replace(path + ".tmp", path)
+        self._write_metadata(key, metadata)
+        self.delete(part_keys)
+
+    def _write_metadata(self, key, metadata):
+        with open(self._path(key) + ".meta.json", "w") as f:
+            json.dump(metadata, f)
+
+    def _read_range(self, key, start, end):
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    def _stat(self, key):
+        path = self._path(key)
+        metadata = None
+        if os.path.exists(path + ".meta.json"):
+            with open(path + ".meta.json") as f:
+                metadata = json.load(f)
+        return os.path.getsize(path), metadata
+
+    def list_keys(self, prefix):
+        base = self._path(prefix)
+        directory = base if os.path.isdir(base) else os.path.dirname(base)
+        keys = []
+        for dirpath, _, names in os.walk(directory):
+            for name in names:
+                key = os.path.relpath(os.path.join(dirpath, name), self.root)
+                if key.startswith(prefix.lstrip("/")) and not name.endswith((".meta.json", ".tmp")) and _PART_MARKER not in name:
+                    keys.append(key)
+        return sorted(keys)
+
+    def delete(self, keys):
+        for key in keys:
+            for path in (self._path(key), self._path(key) + ".meta.json"):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+
+def open_store(location: str, **kwargs) -> tuple:
+    """(store, key prefix) for a gs://bucket/prefix URI or a local directory standing in for the bucket."""
+    if location.startswith("gs://"):
+        bucket, _, prefix = location[len("gs://"):].partition("/")
+        return GCSObjectStore(bucket, **kwargs), prefix.strip("/")
+    return LocalObjectStore(location.rstrip("/"), **kwargs), ""
+
+
+def _read_exactly(reader, size: int) -> bytes:
+    """Reads size bytes unless the stream ends first; stream readers may return short reads."""
+    chunks, remaining = [], size
+    while remaining:
+        chunk = reader.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _zstandard():
+    """The zstandard module, imported on first use so that stores moving only uncompressed objects never load it."""
+    import zstandard
+    return zstandard
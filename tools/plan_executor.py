@@ -0,0 +1,136 @@
+import inspect
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+FAILED_STATUSES = ("error", "failed")
+
+
+class PlanExecutor:
+    """
+    Runs a fixed plan of tool invocations directly, without an LLM turn per call.
+
+    A plan is a list of steps {"id", "tool", "args", "after"}: tool is the name of a tool registered with the
+    agent's executor (or a callable), args a dict of keyword arguments or a function of the results so far
+    that returns one, and after the ids of the steps that must succeed first. Every step whose dependencies
+    have succeeded runs at once, up to max_workers at a time. A step fails when it raises or returns a dict
+    whose "status" is error or failed; the steps depending on it are skipped while the others carry on.
+    """
+
+    def __init__(self, tools: dict, max_workers: int = 8):
+        self.tools = tools
+        self.max_workers = max_workers
+
+    def run(self, plan: list) -> dict:
+        """
+        Runs the plan and returns {"status": "completed"|"failed", "seconds", "steps": {id: {"tool", "status",
+        "seconds", "error"}}, "results": {id: result}}.
+        """
+        steps = {step["id"]: step for step in plan}
+        for step in plan:
+            unknown = [dependency for dependency in step.get("after", []) if dependency not in steps]
+            if unknown:
+                raise ValueError(f"Step {step['id']} depends on unknown steps: {unknown}")
+            if not callable(step["tool"]) and step["tool"] not in self.tools:
+                raise ValueError(f"Step {step['id']} uses unknown tool: {step['tool']}. Choose from {sorted(self.tools)}")
+
+        started = time.monotonic()
+        report = {step_id: {"tool": _tool_name(step["tool"]), "status": "pending"} for step_id, step in steps.items()}
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while True:
+                for step_id, step in steps.items():
+                    if report[step_id]["status"] != "pending":
+                        continue
+                    states = [report[dependency]["status"] for dependency in step.get("after", [])]
+                    if any(state in ("failed", "skipped") for state in states):
+                        report[step_id]["status"] = "skipped"
+                    elif all(state == "succeeded" for state in states):
+                        report[step_id]["status"] = "running"
+                        running[executor.submit(self._run_step, step, dict(results))] = step_id
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step_id = running.pop(future)
+                    result, error, seconds = future.result()
+                    report[step_id].update({"status": "failed" if error else "succeeded", "seconds": round(seconds, 3)})
+                    if error:
+                        report[step_id]["error"] = error
+                        print(f"Step {step_id} ({report[step_id]['tool']}) failed after {seconds:.1f}s: {error}")
+                    else:
+                        print(f"Step {step_id} ({report[step_id]['tool']}) finished in {seconds:.1f}s")
+                    results[step_id] = result
+        failed = any(step["status"] in ("failed", "skipped") for step in report.values())
+        return {"status": "failed" if failed else "completed", "seconds": round(time.monotonic() - started, 3),
+                "steps": report, "results": results}
+
+    def _run_step(self, step: dict, results: dict) -> tuple:
+        started = time.monotonic()
+        tool = step["tool"] if callable(step["tool"]) else self.tools[step["tool"]]
+        try:
+            args = step.get("args") or {}
+            result = tool(**(args(results) if callable(args) else args))
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}", time.monotonic() - started
+        status = result.get("status") if isinstance(result, dict) else None
+        if isinstance(status, str) and status.lower() in FAILED_STATUSES:
+            return result, result.get("message") or f"status {status}", time.monotonic() - started
+        return result, None, time.monotonic() - started
+
+
+def registered_tools(user_proxy) -> dict:
+    """
+    The functions registered for execution with an autogen agent, unwrapped so they return their raw results
+    (but still through the recording wrapper of an LLMCache in record or replay mode).
+    """
+    return {name: inspect.unwrap(function, stop=lambda f: getattr(f, "recorded", False)) for name, function in user_proxy.function_map.items()}
+
+
+def run_headless(plan: list, assistant, user_proxy, instructions: str = "", summarize: bool = False, max_workers: int = 8) -> dict:
+    """
+    Runs an agent's plan with PlanExecutor. The assistant is only consulted when a step fails (a chat that
+    starts from the plan's outcome) or, with summarize, for one summary reply; both are given the stage's
+    instructions for reference. Returns {"status", "details", "plan"}: "failed" whenever a plan step failed or
+    was skipped, even if the recovery chat reports success, since its tool calls are not checked; dependent
+    stages then do not run on a partial result.
+    """
+    outcome = PlanExecutor(registered_tools(user_proxy), max_workers=max_workers).run(plan)
+    print(f"Headless plan {outcome['status']} in {outcome['seconds']}s.")
+    report = _describe(plan, outcome)
+    if outcome["status"] == "failed":
+        chat_result = user_proxy.initiate_chat(
+            assistant,
+            cache=getattr(assistant, "client_cache", None),
+            message=f"A fixed plan of tool calls was run without you; some steps failed or were skipped.\n{report}\n"
+                    f"Use the tools to complete the failed and skipped steps, then summarize the outcome.\n"
+                    f"For reference, the instructions of this stage were:\n{instructions}"
+        )
+        details = chat_result.chat_history[-1]['content']
+    elif summarize:
+        reply = assistant.generate_reply(messages=[{"role": "user", "content": f"These tool calls were run for you:\n{report}\n"
+                                                    f"Complete the following instructions from their results, without calling tools:\n{instructions}"}])
+        details = (reply.get("content") if isinstance(reply, dict) else reply) or ""
+    else:
+        details = report
+    return {"status": outcome["status"], "details": details, "plan": outcome}
+
+
+def _describe(plan: list, outcome: dict, max_result_chars: int = 4000) -> str:
+    lines = []
+    for step in plan:
+        state = outcome["steps"][step["id"]]
+        line = f"- {step['id']} ({state['tool']}): {state['status']}"
+        if "seconds" in state:
+            line += f" in {state['seconds']}s"
+        if state.get("error"):
+            line += f", error: {state['error']}"
+        if outcome["results"].get(step["id"]) is not None:
+            line += f"\n  result: {json.dumps(outcome['results'][step['id']], default=str)[:max_result_chars]}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _tool_name(tool) -> str:
+    return tool if isinstance(tool, str) else getattr(tool, "__name__", repr(tool))
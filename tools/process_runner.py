@@ -0,0 +1,203 @@
+import asyncio
+import collections
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+
+_TABLE = re.compile(r"`([^`]+)`\.`([^`]+)`")
+_DATA_FILE = re.compile(r"(\S+\.(?:sql|dat)(?:\.gz|\.zst)?)\b")
+_PROGRESS = re.compile(r"\b(?:Progress|Tables)\s+(\d+)\s+of\s+(\d+)", re.IGNORECASE)
+_ROWS = re.compile(r"\b(\d+)\s+rows\b", re.IGNORECASE)
+_ERROR = re.compile(r"\b(?:CRITICAL|ERROR|WARNING)\b")
+_TABLE_DONE = re.compile(r"\b(?:Finished|completed|done)\b", re.IGNORECASE)
+
+
+class ProcessRunner:
+    """
+    Runs a long command such as mydumper or myloader on asyncio, reading stdout and stderr line by line
+    as they are written instead of buffering them until exit.
+
+    Every line is parsed into a progress event (table started or finished, chunk file, "Progress N of M"
+    counters, rows, warnings). Running totals, throughput and an ETA are available from stats() while
+    the command runs, and are printed every report_interval seconds. Only the last log_lines lines are
+    kept. cancel() (or setting cancel_event) terminates the process, then kills it after a grace period.
+    """
+
+    def __init__(self, command: list, name: str = None, output_dir: str = None, expected_bytes: int = None,
+                 log_lines: int = 1000, report_interval: float = 30.0, on_event=None, cancel_event: threading.Event = None,
+                 kill_after: float = 10.0):
+        self.command = command
+        self.name = name or os.path.basename(command[0])
+        self.output_dir = output_dir # Chunk files are sized from here when the command writes them
+        self.expected_bytes = expected_bytes # Enables a bytes-based ETA when the output has no "N of M" counters
+        self.log = collections.deque(maxlen=log_lines)
+        self.report_interval = report_interval
+        self.on_event = on_event
+        self.cancel_event = cancel_event or threading.Event()
+        self.kill_after = kill_after
+        self.returncode = None
+        self._lock = threading.Lock()
+        self._started = None
+        self._files = set()
+        self._tables = set()
+        self._tables_done = set()
+        self._counters = {"rows": 0, "chunks": 0, "warnings": 0, "done": None, "total": None}
+
+    def run_sync(self) -> dict:
+        """Runs the command to completion from synchronous code (on its own event loop)."""
+        return asyncio.run(self.run())
+
+    def cancel(self):
+        """Asks a running command to stop; safe to call from any thread."""
+        self.cancel_event.set()
+
+    async def run(self) -> dict:
+        """
+        Runs the command and returns {"status": "success"|"cancelled", "returncode", "stats", "log"}.
+        Raises subprocess.CalledProcessError, carrying the retained log, when the command fails.
+        """
+        self._started = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            *self.command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, limit=1 << 20,
+            start_new_session=True # Signals reach helper processes too, which would otherwise hold the pipes open
+        )
+        watcher = asyncio.create_task(self._watch(process))
+        try:
+            await asyncio.gather(self._read(process.stdout, "stdout"), self._read(process.stderr, "stderr"))
+            self.returncode = await process.wait()
+        finally:
+            watcher.cancel()
+            if process.returncode is None: # The caller's task was cancelled
+                self._signal(process, signal.SIGKILL)
+                await process.wait()
+
+        stats = self.stats()
+        print(f"{self.name} finished with exit code {self.returncode}: {self._describe(stats)}")
+        log = "\n".join(self.log)
+        if self.cancel_event.is_set():
+            return {"status": "cancelled", "returncode": self.returncode, "stats": stats, "log": log}
+        if self.returncode != 0:
+            raise subprocess.CalledProcessError(self.returncode, self.command, output=log, stderr=log)
+        return {"status": "success", "returncode": self.returncode, "stats": stats, "log": log}
+
+    def stats(self) -> dict:
+        """Running totals with rows/sec, bytes/sec and, when progress can be measured, the ETA in seconds."""
+        with self._lock:
+            counters = dict(self._counters)
+            files = list(self._files)
+            tables, tables_done = len(self._tables), len(self._tables_done)
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        written = 0
+        for path in files:
+            try:
+                written += os.path.getsize(path)
+            except OSError:
+                pass
+        if counters["total"]:
+            fraction = counters["done"] / counters["total"]
+        elif self.expected_bytes:
+            fraction = min(written / self.expected_bytes, 1.0)
+        else:
+            fraction = None
+        return {
+            "elapsed_seconds": round(elapsed, 1),
+            "tables_started": tables,
+            "tables_done": tables_done,
+            "chunks": counters["chunks"],
+            "rows": counters["rows"],
+            "bytes": written,
+            "warnings": counters["warnings"],
+            "rows_per_sec": round(counters["rows"] / elapsed, 1) if elapsed else None,
+            "bytes_per_sec": round(written / elapsed, 1) if elapsed else None,
+            "progress": round(fraction, 4) if fraction is not None else None,
+            "eta_seconds": round(elapsed * (1 - fraction) / fraction, 1) if fraction else None
+        }
+
+    def parse_line(self, line: str, stream: str) -> dict:
+        """Turns one output line into an event dict and updates the running totals."""
+        event = {"type": "log", "stream": stream, "line": line, "time": time.time()}
+        table = _TABLE.search(line)
+        if table:
+            event["table"] = f"{table.group(1)}.{table.group(2)}"
+        data_file = _DATA_FILE.search(line)
+        progress = _PROGRESS.search(line)
+        rows = _ROWS.search(line)
+        with self._lock:
+            if _ERROR.search(line):
+                event["type"] = "warning"
+                self._counters["warnings"] += 1
+            elif data_file:
+                path = data_file.group(1)
+                if self.output_dir and not os.path.isabs(path):
+                    path = os.path.join(self.output_dir, os.path.basename(path))
+                event.update(type="chunk", file=path)
+                if path not in self._files:
+                    self._files.add(path)
+                    self._counters["chunks"] += 1
+            elif table and _TABLE_DONE.search(line):
+                event["type"] = "table_done"
+                self._tables_done.add(event["table"])
+            elif table:
+                event["type"] = "table_started"
+            if table:
+                self._tables.add(event["table"])
+            if progress:
+                event.update(done=int(progress.group(1)), total=int(progress.group(2)))
+                self._counters["done"], self._counters["total"] = event["done"], event["total"]
+            if rows:
+                event["rows"] = int(rows.group(1))
+                self._counters["rows"] += event["rows"]
+        return event
+
+    async def _read(self, stream, name: str):
+        while True:
+            raw = await stream.readline()
+            if not raw:
+                return
+            line = raw.decode(errors="replace").rstrip()
+            if not line:
+                continue
+            self.log.append(line)
+            event = self.parse_line(line, name)
+            if self.on_event:
+                self.on_event(event)
+
+    async def _watch(self, process):
+        """Reports progress periodically and terminates the process once cancellation is requested."""
+        last_report = time.monotonic()
+        while process.returncode is None:
+            if self.cancel_event.is_set():
+                print(f"Cancelling {self.name}...")
+                self._signal(process, signal.SIGTERM)
+                try:
+                    await asyncio.wait_for(process.wait(), self.kill_after)
+                except asyncio.TimeoutError:
+                    pass
+                self._signal(process, signal.SIGKILL) # Whatever is left of the process group
+                return
+            if time.monotonic() - last_report >= self.report_interval:
+                print(f"{self.name} progress: {self._describe(self.stats())}")
+                last_report = time.monotonic()
+            await asyncio.sleep(0.2)
+
+    @staticmethod
+    def _signal(process, signum):
+        try:
+            os.killpg(process.pid, signum)
+        except ProcessLookupError:
+            pass
+
+    @staticmethod
+    def _describe(stats: dict) -> str:
+        text = (f"{stats['tables_done']}/{stats['tables_started']} tables, {stats['chunks']} chunks, "
+                f"{stats['bytes'] / 1e6:.1f} MB in {stats['elapsed_seconds']}s")
+        if stats["bytes_per_sec"]:
+            text += f" ({stats['bytes_per_sec'] / 1e6:.1f} MB/s)"
+        if stats["rows"]:
+            text += f", {stats['rows']} rows"
+        if stats["eta_seconds"] is not None:
+            text += f", ETA {stats['eta_seconds']}s"
+        return text
@@ -0,0 +1,269 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+_CURRENT_TIMESTAMP = re.compile(r"^(CURRENT_TIMESTAMP|NOW|LOCALTIME|LOCALTIMESTAMP)(\(\d*\))?$", re.IGNORECASE)
+
+
+class SchemaExtractor:
+    """
+    Reads a database's schema from information_schema in a handful of set-based queries and builds a
+    dict-based model of its tables, views, routines and triggers, from which DDL can be emitted.
+
+    The queries run concurrently, so extraction costs a few round trips whatever the number of tables.
+    Objects the model cannot reproduce faithfully (routines, partitioned tables, functional indexes and
+    check constraints) are fetched with SHOW CREATE, concurrently as well.
+    """
+
+    def __init__(self, db_tools, database: str, workers: int = 8):
+        self.db_tools = db_tools # MySQLTools
+        self.database = database
+        self.workers = workers
+
+    def extract(self) -> dict:
+        """
+        Returns {"database", "tables", "views", "routines", "triggers"}, each object keyed by name. Tables hold
+        their columns, indexes and foreign keys in definition order; "needs_show_create" marks the tables
+        whose DDL should come from SHOW CREATE TABLE.
+        """
+        schema = self.database
+        queries = {
+            "tables": f"SELECT TABLE_NAME AS table_name, ENGINE AS engine, TABLE_COLLATION AS collation, "
+                      f"CREATE_OPTIONS AS create_options, TABLE_COMMENT AS comment FROM information_schema.TABLES "
+                      f"WHERE TABLE_SCHEMA = '{schema}' AND TABLE_TYPE = 'BASE TABLE'",
+            "columns": f"SELECT TABLE_NAME AS table_name, COLUMN_NAME AS name, COLUMN_TYPE AS type, IS_NULLABLE AS nullable, "
+                       f"COLUMN_DEFAULT AS `default`, EXTRA AS extra, CHARACTER_SET_NAME AS charset, COLLATION_NAME AS collation, "
+                       f"COLUMN_COMMENT AS comment, GENERATION_EXPRESSION AS generation_expression FROM information_schema.COLUMNS "
+                       f"WHERE TABLE_SCHEMA = '{schema}' ORDER BY TABLE_NAME, ORDINAL_POSITION",
+            "statistics": f"SELECT TABLE_NAME AS table_name, INDEX_NAME AS index_name, NON_UNIQUE AS non_unique, "
+                          f"INDEX_TYPE AS index_type, COLUMN_NAME AS column_name, SUB_PART AS sub_part, COLLATION AS collation "
+                          f"FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = '{schema}' "
+                          f"ORDER BY TABLE_NAME, INDEX_NAME = 'PRIMARY' DESC, INDEX_NAME, SEQ_IN_INDEX",
+            "foreign_keys": f"SELECT k.TABLE_NAME AS table_name, k.CONSTRAINT_NAME AS name, k.COLUMN_NAME AS column_name, "
+                            f"k.REFERENCED_TABLE_SCHEMA AS referenced_schema, k.REFERENCED_TABLE_NAME AS referenced_table, "
+                            f"k.REFERENCED_COLUMN_NAME AS referenced_column, r.UPDATE_RULE AS on_update, r.DELETE_RULE AS on_delete "
+                            f"FROM information_schema.KEY_COLUMN_USAGE k JOIN information_schema.REFERENTIAL_CONSTRAINTS r "
+                            f"ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME "
+                            f"AND r.TABLE_NAME = k.TABLE_NAME "
+                            f"WHERE k.TABLE_SCHEMA = '{schema}' ORDER BY k.TABLE_NAME, k.CONSTRAINT_NAME, k.ORDINAL_POSITION",
+            "checks": f"SELECT DISTINCT TABLE_NAME AS table_name FROM information_schema.TABLE_CONSTRAINTS "
+                      f"WHERE TABLE_SCHEMA = '{schema}' AND CONSTRAINT_TYPE = 'CHECK'",
+            "views": f"SELECT TABLE_NAME AS name, VIEW_DEFINITION AS definition, CHECK_OPTION AS check_option, "
+                     f"DEFINER AS definer, SECURITY_TYPE AS security_type FROM information_schema.VIEWS "
+                     f"WHERE TABLE_SCHEMA = '{schema}'",
+            "routines": f"SELECT ROUTINE_NAME AS name, ROUTINE_TYPE AS type, DEFINER AS definer FROM information_schema.ROUTINES "
+                        f"WHERE ROUTINE_SCHEMA = '{schema}'",
+            "triggers": f"SELECT TRIGGER_NAME AS name, EVENT_OBJECT_TABLE AS table_name, ACTION_TIMING AS timing, "
+                        f"EVENT_MANIPULATION AS event, ACTION_STATEMENT AS statement, DEFINER AS definer FROM information_schema.TRIGGERS "
+                        f"WHERE TRIGGER_SCHEMA = '{schema}' ORDER BY EVENT_OBJECT_TABLE, ACTION_ORDER"
+        }
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            futures = {name: pool.submit(self.db_tools.execute_query, query, True) for name, query in queries.items()}
+            rows = {name: future.result() or [] for name, future in futures.items()}
+
+        tables = {}
+        for row in rows["tables"]:
+            tables[row["table_name"]] = {
+                "engine": row["engine"],
+                "collation": row["collation"],
+                "create_options": row["create_options"] or "",
+                "comment": row["comment"] or "",
+                "columns": [],
+                "indexes": {},
+                "foreign_keys": {},
+                "needs_show_create": "partitioned" in (row["create_options"] or "")
+            }
+        for row in rows["columns"]:
+            if row["table_name"] in tables:
+                column = dict(row)
+                del column["table_name"]
+                column["nullable"] = row["nullable"] == "YES"
+                tables[row["table_name"]]["columns"].append(column)
+        for row in rows["statistics"]:
+            table = tables.get(row["table_name"])
+            if table is None:
+                continue
+            if row["column_name"] is None:
+                table["needs_show_create"] = True # Functional index: the expression is not in STATISTICS on every version
+                continue
+            index = table["indexes"].setdefault(row["index_name"], {
+                "unique": int(row["non_unique"]) == 0,
+                "type": row["index_type"],
+                "columns": []
+            })
+            index["columns"].append({"name": row["column_name"], "sub_part": row["sub_part"], "descending": row["collation"] == "D"})
+        for row in rows["foreign_keys"]:
+            table = tables.get(row["table_name"])
+            if table is None:
+                continue
+            foreign_key = table["foreign_keys"].setdefault(row["name"], {
+                "columns": [],
+                "referenced_schema": row["referenced_schema"],
+                "referenced_table": row["referenced_table"],
+                "referenced_columns": [],
+                "on_update": row["on_update"],
+                "on_delete": row["on_delete"]
+            })
+            foreign_key["columns"].append(row["column_name"])
+            foreign_key["referenced_columns"].append(row["referenced_column"])
+        for row in rows["checks"]:
+            if row["table_name"] in tables:
+                tables[row["table_name"]]["needs_show_create"] = True
+
+        return {
+            "database": schema,
+            "tables": tables,
+            # VIEW_DEFINITION qualifies every table with the source schema, which is not the target's
+            "views": {row["name"]: {**{k: v for k, v in row.items() if k != "name"}, "definition": unqualify(row["definition"], schema)}
+                      for row in rows["views"]},
+            "routines": {row["name"]: {k: v for k, v in row.items() if k != "name"} for row in rows["routines"]},
+            "triggers": {row["name"]: {k: v for k, v in row.items() if k != "name"} for row in rows["triggers"]}
+        }
+
+    def ddl(self, model: dict = None, show_create: str = "auto") -> str:
+        """
+        Emits a DDL script: tables in foreign key order, views in dependency order, then routines and
+        triggers inside DELIMITER blocks. show_create is "auto" (SHOW CREATE only where the model is not
+        enough), "all" (SHOW CREATE for every table and view) or "none" (routines are then omitted).
+        """
+        model = model or self.extract()
+        tables, views = model["tables"], model["views"]
+        table_order = _dependency_order(tables, lambda t: [fk["referenced_table"] for fk in t["foreign_keys"].values()])
+        view_order = _dependency_order(views, lambda v: [name for name in views if f"`{name}`" in (v["definition"] or "")])
+
+        fetch = []
+        if show_create != "none":
+            fetch += [("TABLE", name) for name in table_order if show_create == "all" or tables[name]["needs_show_create"]]
+            fetch += [("VIEW", name) for name in view_order if show_create == "all"]
+            fetch += [(routine["type"], name) for name, routine in sorted(model["routines"].items())]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            fetched = dict(zip(fetch, pool.map(lambda item: self.show_create(*item), fetch)))
+
+        statements = [fetched.get(("TABLE", name)) or table_ddl(name, tables[name]) for name in table_order]
+        statements += [fetched.get(("VIEW", name)) or view_ddl(name, views[name]) for name in view_order]
+        script = ";\n\n".join(statements) + ";\n" if statements else ""
+
+        blocks = [fetched[(routine["type"], name)] for name, routine in sorted(model["routines"].items())
+                  if (routine["type"], name) in fetched]
+        blocks += [trigger_ddl(name, trigger) for name, trigger in model["triggers"].items()]
+        if blocks:
+            script += "\nDELIMITER ;;\n" + ";;\n\n".join(blocks) + ";;\nDELIMITER ;\n"
+        return script
+
+    def show_create(self, object_type: str, name: str) -> str:
+        """Runs SHOW CREATE TABLE/VIEW/PROCEDURE/FUNCTION and returns the statement."""
+        row = self.db_tools.execute_query(f"SHOW CREATE {object_type} `{self.database}`.`{name}`")
+        statement = row[f"Create {object_type.capitalize()}"]
+        return unqualify(statement, self.database) if object_type == "VIEW" else statement
+
+
+def table_ddl(name: str, table: dict) -> str:
+    """CREATE TABLE statement for a table of the schema model."""
+    definitions = [column_ddl(column) for column in table["columns"]]
+    for index_name, index in table["indexes"].items():
+        columns = ", ".join(
+            f"`{c['name']}`" + (f"({c['sub_part']})" if c["sub_part"] else "") + (" DESC" if c["descending"] else "")
+            for c in index["columns"]
+        )
+        if index_name == "PRIMARY":
+            definitions.append(f"PRIMARY KEY ({columns})")
+        elif index["type"] in ("FULLTEXT", "SPATIAL"):
+            definitions.append(f"{index['type']} KEY `{index_name}` ({columns})")
+        else:
+            definitions.append(f"{'UNIQUE ' if index['unique'] else ''}KEY `{index_name}` ({columns})")
+    for fk_name, fk in table["foreign_keys"].items():
+        definitions.append(
+            f"CONSTRAINT `{fk_name}` FOREIGN KEY ({', '.join(f'`{c}`' for c in fk['columns'])}) "
+            f"REFERENCES `{fk['referenced_table']}` ({', '.join(f'`{c}`' for c in fk['referenced_columns'])})"
+            + (f" ON DELETE {fk['on_delete']}" if fk["on_delete"] not in (None, "RESTRICT", "NO ACTION") else "")
+            + (f" ON UPDATE {fk['on_update']}" if fk["on_update"] not in (None, "RESTRICT", "NO ACTION") else "")
+        )
+
+    options = [f"ENGINE={table['engine']}"] if table["engine"] else []
+    if table["collation"]:
+        options.append(f"DEFAULT CHARSET={table['collation'].split('_')[0]} COLLATE={table['collation']}")
+    options += [option for option in table["create_options"].split() if option != "partitioned"]
+    if table["comment"]:
+        options.append(f"COMMENT={_quote(table['comment'])}")
+    return f"CREATE TABLE `{name}` (\n  " + ",\n  ".join(definitions) + "\n) " + " ".join(options)
+
+
+def column_ddl(column: dict) -> str:
+    """Column definition as it appears in CREATE TABLE."""
+    parts = [f"`{column['name']}`", column["type"]]
+    if column["charset"]:
+        parts.append(f"CHARACTER SET {column['charset']} COLLATE {column['collation']}")
+    extra = (column["extra"] or "").replace("DEFAULT_GENERATED", "").strip()
+    if column["generation_expression"]:
+        parts.append(f"GENERATED ALWAYS AS ({column['generation_expression']}) {'STORED' if 'STORED' in extra else 'VIRTUAL'}")
+        extra = ""
+    parts.append("NULL" if column["nullable"] else "NOT NULL")
+    default = column["default"]
+    if default is not None:
+        if _CURRENT_TIMESTAMP.match(default):
+            parts.append(f"DEFAULT {default}")
+        elif "DEFAULT_GENERATED" in (column["extra"] or ""):
+            parts.append(f"DEFAULT ({default})")
+        elif column["type"].startswith("bit"):
+            parts.append(f"DEFAULT {default}")
+        else:
+            parts.append(f"DEFAULT {_quote(default)}")
+    elif column["nullable"] and not column["generation_expression"]:
+        parts.append("DEFAULT NULL")
+    if extra:
+        parts.append(extra)
+    if column["comment"]:
+        parts.append(f"COMMENT {_quote(column['comment'])}")
+    return " ".join(parts)
+
+
+def view_ddl(name: str, view: dict) -> str:
+    """CREATE VIEW statement for a view of the schema model."""
+    check_option = f" WITH {view['check_option']} CHECK OPTION" if view["check_option"] not in (None, "NONE") else ""
+    return (f"CREATE {_definer(view['definer'])}SQL SECURITY {view['security_type']} VIEW `{name}` AS "
+            f"{view['definition']}{check_option}")
+
+
+def trigger_ddl(name: str, trigger: dict) -> str:
+    """CREATE TRIGGER statement for a trigger of the schema model."""
+    return (f"CREATE {_definer(trigger['definer'])}TRIGGER `{name}` {trigger['timing']} {trigger['event']} "
+            f"ON `{trigger['table_name']}` FOR EACH ROW {trigger['statement']}")
+
+
+def unqualify(sql: str, schema: str) -> str:
+    """Drops `schema`. qualifiers outside string literals, so the statement applies to whichever database is current."""
+    if not sql:
+        return sql
+    qualifier = f"`{schema}`."
+    pattern = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|" + re.escape(qualifier))
+    return pattern.sub(lambda m: "" if m.group(0) == qualifier else m.group(0), sql)
+
+
+def _definer(definer: str) -> str:
+    if not definer:
+        return ""
+    user, _, host = definer.rpartition("@")
+    return f"DEFINER=`{user}`@`{host}` "
+
+
+def _quote(value: str) -> str:
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def _dependency_order(objects: dict, dependencies) -> list:
+    """Names sorted so that each object follows the objects it depends on; cycles keep name order."""
+    ordered, visiting, done = [], set(), set()
+
+    def visit(name):
+        if name in done or name in visiting or name not in objects:
+            return
+        visiting.add(name)
+        for dependency in dependencies(objects[name]):
+            if dependency != name:
+                visit(dependency)
+        visiting.discard(name)
+        done.add(name)
+        ordered.append(name)
+
+    for name in sorted(objects):
+        visit(name)
+    return ordered
@@ -0,0 +1,184 @@
+import re
+import time
+from tools.ddl_tools import first_key_column, parse_create_table, split_statements
+
+_COMPOUND_STATEMENT = re.compile(r"^\s*CREATE\s+(?:OR\s+REPLACE\s+)?(?:DEFINER\s*=\s*\S+\s+)?(?:PROCEDURE|FUNCTION|TRIGGER|EVENT)\b",
+                                 re.IGNORECASE)
+_CHARSETS = ("armscii8|ascii|big5|cp1250|cp1251|cp1256|cp1257|cp850|cp852|cp866|cp932|dec8|eucjpms|euckr|gb18030|gb2312|gbk|"
+             "geostd8|greek|hebrew|hp8|keybcs2|koi8r|koi8u|latin1|latin2|latin5|latin7|macce|macroman|sjis|swe7|tis620|"
+             "ucs2|ujis|utf16|utf16le|utf32|utf8mb3|utf8mb4|utf8")
+_QUOTED = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`")
+
+
+class EscalateStatement(Exception):
+    """Raised by a rule for a statement it recognises but cannot convert mechanically."""
+
+
+class SchemaRule:
+    """
+    A compatibility rewrite. apply() returns the statement unchanged, rewritten, or raises EscalateStatement.
+    Rules must be deterministic so the same schema always converts to the same DDL.
+    """
+    name = "rule"
+
+    def apply(self, statement: str) -> str:
+        raise NotImplementedError
+
+
+class InnoDBEngineRule(SchemaRule):
+    """MyISAM and other engines Cloud SQL does not support become InnoDB; options InnoDB rejects are dropped."""
+    name = "innodb_engine"
+    convertible = {"MYISAM", "ARIA", "TOKUDB", "ROCKSDB", "ARCHIVE", "BLACKHOLE"}
+    unsupported = {"FEDERATED", "CONNECT", "CSV", "SPIDER", "NDB", "NDBCLUSTER"}
+
+    def apply(self, statement):
+        parsed = parse_create_table(statement)
+        if parsed is None:
+            return statement
+        engine = re.search(r"\bENGINE\s*=?\s*(\w+)", parsed[2], re.IGNORECASE)
+        engine = engine.group(1).upper() if engine else "INNODB"
+        if engine in self.unsupported:
+            raise EscalateStatement(f"{engine} tables have no InnoDB equivalent")
+        if engine in ("MRG_MYISAM", "MERGE"):
+            raise EscalateStatement("MERGE tables must be replaced by a view or a partitioned table")
+        # Only the table options after the closing parenthesis are rewritten, never column definitions
+        body, options = statement[:len(statement) - len(parsed[2])], parsed[2]
+        if engine in self.convertible:
+            _check_auto_increment_key(parsed[1])
+            options = _sub_outside_quotes(r"\bENGINE\s*=?\s*\w+", "ENGINE=InnoDB", options)
+        # MyISAM-only options, and row formats that cap index prefixes at 767 bytes once columns are utf8mb4
+        options = _sub_outside_quotes(r"\s*\b(?:PACK_KEYS|DELAY_KEY_WRITE|CHECKSUM)\s*=?\s*\w+", "", options)
+        options = _sub_outside_quotes(r"\s*\bROW_FORMAT\s*=?\s*(?:FIXED|COMPACT|REDUNDANT)\b", "", options)
+        # Cloud SQL manages the data directory
+        options = re.sub(r"\s*\b(?:DATA|INDEX)\s+DIRECTORY\s*=?\s*'[^']*'", "", options, flags=re.IGNORECASE)
+        return body + options
+
+
+class Utf8mb4Rule(SchemaRule):
+    """Character sets become utf8mb4; binary collations stay binary, every other collation becomes utf8mb4_unicode_ci."""
+    name = "utf8mb4"
+
+    def apply(self, statement):
+        if not re.match(r"^\s*(?:CREATE|ALTER)\s+(?:TEMPORARY\s+)?(?:TABLE|DATABASE|SCHEMA)\b", statement, re.IGNORECASE):
+            return statement
+        statement = _sub_outside_quotes(
+            rf"\b(CHARACTER\s+SET|CHARSET)(\s*=?\s*)(?:{_CHARSETS})\b",
+            lambda m: f"{m.group(1)}{m.group(2)}utf8mb4", statement
+        )
+        return _sub_outside_quotes(
+            rf"\b(COLLATE)(\s*=?\s*)((?:{_CHARSETS})_\w+)",
+            lambda m: f"{m.group(1)}{m.group(2)}{'utf8mb4_bin' if m.group(3).lower().endswith('_bin') else 'utf8mb4_unicode_ci'}",
+            statement
+        )
+
+
+class RemovedSqlModesRule(SchemaRule):
+    """Drops the SQL modes MySQL 8.0 removed from sql_mode assignments."""
+    name = "removed_sql_modes"
+    removed = {"NO_AUTO_CREATE_USER", "NO_FIELD_OPTIONS", "NO_KEY_OPTIONS", "NO_TABLE_OPTIONS", "DB2", "MAXDB", "MSSQL",
+               "MYSQL323", "MYSQL40", "ORACLE", "POSTGRESQL"}
+
+    def apply(self, statement):
+        def strip_modes(match):
+            modes = [m for m in match.group(2).split(",") if m.strip().upper() not in self.removed]
+            return f"{match.group(1)}'{','.join(modes)}'"
+        return re.sub(r"(\bsql_mode\s*:?=\s*)'([^']*)'", strip_modes, statement, flags=re.IGNORECASE)
+
+
+class StripDefinerRule(SchemaRule):
+    """Removes DEFINER clauses: setting another definer needs privileges the Cloud SQL admin user does not have."""
+    name = "strip_definer"
+
+    def apply(self, statement):
+        return re.sub(r"\s*\bDEFINER\s*=\s*(?:`[^`]*`|'[^']*'|[\w.%-]+)(?:\s*@\s*(?:`[^`]*`|'[^']*'|[\w.%-]+))?", "",
+                      statement, count=1, flags=re.IGNORECASE)
+
+
+class RemovedFeaturesRule(SchemaRule):
+    """Rewrites removed column types and escalates statements that call functions MySQL 8.0 removed."""
+    name = "removed_features"
+    removed_functions = ("PASSWORD", "ENCODE", "DECODE", "ENCRYPT", "DES_ENCRYPT", "DES_DECRYPT", "OLD_PASSWORD")
+
+    def apply(self, statement):
+        code = _QUOTED.sub("''", statement)
+        for function in self.removed_functions:
+            if re.search(rf"\b{function}\s*\(", code, re.IGNORECASE):
+                raise EscalateStatement(f"{function}() was removed in MySQL 8.0")
+        return _sub_outside_quotes(r"\bYEAR\s*\(\s*2\s*\)", "YEAR", statement)
+
+
+DEFAULT_RULES = [InnoDBEngineRule(), Utf8mb4Rule(), RemovedSqlModesRule(), StripDefinerRule(), RemovedFeaturesRule()]
+
+
+class SchemaRuleEngine:
+    """
+    Converts a DDL script for Cloud SQL for MySQL 8.0 by running every statement through a list of rules.
+    Statements a rule escalates, and CREATE TABLE statements that cannot be parsed, are returned
+    separately for the assistant instead of being applied.
+    """
+
+    def __init__(self, rules: list = None):
+        self.rules = DEFAULT_RULES if rules is None else rules
+
+    def convert(self, ddl_script: str) -> dict:
+        started = time.monotonic()
+        converted, escalated = [], []
+        rule_counts = {rule.name: 0 for rule in self.rules}
+        for statement in split_statements(ddl_script):
+            try:
+                if re.match(r"^\s*CREATE\s+(?:TEMPORARY\s+)?TABLE\b", statement, re.IGNORECASE) and parse_create_table(statement) is None:
+                    raise EscalateStatement("CREATE TABLE could not be parsed")
+                result, fired = statement, []
+                for rule in self.rules:
+                    rewritten = rule.apply(result)
+                    if rewritten != result:
+                        fired.append(rule.name)
+                    result = rewritten
+                converted.append(result)
+                for name in fired: # Only statements that convert count; an escalated one is returned unchanged
+                    rule_counts[name] += 1
+            except EscalateStatement as e:
+                escalated.append({"statement": statement, "reason": str(e)})
+        return {
+            "status": "needs_review" if escalated else "success",
+            "ddl": join_statements(converted),
+            "converted": len(converted),
+            "escalated": escalated,
+            "rule_counts": rule_counts,
+            "seconds": round(time.monotonic() - started, 3)
+        }
+
+
+def join_statements(statements: list) -> str:
+    """Joins statements into a script, wrapping routines and triggers in DELIMITER ;; blocks."""
+    script, in_block = [], False
+    for statement in statements:
+        compound = bool(_COMPOUND_STATEMENT.match(statement))
+        if compound != in_block:
+            script.append("DELIMITER ;;\n" if compound else "DELIMITER ;\n")
+            in_block = compound
+        script.append(statement + (";;\n" if compound else ";\n"))
+    if in_block:
+        script.append("DELIMITER ;\n")
+    return "\n".join(script)
+
+
+def _sub_outside_quotes(pattern: str, replacement, statement: str) -> str:
+    """re.sub (case-insensitive) applied only to the parts of a statement outside quoted strings and identifiers."""
+    parts, last = [], 0
+    for quoted in _QUOTED.finditer(statement):
+        parts.append(re.sub(pattern, replacement, statement[last:quoted.start()], flags=re.IGNORECASE))
+        parts.append(quoted.group(0))
+        last = quoted.end()
+    parts.append(re.sub(pattern, replacement, statement[last:], flags=re.IGNORECASE))
+    return "".join(parts)
+
+
+def _check_auto_increment_key(definitions: list):
+    """MyISAM allows AUTO_INCREMENT on a later column of a composite key; InnoDB needs it first in some key."""
+    column = next((d.split()[0].strip("`") for d in definitions if re.search(r"\bAUTO_INCREMENT\b", d, re.IGNORECASE)), None)
+    if column is None:
+        return
+    keys = [d for d in definitions if re.match(r"^(?:PRIMARY\s+KEY|UNIQUE|KEY|INDEX)\b", d, re.IGNORECASE)]
+    if not any(first_key_column(d) == column for d in keys):
+        raise EscalateStatement(f"AUTO_INCREMENT column {column} is not the first column of a key, which InnoDB requires")
@@ -0,0 +1,118 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+
+@dataclass
+class StageResult:
+    """Outcome of one stage, handed to the stages that depend on it."""
+    name: str
+    status: str = "pending" # pending, running, completed, failed, skipped (a dependency failed) or not_selected
+    value: dict = None # What the stage returned, e.g. an agent's {"status", "details"}
+    error: str = None
+    started_at: float = None
+    finished_at: float = None
+    after: list = field(default_factory=list)
+
+    @property
+    def seconds(self) -> float:
+        return round(self.finished_at - self.started_at, 3) if self.started_at and self.finished_at else None
+
+    @property
+    def details(self):
+        return (self.value or {}).get("details")
+
+    @property
+    def ok(self) -> bool:
+        """Whether dependents may run: the stage completed, or was left out of this run."""
+        return self.status in ("completed", "not_selected")
+
+
+class StageGraph:
+    """
+    Runs named stages as soon as the stages they depend on are done, ready stages concurrently on a
+    thread pool. A stage is a function of {dependency name: StageResult} that returns a dict; it completed
+    when that dict's "status" is "completed", and failed when it returns anything else or raises, in which
+    case the stages depending on it are skipped.
+
+    Only the selected stages run (see select()); the others count as done, so part of the pipeline can be
+    rerun on its own.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self.stages = {} # name -> (function, dependencies), in declaration order
+
+    def add(self, name: str, function, after: list = None):
+        unknown = [dependency for dependency in after or [] if dependency not in self.stages]
+        if unknown:
+            raise ValueError(f"Stage {name} depends on undeclared stages: {unknown}")
+        self.stages[name] = (function, list(after or []))
+
+    def select(self, stages: list = None, from_stage: str = None) -> list:
+        """The stages to run: the given ones, or from_stage and every stage declared after it, or all."""
+        names = list(self.stages)
+        unknown = [name for name in (stages or []) + ([from_stage] if from_stage else []) if name not in self.stages]
+        if unknown:
+            raise ValueError(f"Unknown stages: {unknown}. Choose from {names}")
+        if stages:
+            return [name for name in names if name in stages]
+        if from_stage:
+            return names[names.index(from_stage):]
+        return names
+
+    def run(self, selected: list = None) -> dict:
+        """Runs the selected stages (all by default) and returns {name: StageResult} in declaration order."""
+        selected = set(self.select() if selected is None else selected)
+        results = {name: StageResult(name, after=after) for name, (_, after) in self.stages.items()}
+        for name, result in results.items():
+            if name not in selected:
+                result.status = "not_selected"
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while True:
+                for name, (function, after) in self.stages.items():
+                    result = results[name]
+                    if result.status != "pending":
+                        continue
+                    dependencies = [results[dependency] for dependency in after]
+                    if any(d.status in ("failed", "skipped") for d in dependencies):
+                        result.status = "skipped"
+                        print(f"Stage {name} skipped: {', '.join(d.name for d in dependencies if not d.ok)} did not complete.")
+                    elif all(d.ok for d in dependencies):
+                        result.status = "running"
+                        result.started_at = time.time()
+                        print(f"--- Stage {name} started ---")
+                        running[executor.submit(function, {d.name: d for d in dependencies})] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = results[running.pop(future)]
+                    result.finished_at = time.time()
+                    try:
+                        result.value = future.result()
+                        result.status = "completed" if (result.value or {}).get("status") == "completed" else "failed"
+                    except Exception as e:
+                        result.status, result.error = "failed", f"{type(e).__name__}: {e}"
+                    print(f"--- Stage {result.name} {result.status} in {result.seconds:.1f}s ---")
+        return results
+
+
+def describe_timeline(results: dict) -> str:
+    """One line per stage with its status, start and end times and duration."""
+    lines = []
+    for result in results.values():
+        line = f"{result.name:<20} {result.status:<13}"
+        if result.started_at:
+            line += (f" {_clock(result.started_at)} -> {_clock(result.finished_at)} ({result.seconds:.1f}s)"
+                     if result.finished_at else f" started {_clock(result.started_at)}")
+        if result.error:
+            line += f" error: {result.error}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _clock(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%H:%M:%S")